@@ -0,0 +1,78 @@
+"""Requisições de uma coleta com presos repetidos na listagem e foto genérica compartilhada.
+
+Monta uma listagem das fixtures com `--repetidos` presos aparecendo duas vezes
+(a cópia logo depois do original, como nos recadastros) e `--foto-generica` presos
+com a mesma URL de foto, e coleta com 8 requisições simultâneas e latência
+simulada. Conta as requisições que chegaram ao servidor e compara com o mínimo
+(páginas de detalhe por código distinto + uma por URL de foto distinta) e com o
+que cada cópia faria sozinha. Sai com código 1 se passar do mínimo.
+
+    python -m benchmarks.coalescing
+    python -m benchmarks.coalescing --presos 300 --repetidos 40 --foto-generica 60 --latencia 0.03
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from typing import List, Optional
+
+from benchmarks.fake_http import mount_fake
+from benchmarks.fixtures import FakeSession, preso_records
+from gui.selectors.detail_collector import DetailCollector
+from gui.selectors.pamc_scraper import merge_duplicate_presos
+from gui.selectors.preso_details import DETAIL_PAGES
+from utils.concurrency import AdaptiveLimiter
+from utils.http_session import new_session
+from utils.preso_record import PresoRecord
+
+
+CONCURRENCY = 8
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Conta as requisições economizadas por coalescência e união de repetidos.")
+    parser.add_argument("--presos", type=int, default=200)
+    parser.add_argument("--repetidos", type=int, default=20)
+    parser.add_argument("--foto-generica", type=int, default=30)
+    parser.add_argument("--latencia", type=float, default=0.02)
+    args = parser.parse_args(argv)
+
+    presos = preso_records(args.presos)
+    generica = presos[0]["imagem_link"]
+    for preso in presos[-args.foto_generica:] if args.foto_generica else []:
+        preso["imagem_link"] = generica
+    roster: List[PresoRecord] = []
+    for i, preso in enumerate(presos):
+        roster.append(preso)
+        if i < args.repetidos:
+            roster.append(PresoRecord.from_mapping(preso.to_dict()))
+
+    merged, copies = merge_duplicate_presos(roster)
+    server = FakeSession(n_presos=args.presos, n_fotos=2, photo_size=(32, 32))
+    session = new_session(limiter=AdaptiveLimiter(initial=CONCURRENCY, minimum=CONCURRENCY, maximum=CONCURRENCY))
+    mount_fake(session, server, latency=args.latencia)
+    collector = DetailCollector(session)
+    t0 = time.perf_counter()
+    results = collector.collect(merged)
+    elapsed = time.perf_counter() - t0
+    erros = [e for _p, _d, e in results if e is not None]
+    if erros:
+        print(f"FALHA: {len(erros)} preso(s) com erro: {erros[0]}")
+        return 1
+
+    pages = len(DETAIL_PAGES)
+    ingenuo = sum(pages + (1 if p.get("imagem_link") else 0) for p in roster)
+    minimo = len({p["id"] for p in merged}) * pages + len({p["imagem_link"] for p in merged if p.get("imagem_link")})
+    print(f"listagem: {len(roster)} blocos, {len(merged)} presos distintos ({sum(copies.values())} cópias unidas)")
+    print(f"requisições: {server.requests_count} em {elapsed:.2f} s  (mínimo {minimo}; uma busca por bloco faria {ingenuo})")
+    print(f"fotos compartilhadas entre presos: {collector.shared_photos}")
+    if server.requests_count > minimo:
+        print(f"FALHA: {server.requests_count - minimo} requisição(ões) repetida(s).")
+        return 1
+    print(f"OK: {ingenuo - server.requests_count} requisições economizadas.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,64 @@
+"""Transporte HTTP falso para rodar o fluxo do processo de trabalho sem rede.
+
+Separado de `benchmarks.fixtures` para que as medições de parsing não importem
+`requests` (o que inflaria o RSS medido pelo gate).
+"""
+from __future__ import annotations
+
+import re
+import time
+from typing import Optional
+
+import requests
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+
+from benchmarks.fixtures import FakeSession
+
+
+class FakeAdapter(BaseAdapter):
+    """Adaptador de transporte do `requests` que responde a partir de uma `FakeSession`.
+
+    Montado numa sessão real (`mount_fake`), exercita a mesma pilha HTTP do processo
+    de trabalho (`CanaimeSession`, cookies, hooks) sem rede. `latency` simula o tempo
+    de resposta do servidor com uma espera bloqueante, como um `recv` lento; com
+    `slow_pattern`, só as URLs que casam com a regex sofrem a espera.
+    """
+
+    def __init__(self, server: FakeSession, latency: float = 0.0, slow_pattern: Optional[str] = None):
+        super().__init__()
+        self.server = server
+        self.latency = latency
+        self.slow_re = re.compile(slow_pattern) if slow_pattern else None
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        if self.latency and (self.slow_re is None or self.slow_re.search(request.url)):
+            time.sleep(self.latency)
+        status, body = self.server.route(request.method, request.url)
+        resp = requests.Response()
+        resp.status_code = status
+        resp.reason = "OK" if status < 400 else "Not Found"
+        resp._content = body
+        resp.url = request.url
+        resp.request = request
+        resp.encoding = "utf-8"
+        content_type = "image/jpeg" if body[:2] == b"\xff\xd8" else "text/html; charset=utf-8"
+        resp.headers = CaseInsensitiveDict({"Content-Type": content_type, "Content-Length": str(len(body))})
+        return resp
+
+    def close(self) -> None:
+        pass
+
+
+def mount_fake(
+    session: requests.Session,
+    server: Optional[FakeSession] = None,
+    latency: float = 0.0,
+    slow_pattern: Optional[str] = None,
+) -> FakeSession:
+    """Faz `session` responder com fixtures para qualquer URL http(s); devolve o servidor falso."""
+    server = server or FakeSession()
+    adapter = FakeAdapter(server, latency=latency, slow_pattern=slow_pattern)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return server
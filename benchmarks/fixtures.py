@@ -0,0 +1,295 @@
+from __future__ import annotations
+
+import io
+import random
+import re
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from PIL import Image
+
+from gui.selectors.pamc_scraper import TARGET_URL
+from gui.selectors.preso_details import CADASTRO_URL, INFORMES_URL
+from utils.preso_record import PresoRecord
+
+
+_NOMES = [
+    "JOSE", "JOAO", "ANTONIO", "FRANCISCO", "CARLOS", "PAULO", "PEDRO", "LUCAS",
+    "LUIZ", "MARCOS", "LUIS", "GABRIEL", "RAFAEL", "DANIEL", "MARCELO", "BRUNO",
+]
+_SOBRENOMES = [
+    "SILVA", "SANTOS", "OLIVEIRA", "SOUZA", "RODRIGUES", "FERREIRA", "ALVES",
+    "PEREIRA", "LIMA", "GOMES", "COSTA", "RIBEIRO", "MARTINS", "CARVALHO",
+]
+_ALAS = ["ALA 1", "ALA 2", "ALA 3", "ALA 4", "ALA 5", "ALA 6", "ALA 7", "ALA 8", "TRIAGEM", "SEGURO"]
+_CIDADES = ["BOA VISTA", "CARACARAI", "MUCAJAI", "RORAINOPOLIS", "PACARAIMA", "MANAUS"]
+_ESTADOS = ["RORAIMA", "AMAZONAS", "PARA", "MARANHAO"]
+
+
+def _nome(rng: random.Random) -> str:
+    return " ".join([rng.choice(_NOMES), rng.choice(_SOBRENOMES), rng.choice(_SOBRENOMES)])
+
+
+def _preso_id(idx: int) -> str:
+    return str(10000 + idx)
+
+
+def listing_html(n_presos: int, seed: int = 0, first: int = 0) -> str:
+    """Gera HTML sintético da listagem da PAMC com `n_presos` blocos `.titulobkSingCAPS`.
+
+    A estrutura replica o que `parse_pamc_html` espera: 5 linhas de texto por bloco
+    (código, nome, duas linhas ignoradas, "Ala: X/Y") e uma `<img>` no mesmo bloco.
+    Os códigos começam no índice `first` (listagens de unidades diferentes não se repetem).
+    """
+    rng = random.Random(seed)
+    parts = [
+        "<html><head><title>Chamada</title>",
+        "<style>.titulobkSingCAPS{font-size:9px}</style></head><body>",
+        "<table width='100%'><tr>",
+    ]
+    for idx in range(n_presos):
+        pid = _preso_id(first + idx)
+        ala = rng.choice(_ALAS)
+        cela = f"CELA {rng.randint(1, 30):02d}"
+        if idx and idx % 5 == 0:
+            parts.append("</tr><tr>")
+        parts.append(
+            "<td align='center' valign='top'>"
+            "<div class='titulobkSingCAPS'>"
+            f"<img src='../../fotos/presos/{pid}.jpg' width='90' height='120'><br>"
+            f"Nº {pid}<br>"
+            f"{_nome(rng)}<br>"
+            f"VULGO: {rng.choice(_NOMES)}<br>"
+            f"ENTRADA: {rng.randint(1, 28):02d}/{rng.randint(1, 12):02d}/20{rng.randint(10, 24)}<br>"
+            f"Ala: {ala}/{cela}"
+            "</div></td>"
+        )
+    parts.append("</tr></table></body></html>")
+    return "".join(parts)
+
+
+def _linha(label: str, valor: str, extra: str = "") -> str:
+    return f"<tr><td class='titulo12bk'>{label}</td><td class='titulobk'>{valor}</td>{extra}</tr>"
+
+
+def _filler_rows(rng: random.Random, n: int) -> str:
+    return "".join(
+        f"<tr><td class='titulo12bk'>Campo {i}:</td><td class='texto'>{rng.random():.6f}</td></tr>"
+        for i in range(n)
+    )
+
+
+def cadastro_html(preso_id: str, seed: int = 0, filler: int = 40) -> str:
+    """Gera a página `cadastro.php` com as linhas nas posições usadas pelos seletores."""
+    rng = random.Random(f"cad-{preso_id}-{seed}")
+    rows = {
+        3: _linha("Mãe:", f"MARIA {rng.choice(_SOBRENOMES)} {rng.choice(_SOBRENOMES)}"),
+        4: _linha("Pai:", _nome(rng)),
+        5: (
+            "<tr><td class='titulo12bk'>Nascimento:</td><td class='titulobk'>Data</td>"
+            f"<td class='titulobk'>{rng.randint(1, 28):02d}/{rng.randint(1, 12):02d}/19{rng.randint(60, 99)}</td></tr>"
+        ),
+        8: _linha("Cidade:", rng.choice(_CIDADES)),
+        9: _linha("Estado:", rng.choice(_ESTADOS)),
+        13: (
+            "<tr><td class='titulo12bk'>CPF:</td><td class='titulobk'>Número</td>"
+            f"<td class='titulobk'>{rng.randint(100, 999)}.{rng.randint(100, 999)}.{rng.randint(100, 999)}-{rng.randint(10, 99)}</td></tr>"
+        ),
+        24: _linha(
+            "Endereço:",
+            f"RUA {rng.choice(_SOBRENOMES)}, {rng.randint(1, 2000)}, BAIRRO {rng.choice(_SOBRENOMES)}, "
+            f"{rng.choice(_CIDADES)} - {rng.choice(_ESTADOS)}",
+        ),
+    }
+    body = "".join(rows.get(i, f"<tr><td class='titulo12bk'>Linha {i}:</td><td class='texto'>-</td></tr>") for i in range(1, 31))
+    return (
+        "<html><head><title>Cadastro</title></head><body>"
+        f"<table width='760'>{body}</table>"
+        f"<table>{_filler_rows(rng, filler)}</table>"
+        "</body></html>"
+    )
+
+
+def informes_html(preso_id: str, seed: int = 0, filler: int = 40) -> str:
+    """Gera a página `Informes_LER.php` com as linhas nas posições usadas pelos seletores."""
+    rng = random.Random(f"inf-{preso_id}-{seed}")
+
+    def verde(label: str, valor: str) -> str:
+        return f"<td class='tituloVerde'>{label} <span class='titulobk'>{valor}</span></td>"
+
+    rows = {
+        16: _linha("Cor/Etnia:", rng.choice(["PARDA", "BRANCA", "PRETA", "INDIGENA"])),
+        17: _linha("Rosto:", rng.choice(["OVAL", "REDONDO", "QUADRADO"]), verde("Dentes:", rng.choice(["COMPLETOS", "FALHAS"]))),
+        18: _linha("Olhos:", rng.choice(["CASTANHOS", "PRETOS", "VERDES"]), verde("Cabelos:", rng.choice(["CURTOS", "CRESPOS", "LISOS"]))),
+        19: _linha("Nariz:", rng.choice(["AFILADO", "CHATO", "MEDIO"]), verde("Altura:", f"1,{rng.randint(55, 95)}")),
+        20: (
+            "<tr><td class='titulobk'>&nbsp;</td><td class='titulo12bk'>Boca:</td>"
+            f"<td class='titulobk'>{rng.choice(['MEDIA', 'GRANDE', 'PEQUENA'])}</td></tr>"
+        ),
+        22: _linha("Sinais:", " ".join(rng.choice(["TATUAGEM", "CICATRIZ", "BRACO", "ESQUERDO", "DIREITO", "PEITO"]) for _ in range(rng.randint(2, 12)))),
+    }
+    body = "".join(rows.get(i, f"<tr><td class='titulo12bk'>Linha {i}:</td><td class='texto'>-</td></tr>") for i in range(1, 31))
+    return (
+        "<html><head><title>Informes</title></head><body>"
+        f"<table width='760'>{body}</table>"
+        f"<table>{_filler_rows(rng, filler)}</table>"
+        "</body></html>"
+    )
+
+
+def photo_bytes(seed: int = 0, size: tuple[int, int] = (480, 640), quality: int = 85) -> bytes:
+    """Gera um JPEG em memória com ruído suave (compressão realista, não trivial)."""
+    rng = random.Random(seed)
+    w, h = size
+    small = Image.new("RGB", (w // 16, h // 16))
+    small.putdata([(rng.randrange(256), rng.randrange(256), rng.randrange(256)) for _ in range((w // 16) * (h // 16))])
+    img = small.resize((w, h), Image.BILINEAR)
+    buf = io.BytesIO()
+    img.save(buf, format="JPEG", quality=quality)
+    return buf.getvalue()
+
+
+def preso_records(n_presos: int, seed: int = 0) -> List[PresoRecord]:
+    """Registros completos (listagem + cadastro + informes), como os montados em `main.py`."""
+    from gui.selectors.pamc_scraper import parse_pamc_html
+    from gui.selectors.preso_details import fetch_preso_cadastro, fetch_preso_informes
+
+    session = FakeSession(seed=seed, n_presos=n_presos)
+    presos = parse_pamc_html(session.listing, base_url=TARGET_URL)
+    return [
+        p.merged({**fetch_preso_cadastro(session, p["id"]), **fetch_preso_informes(session, p["id"])})
+        for p in presos
+    ]
+
+
+LOGIN_HTML = (
+    "<html><body><form action='login_valida.php' method='post'>"
+    "<input type='text' name='usuario'><input type='password' name='senha'>"
+    "<input type='hidden' name='token' value='abc'><input type='submit' name='entrar' value='Entrar'>"
+    "</form></body></html>"
+)
+
+
+class FakeResponse:
+    """Resposta mínima compatível com o uso de `requests.Response` no projeto."""
+
+    def __init__(self, url: str, content: bytes, status_code: int = 200, encoding: str = "utf-8"):
+        self.url = url
+        self.content = content
+        self.status_code = status_code
+        self.encoding = encoding
+        self.headers: Dict[str, str] = {}
+
+    @property
+    def text(self) -> str:
+        return self.content.decode(self.encoding, errors="replace")
+
+    def raise_for_status(self) -> None:
+        if self.status_code >= 400:
+            import requests
+
+            raise requests.exceptions.HTTPError(f"{self.status_code} para {self.url}", response=self)
+
+
+class FakeSession:
+    """Sessão falsa que serve páginas e fotos sintéticas sem rede.
+
+    As páginas de detalhe são geradas sob demanda e memorizadas, para que o tempo
+    medido seja o do parsing e não o da geração da fixture. As fotos alternam
+    entre `n_fotos` JPEGs distintos. Com `units`, cada unidade (`id_und_prisional`)
+    tem uma listagem própria de `n_presos`; as demais recebem a listagem padrão.
+    Com `expire_every`, a "sessão" expira a cada tantas requisições fora do login:
+    daí em diante as páginas respondem com o formulário de login até um novo POST.
+    """
+
+    _RE_ID = re.compile(r"id_cad_preso=(\w+)")
+    _RE_FOTO = re.compile(r"/fotos/presos/(\w+)\.jpg")
+    _RE_UNIT = re.compile(r"id_und_prisional=([^&]+)")
+
+    def __init__(
+        self,
+        seed: int = 0,
+        n_presos: int = 100,
+        n_fotos: int = 8,
+        photo_size: tuple[int, int] = (480, 640),
+        units: Sequence[str] = (),
+        expire_every: int = 0,
+    ):
+        self.seed = seed
+        self.n_presos = n_presos
+        self.verify = True
+        self.headers: Dict[str, str] = {}
+        self.requests_count = 0
+        self._pages: Dict[str, bytes] = {}
+        self._photos = [photo_bytes(seed + i, size=photo_size) for i in range(n_fotos)]
+        self.listing = listing_html(n_presos, seed=seed)
+        self.expire_every = expire_every
+        self.logins = 0
+        self._since_login = 0
+        self._expired = False
+        self._auth_lock = threading.Lock()
+        self.unit_listings = {
+            unit: listing_html(n_presos, seed=seed + i, first=i * n_presos) for i, unit in enumerate(units)
+        }
+
+    def _page(self, url: str) -> Optional[bytes]:
+        cached = self._pages.get(url)
+        if cached is not None:
+            return cached
+        m = self._RE_ID.search(url)
+        if m is None:
+            return None
+        pid = m.group(1)
+        if url.startswith(CADASTRO_URL.split("{", 1)[0]):
+            html = cadastro_html(pid, seed=self.seed)
+        elif url.startswith(INFORMES_URL.split("{", 1)[0]):
+            html = informes_html(pid, seed=self.seed)
+        else:
+            return None
+        data = html.encode("utf-8")
+        self._pages[url] = data
+        return data
+
+    def route(self, method: str, url: str) -> Tuple[int, bytes]:
+        """Resolve uma requisição para (status, corpo), como o servidor do Canaimé faria."""
+        self.requests_count += 1
+        if "/login/" in url:
+            if method.upper() in ("GET", "HEAD"):
+                return 200, LOGIN_HTML.encode("utf-8")
+            with self._auth_lock:
+                self.logins += 1
+                self._since_login = 0
+                self._expired = False
+            return 200, b"<html>ok</html>"
+        if self.expire_every:
+            with self._auth_lock:
+                self._since_login += 1
+                if self._since_login > self.expire_every:
+                    self._expired = True
+                if self._expired:
+                    return 200, LOGIN_HTML.encode("utf-8")
+        if "UND_ChamadaFOTOS" in url:
+            m = self._RE_UNIT.search(url)
+            listing = self.unit_listings.get(m.group(1)) if m is not None else None
+            return 200, (listing or self.listing).encode("utf-8")
+        m = self._RE_FOTO.search(url)
+        if m is not None:
+            return 200, self._photos[int(m.group(1)) % len(self._photos)]
+        page = self._page(url)
+        if page is None:
+            return 404, b"not found"
+        return 200, page
+
+    def get(self, url: str, timeout: Optional[float] = None, **kwargs) -> FakeResponse:
+        status, body = self.route("GET", url)
+        return FakeResponse(url, body, status_code=status)
+
+    def post(self, url: str, data=None, timeout: Optional[float] = None, **kwargs) -> FakeResponse:
+        status, body = self.route("POST", url)
+        return FakeResponse(url, body, status_code=status)
+
+    def warm(self, ids: List[str]) -> None:
+        """Pré-gera as páginas de detalhe dos ids informados (fora da medição)."""
+        for pid in ids:
+            self._page(CADASTRO_URL.format(id=pid))
+            self._page(INFORMES_URL.format(id=pid))
@@ -0,0 +1,227 @@
+"""Gate de regressão de desempenho contra um baseline versionado.
+
+Executa uma carga fixa (parsing da listagem, parsing de detalhes e um PDF de
+500 páginas com fotos de fixture), cada fase num subprocesso próprio para que
+o pico de RSS seja medido isoladamente, e compara com `benchmarks/baseline.json`.
+
+    python -m benchmarks.gate                 # compara; código de saída 1 se regredir
+    python -m benchmarks.gate --update        # regrava o baseline com a medição atual
+    python -m benchmarks.gate --tolerancia segundos=0.5 --tolerancia pdf_bytes=0.02
+
+Métricas comparadas por fase: `segundos` (tempo de parede), `pico_tracemalloc`,
+`pico_rss` (quando o módulo `resource` existe, i.e. fora do Windows) e, no PDF,
+`pdf_bytes`. Uma métrica regride quando `atual > baseline * (1 + tolerância)`.
+"""
+from __future__ import annotations
+
+import argparse
+import gc
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional
+
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+# Tolerâncias padrão (fração acima do baseline). Tempo varia mais entre execuções.
+DEFAULT_TOLERANCES: Dict[str, float] = {
+    "segundos": 0.25,
+    "pico_tracemalloc": 0.15,
+    "pico_rss": 0.15,
+    "pdf_bytes": 0.05,
+}
+
+LISTING_PRESOS = 2000
+DETAIL_PRESOS = 200
+PDF_PAGES = 500
+REPEAT = int(os.environ.get("CANAIME_BENCH_REPEAT", "3"))
+
+
+def _phase_listing() -> Dict[str, float]:
+    from benchmarks.fixtures import listing_html
+    from gui.selectors.pamc_scraper import TARGET_URL, parse_pamc_html
+
+    html = listing_html(LISTING_PRESOS)
+    return _timed(lambda: parse_pamc_html(html, base_url=TARGET_URL))
+
+
+def _phase_details() -> Dict[str, float]:
+    from benchmarks.fixtures import FakeSession
+    from gui.selectors.preso_details import fetch_preso_cadastro, fetch_preso_informes
+
+    session = FakeSession(n_presos=DETAIL_PRESOS, n_fotos=1, photo_size=(32, 32))
+    ids = [str(10000 + i) for i in range(DETAIL_PRESOS)]
+    session.warm(ids)
+
+    def run():
+        for pid in ids:
+            fetch_preso_cadastro(session, pid)
+            fetch_preso_informes(session, pid)
+
+    return _timed(run)
+
+
+def _phase_pdf() -> Dict[str, float]:
+    from benchmarks.fixtures import FakeSession, preso_records
+    from utils.pdf_builder import build_pdf
+
+    session = FakeSession(n_presos=PDF_PAGES)
+    presos = preso_records(PDF_PAGES)
+    sink: Dict[str, int] = {}
+
+    def run():
+        buf = io.BytesIO()
+        build_pdf(session, presos, buf)
+        sink["pdf_bytes"] = len(buf.getvalue())
+
+    result = _timed(run)
+    result["pdf_bytes"] = float(sink["pdf_bytes"])
+    return result
+
+
+PHASES: Dict[str, Callable[[], Dict[str, float]]] = {
+    "listagem": _phase_listing,
+    "detalhes": _phase_details,
+    "pdf_500": _phase_pdf,
+}
+
+
+def _rss_bytes() -> Optional[float]:
+    try:
+        import resource
+    except ImportError:
+        return None
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reporta em KiB; macOS em bytes.
+    return float(maxrss if sys.platform == "darwin" else maxrss * 1024)
+
+
+def _timed(fn: Callable[[], object]) -> Dict[str, float]:
+    """Melhor tempo de `REPEAT` execuções (sem tracemalloc) e outra para o pico de alocação."""
+    elapsed = float("inf")
+    for _ in range(REPEAT):
+        gc.collect()
+        t0 = time.perf_counter()
+        fn()
+        elapsed = min(elapsed, time.perf_counter() - t0)
+    rss = _rss_bytes()
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    result = {"segundos": elapsed, "pico_tracemalloc": float(peak)}
+    if rss is not None:
+        result["pico_rss"] = rss
+    return result
+
+
+def run_phase_subprocess(name: str) -> Dict[str, float]:
+    """Roda uma fase num interpretador novo e devolve as métricas em JSON."""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    proc = subprocess.run(
+        [sys.executable, "-m", "benchmarks.gate", "--phase", name],
+        cwd=root,
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"Fase '{name}' falhou:\n{proc.stderr}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def compare(
+    baseline: Dict[str, Dict[str, float]],
+    current: Dict[str, Dict[str, float]],
+    tolerances: Dict[str, float],
+) -> List[str]:
+    """Devolve as linhas de relatório; as que começam com 'REGRESSÃO' reprovam o gate."""
+    lines: List[str] = []
+    for phase, metrics in current.items():
+        base_metrics = baseline.get(phase, {})
+        for metric, value in metrics.items():
+            base = base_metrics.get(metric)
+            if base is None:
+                lines.append(f"  novo       {phase}.{metric}: {_fmt(metric, value)} (sem baseline)")
+                continue
+            tol = tolerances.get(metric, 0.0)
+            delta = (value - base) / base if base else 0.0
+            status = "REGRESSÃO" if value > base * (1.0 + tol) else "ok"
+            lines.append(
+                f"  {status:<10} {phase}.{metric}: {_fmt(metric, base)} -> {_fmt(metric, value)} "
+                f"({delta:+.1%}, limite +{tol:.0%})"
+            )
+    return lines
+
+
+def _fmt(metric: str, value: float) -> str:
+    if metric == "segundos":
+        return f"{value:.3f} s"
+    return f"{value / 1024 / 1024:.2f} MiB"
+
+
+def _parse_tolerances(items: List[str]) -> Dict[str, float]:
+    tolerances = dict(DEFAULT_TOLERANCES)
+    for item in items:
+        key, _, raw = item.partition("=")
+        if key not in tolerances or not raw:
+            raise SystemExit(f"Tolerância inválida: '{item}' (use métrica=fração, ex.: segundos=0.3)")
+        tolerances[key] = float(raw)
+    return tolerances
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Gate de regressão de desempenho (tempo, memória e tamanho do PDF).")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="Arquivo JSON de baseline.")
+    parser.add_argument("--update", action="store_true", help="Regrava o baseline com a medição atual.")
+    parser.add_argument("--tolerancia", action="append", default=[], help="Sobrescreve a tolerância: métrica=fração.")
+    parser.add_argument("--phase", choices=sorted(PHASES), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.phase:
+        print(json.dumps(PHASES[args.phase]()))
+        return 0
+
+    tolerances = _parse_tolerances(args.tolerancia)
+    current: Dict[str, Dict[str, float]] = {}
+    for name in PHASES:
+        print(f"Executando fase '{name}'...", flush=True)
+        current[name] = run_phase_subprocess(name)
+
+    if args.update or not os.path.exists(args.baseline):
+        payload = {
+            "maquina": f"{platform.system()} {platform.machine()} / Python {platform.python_version()}",
+            "fases": current,
+        }
+        with open(args.baseline, "w", encoding="utf-8") as fh:
+            json.dump(payload, fh, ensure_ascii=False, indent=2)
+            fh.write("\n")
+        print(f"Baseline gravado em {args.baseline}")
+        return 0
+
+    with open(args.baseline, encoding="utf-8") as fh:
+        baseline = json.load(fh)
+
+    print(f"Comparando com {args.baseline} ({baseline.get('maquina', 'máquina desconhecida')}):")
+    lines = compare(baseline.get("fases", {}), current, tolerances)
+    print("\n".join(lines))
+    regressions = [line for line in lines if line.lstrip().startswith("REGRESSÃO")]
+    if regressions:
+        print(f"\nFALHOU: {len(regressions)} métrica(s) acima do limite.")
+        return 1
+    print("\nOK: nenhuma regressão acima do limite.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,60 @@
+"""Páginas, tempo de renderização e tempo de impressão por layout (presos por página).
+
+Gera o PDF de N presos das fixtures (cada um com a sua foto) em cada layout de
+`PAGE_LAYOUTS` e mostra páginas, tempo, tamanho e o tempo estimado na fila de
+impressão (páginas / `--ppm` páginas por minuto da impressora). Confere também que
+o layout de 1 por página gera o mesmo arquivo que `build_pdf` sem layout.
+
+    python -m benchmarks.layouts
+    python -m benchmarks.layouts --presos 1200 --ppm 40 --perfil impressao
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import io
+import sys
+from typing import List, Optional
+
+from benchmarks.fixtures import photo_bytes, preso_records
+from utils.pdf_builder import PAGE_LAYOUTS, build_pdf, resolve_pdf_profile
+from utils.run_estimates import format_duration
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Compara os layouts de 1, 2 e 4 presos por página.")
+    parser.add_argument("--presos", type=int, default=300)
+    parser.add_argument("--ppm", type=float, default=30.0, help="Páginas por minuto da impressora.")
+    parser.add_argument("--perfil", default="", help="Perfil de saída do PDF (padrão: padrao).")
+    args = parser.parse_args(argv)
+    try:
+        perfil = resolve_pdf_profile(args.perfil)
+    except ValueError as e:
+        parser.error(str(e))
+
+    presos = preso_records(args.presos)
+    fotos = {p["imagem_link"]: photo_bytes(i) for i, p in enumerate(presos)}
+    print(f"{len(presos)} presos, perfil {perfil}, impressora a {args.ppm:g} páginas/min", flush=True)
+
+    base = None
+    for per_page in sorted(PAGE_LAYOUTS):
+        out = io.BytesIO()
+        report = build_pdf(None, presos, out, fotos=fotos, profile=perfil, per_page=per_page)
+        base = base or report
+        print(f"{per_page} por página  {report['paginas']:5d} páginas  {report['segundos']:6.2f} s  "
+              f"{report['bytes'] / 1048576:6.1f} MiB  impressão ~{format_duration(60 * report['paginas'] / args.ppm):>9s}  "
+              f"({report['segundos'] / base['segundos']:.2f}x o tempo, {report['paginas'] / base['paginas']:.2f}x as páginas)",
+              flush=True)
+        if per_page == 1:
+            unico = hashlib.md5(out.getvalue()).hexdigest()
+            ref = io.BytesIO()
+            build_pdf(None, presos, ref, fotos=fotos, profile=perfil)
+            if hashlib.md5(ref.getvalue()).hexdigest() != unico:
+                print("FALHA: o layout de 1 por página difere do PDF sem layout.")
+                return 1
+    print("OK: 1 por página idêntico ao PDF sem layout.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,171 @@
+"""Tempo do clique em Login até a listagem de presos, com e sem o aquecimento da conexão.
+
+Sobe um servidor HTTP local que responde com as fixtures, cobra `--handshake`
+segundos a cada conexão nova (o que DNS + TCP + TLS custam até o Canaimé) e
+`--latencia` segundos a cada requisição. `process_task_func` roda numa thread, como
+no processo de trabalho: frio, com as credenciais desde o início; aquecido, sem
+credenciais, recebendo usuário e senha `--digitacao` segundos depois. Mede do envio
+das credenciais até a listagem chegar à UI (`choose_alas`) e quantas conexões foram
+abertas depois do clique.
+
+    python -m benchmarks.login_warmup
+    python -m benchmarks.login_warmup --handshake 0.3 --latencia 0.05
+"""
+from __future__ import annotations
+
+import argparse
+import queue as queue_mod
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+from requests.adapters import HTTPAdapter
+
+import main as app_main
+from benchmarks.fixtures import FakeSession
+from utils.http_session import new_session
+
+
+ORIGIN = "https://canaime.com.br"
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, fake: FakeSession, handshake: float, latency: float):
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.fake = fake
+        self.handshake = handshake
+        self.latency = latency
+        self.connections = 0
+        self._lock = threading.Lock()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, como o servidor real
+
+    def setup(self) -> None:
+        with self.server._lock:
+            self.server.connections += 1
+        time.sleep(self.server.handshake)
+        super().setup()
+
+    def _reply(self, method: str) -> None:
+        length = int(self.headers.get("Content-Length") or 0)
+        if length:
+            self.rfile.read(length)
+        time.sleep(self.server.latency)
+        status, body = self.server.fake.route(method, ORIGIN + self.path)
+        self.send_response(status)
+        content_type = "image/jpeg" if body[:2] == b"\xff\xd8" else "text/html; charset=utf-8"
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if method != "HEAD":
+            self.wfile.write(body)
+
+    def do_GET(self) -> None:
+        self._reply("GET")
+
+    def do_HEAD(self) -> None:
+        self._reply("HEAD")
+
+    def do_POST(self) -> None:
+        self._reply("POST")
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+class _LocalAdapter(HTTPAdapter):
+    """Adaptador real do `requests` (pool de conexões de verdade) apontado para o servidor local."""
+
+    def __init__(self, local: str):
+        super().__init__()
+        self.local = local
+
+    def send(self, request, **kwargs):
+        request.url = request.url.replace(ORIGIN, self.local, 1)
+        return super().send(request, **kwargs)
+
+
+def _run(server: _Server, warm: bool, typing_s: float) -> Dict[str, float]:
+    local = f"http://127.0.0.1:{server.server_address[1]}"
+    original = app_main.new_session
+
+    def local_new_session(*args, **kwargs):
+        session = new_session(*args, **kwargs)
+        session.mount(ORIGIN, _LocalAdapter(local))
+        return session
+
+    out_queue: queue_mod.Queue = queue_mod.Queue()
+    command_queue: queue_mod.Queue = queue_mod.Queue()
+    stop_event = threading.Event()
+    credentials: List[Optional[str]] = [None, None] if warm else ["usuario", "senha"]
+    app_main.new_session = local_new_session
+    try:
+        worker = threading.Thread(
+            target=app_main.process_task_func,
+            args=(True, out_queue, command_queue, stop_event, *credentials),
+            daemon=True,
+        )
+        worker.start()
+        if warm:
+            time.sleep(typing_s)  # operador digitando
+        connections_before = server.connections
+        t0 = time.perf_counter()
+        if warm:
+            command_queue.put(("credentials", ("usuario", "senha")))
+        elapsed = None
+        aquecimento = ""
+        while elapsed is None:
+            msg = out_queue.get(timeout=60)
+            if msg[0] == "choose_alas":
+                elapsed = time.perf_counter() - t0
+            elif msg[0] == "status" and msg[1].startswith("Aquecimento:"):
+                aquecimento = msg[1]
+            elif msg[0] == "error":
+                raise RuntimeError(msg[1])
+        connections_after = server.connections
+        stop_event.set()
+        worker.join(timeout=10)
+    finally:
+        app_main.new_session = original
+    return {
+        "segundos": elapsed,
+        "conexoes": connections_after - connections_before,
+        "aquecimento": aquecimento,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Mede o clique → listagem com e sem aquecimento da conexão.")
+    parser.add_argument("--handshake", type=float, default=0.25, help="Custo de cada conexão nova, em segundos.")
+    parser.add_argument("--latencia", type=float, default=0.03, help="Tempo de resposta de cada requisição.")
+    parser.add_argument("--digitacao", type=float, default=3.0, help="Segundos entre abrir a janela e o clique.")
+    parser.add_argument("--presos", type=int, default=200)
+    args = parser.parse_args(argv)
+
+    results = {}
+    for label, warm in (("frio", False), ("aquecido", True)):
+        server = _Server(FakeSession(n_presos=args.presos, n_fotos=2), args.handshake, args.latencia)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            results[label] = _run(server, warm, args.digitacao)
+        finally:
+            server.shutdown()
+            server.server_close()
+        r = results[label]
+        print(f"{label:<9} clique → listagem {r['segundos']:6.3f} s   conexões abertas após o clique: {r['conexoes']}",
+              flush=True)
+        if r["aquecimento"]:
+            print(f"          {r['aquecimento']}", flush=True)
+    ganho = results["frio"]["segundos"] - results["aquecido"]["segundos"]
+    print(f"ganho: {ganho:.3f} s ({ganho / results['frio']['segundos']:.0%})")
+    return 0 if ganho > 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,165 @@
+"""Micro-benchmarks de parsing e renderização sobre fixtures sintéticas.
+
+Uso (a partir da raiz do repositório):
+
+    python -m benchmarks.micro
+    python -m benchmarks.micro --sizes 10 100 1000 --repeat 5 --json resultados.json
+
+Para cada caso e tamanho mede o melhor tempo entre `--repeat` execuções e,
+numa execução separada com `tracemalloc`, o pico de memória alocada. Os
+valores também são normalizados por item (preso, página ou parágrafo).
+"""
+from __future__ import annotations
+
+import argparse
+import gc
+import io
+import json
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Tuple
+
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfgen import canvas
+
+from benchmarks.fixtures import FakeSession, preso_records
+from gui.selectors.pamc_scraper import TARGET_URL, parse_pamc_html
+from gui.selectors.preso_details import fetch_preso_cadastro, fetch_preso_informes
+from utils.pdf_builder import _draw_wrapped_text, build_pdf
+
+
+DEFAULT_SIZES = [10, 100, 500]
+
+# Cada caso recebe o tamanho e devolve (função a medir, número de itens processados).
+Case = Callable[[int], Tuple[Callable[[], object], int]]
+
+
+def case_parse_listing(n: int):
+    session = FakeSession(n_presos=n, n_fotos=1, photo_size=(32, 32))
+    html = session.listing
+    return (lambda: parse_pamc_html(html, base_url=TARGET_URL)), n
+
+
+def case_parse_details(n: int):
+    session = FakeSession(n_presos=n, n_fotos=1, photo_size=(32, 32))
+    ids = [str(10000 + i) for i in range(n)]
+    session.warm(ids)
+
+    def run():
+        for pid in ids:
+            fetch_preso_cadastro(session, pid)
+            fetch_preso_informes(session, pid)
+
+    return run, n
+
+
+_LOREM = (
+    "TATUAGEM NO BRACO ESQUERDO COM NOME DE MULHER CICATRIZ NO ROSTO LADO DIREITO "
+    "RUA DAS FLORES NUMERO 1234 BAIRRO CENTRO BOA VISTA RORAIMA "
+) * 3
+
+
+def case_wrapped_text(n: int):
+    def run():
+        c = canvas.Canvas(io.BytesIO(), pagesize=A4)
+        for _ in range(n):
+            _draw_wrapped_text(c, _LOREM, 100, 700, 300, "Helvetica", 11)
+        c.save()
+
+    return run, n
+
+
+def case_build_pdf(n: int):
+    session = FakeSession(n_presos=n)
+    presos = preso_records(n)
+
+    def run():
+        build_pdf(session, presos, io.BytesIO())
+
+    return run, n
+
+
+def case_build_pdf_draft(n: int):
+    session = FakeSession(n_presos=n)
+    presos = preso_records(n)
+    # Pior caso do rascunho: todas as fotos já baixadas (cada uma vira miniatura)
+    fotos = {p["imagem_link"]: session.get(p["imagem_link"]).content for p in presos if p.get("imagem_link")}
+
+    def run():
+        build_pdf(None, presos, io.BytesIO(), fotos=fotos, draft=True)
+
+    return run, n
+
+
+CASES: Dict[str, Case] = {
+    "parse_pamc_html": case_parse_listing,
+    "preso_details": case_parse_details,
+    "_draw_wrapped_text": case_wrapped_text,
+    "build_pdf": case_build_pdf,
+    "build_pdf_rascunho": case_build_pdf_draft,
+}
+
+
+def measure(fn: Callable[[], object], n_items: int, repeat: int = 3) -> Dict[str, float]:
+    """Mede o melhor tempo de `repeat` execuções e o pico de alocação de uma execução."""
+    best = float("inf")
+    for _ in range(max(1, repeat)):
+        gc.collect()
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    per = max(1, n_items)
+    return {
+        "itens": n_items,
+        "segundos": best,
+        "ms_por_item": best * 1000.0 / per,
+        "pico_bytes": peak,
+        "kb_por_item": peak / 1024.0 / per,
+    }
+
+
+def run_benchmarks(cases: List[str], sizes: List[int], repeat: int = 3) -> List[Dict[str, object]]:
+    results: List[Dict[str, object]] = []
+    for name in cases:
+        for size in sizes:
+            fn, n_items = CASES[name](size)
+            row: Dict[str, object] = {"caso": name, "tamanho": size}
+            row.update(measure(fn, n_items, repeat=repeat))
+            results.append(row)
+            print(
+                f"{name:<20} n={size:<6} {row['segundos']:9.4f} s  "
+                f"{row['ms_por_item']:9.3f} ms/item  "
+                f"pico {row['pico_bytes'] / 1024 / 1024:8.2f} MiB  "
+                f"{row['kb_por_item']:9.1f} KiB/item",
+                flush=True,
+            )
+    return results
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Micro-benchmarks de parsing e PDF (fixtures sintéticas).")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="Quantidades de presos por caso.")
+    parser.add_argument("--repeat", type=int, default=3, help="Execuções cronometradas por caso (vale o melhor tempo).")
+    parser.add_argument("--case", dest="cases", action="append", choices=sorted(CASES), help="Restringe a um ou mais casos.")
+    parser.add_argument("--json", dest="json_path", default="", help="Salva os resultados neste arquivo JSON.")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.cases or list(CASES), args.sizes, repeat=args.repeat)
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as fh:
+            json.dump(results, fh, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,74 @@
+"""Reimpressão com o cache de páginas: PDF completo x só as páginas que mudaram.
+
+Gera o PDF de N presos das fixtures sem cache, depois com o cache vazio (grava os
+fragmentos), com o cache cheio e com alguns presos alterados. Em cada caso o
+arquivo é comparado byte a byte com o PDF gerado sem cache a partir dos mesmos dados.
+
+    python -m benchmarks.page_cache
+    python -m benchmarks.page_cache --presos 200 --alterados 5
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from typing import List
+
+from benchmarks.fixtures import FakeSession, preso_records
+from utils.page_cache import PageCache
+from utils.pdf_builder import build_pdf
+
+
+def _build(presos, fotos, path: str, cache=None) -> float:
+    t0 = time.perf_counter()
+    build_pdf(None, presos, path, fotos=fotos, page_cache=cache)
+    return time.perf_counter() - t0
+
+
+def _same(a: str, b: str) -> bool:
+    with open(a, "rb") as fa, open(b, "rb") as fb:
+        return fa.read() == fb.read()
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Mede a reimpressão com o cache de páginas.")
+    parser.add_argument("--presos", type=int, default=200)
+    parser.add_argument("--alterados", type=int, default=5, help="Presos com a cela alterada na reimpressão.")
+    args = parser.parse_args(argv)
+
+    presos = preso_records(args.presos)
+    session = FakeSession(n_presos=args.presos, n_fotos=20)
+    fotos = {p["imagem_link"]: session.get(p["imagem_link"]).content for p in presos}
+    step = max(1, len(presos) // max(1, args.alterados))
+    alterados = list(presos)
+    for i in range(0, len(alterados), step)[: args.alterados]:
+        alterados[i] = alterados[i].merged({"cela": "CELA 99"})
+
+    ok = True
+    with tempfile.TemporaryDirectory() as tmp:
+        cache_dir = os.path.join(tmp, "paginas")
+        path = lambda name: os.path.join(tmp, f"{name}.pdf")  # noqa: E731
+        base = _build(presos, fotos, path("base"))
+        base_alt = _build(alterados, fotos, path("base_alt"))
+        print(f"sem cache            {len(presos)} páginas  {base:6.2f} s", flush=True)
+        for label, data, ref, ref_time in (
+            ("cache vazio", presos, "base", base),
+            ("cache cheio", presos, "base", base),
+            (f"{args.alterados} alterados", alterados, "base_alt", base_alt),
+        ):
+            cache = PageCache(cache_dir)
+            elapsed = _build(data, fotos, path("cache"), cache)
+            same = _same(path("cache"), path(ref))
+            ok &= same
+            print(
+                f"{label:<20} {len(data)} páginas  {elapsed:6.2f} s  ({elapsed / ref_time:5.0%} do tempo sem cache)"
+                f"  {cache.describe()}  {'idêntico' if same else 'DIFERENTE'}",
+                flush=True,
+            )
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,102 @@
+"""Parsing das páginas de detalhe no processo de trabalho x num pool de processos.
+
+Coleta N presos das fixtures com a pilha HTTP real (`CanaimeSession` com o
+transporte falso) e 8 requisições simultâneas, variando a latência simulada do
+servidor e o número de processos de parsing (0 = parsing na thread de coleta,
+como antes). Com latência baixa a coleta é limitada pela CPU (e pelo GIL) e o
+pool escala com os núcleos; com latência alta a rede domina e o pool só custa a
+cópia das páginas entre processos. O fim da saída mostra onde fica a virada.
+
+    python -m benchmarks.parse_pool
+    python -m benchmarks.parse_pool --presos 300 --latencias 0 0.02 0.05 0.1 --processos 0 2 4
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+
+from benchmarks.fake_http import mount_fake
+from benchmarks.fixtures import FakeSession, preso_records
+from gui.selectors.detail_collector import DetailCollector
+from gui.selectors.parse_pool import ParsePool
+from utils.concurrency import AdaptiveLimiter
+from utils.http_session import new_session
+
+
+CONCURRENCY = 8
+# Ganho mínimo para considerar que o pool compensa (abaixo disso é ruído)
+MIN_GAIN = 0.05
+
+
+def _collect(server: FakeSession, presos, latency: float, workers: int) -> Tuple[float, float]:
+    """(segundos de coleta, segundos para subir o pool) de uma coleta completa."""
+    limiter = AdaptiveLimiter(initial=CONCURRENCY, minimum=CONCURRENCY, maximum=CONCURRENCY)
+    session = new_session(limiter=limiter)
+    mount_fake(session, server, latency=latency)
+    pool = ParsePool(workers)
+    t0 = time.perf_counter()
+    pool.start(wait=True)
+    startup = time.perf_counter() - t0
+    try:
+        collector = DetailCollector(session, parser=pool)
+        t0 = time.perf_counter()
+        results = collector.collect(presos)
+        elapsed = time.perf_counter() - t0
+    finally:
+        pool.close()
+    erros = [e for _p, _d, e in results if e is not None]
+    if erros:
+        raise RuntimeError(f"{len(erros)} preso(s) falharam: {erros[0]}")
+    return elapsed, startup
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Mede o parsing de detalhes local x em pool de processos.")
+    parser.add_argument("--presos", type=int, default=200)
+    parser.add_argument("--latencias", type=float, nargs="+", default=[0.0, 0.01, 0.03, 0.1])
+    parser.add_argument("--processos", type=int, nargs="+", default=[0, 1, 2, 4])
+    args = parser.parse_args(argv)
+
+    presos = preso_records(args.presos)
+    server = FakeSession(n_presos=args.presos, n_fotos=2, photo_size=(32, 32))
+    server.warm([p["id"] for p in presos])  # gerar a fixture não entra na medição
+    pages = 2 * len(presos)
+    print(f"{os.cpu_count()} núcleo(s), {len(presos)} presos ({pages} páginas de detalhe), "
+          f"{CONCURRENCY} requisições simultâneas", flush=True)
+
+    best: Dict[float, Tuple[int, float, float]] = {}
+    for latency in args.latencias:
+        base = None
+        for workers in args.processos:
+            elapsed, startup = _collect(server, presos, latency, workers)
+            base = elapsed if base is None else base
+            rate = pages / elapsed
+            startup_txt = f"  (pool sobe em {startup:.2f} s)" if workers else ""
+            print(f"latência {latency * 1000:5.0f} ms  processos {workers}  {elapsed:6.2f} s  "
+                  f"{rate:7.0f} páginas/s  {base / elapsed:5.2f}x{startup_txt}", flush=True)
+            if latency not in best or elapsed < best[latency][1]:
+                best[latency] = (workers, elapsed, base / elapsed)
+
+    print()
+    virada = None
+    for latency in sorted(args.latencias):
+        workers, _elapsed, speedup = best[latency]
+        ganho = workers > 0 and speedup >= 1 + MIN_GAIN
+        if not ganho and virada is None:
+            virada = latency
+        escolha = f"{workers} processo(s), {speedup:.2f}x" if ganho else "parsing local"
+        print(f"latência {latency * 1000:5.0f} ms: melhor com {escolha}")
+    if virada is None:
+        print("virada: o pool compensou em todas as latências medidas.")
+    elif virada == min(args.latencias):
+        print("virada: o pool não compensou nem sem latência (poucos núcleos).")
+    else:
+        print(f"virada: a partir de {virada * 1000:.0f} ms de latência a rede domina e o parsing local basta.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
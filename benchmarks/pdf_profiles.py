@@ -0,0 +1,82 @@
+"""Tamanho e tempo do PDF em cada perfil de saída, com e sem limite de tamanho.
+
+Gera o PDF de N presos das fixtures (cada um com a sua foto, 480x640 JPEG) em
+cada perfil de `PDF_PROFILES`, num arquivo temporário, e mostra tamanho, tempo e
+bytes por página. Com `--tamanho-max-mb`, gera de novo cada perfil com esse limite
+e sai com código 1 se algum passar dele.
+
+Por fim gera, com um limite mínimo (força a recompressão), um PDF em que um preso
+não tem foto e outro tem a foto corrompida; sai com código 1 se isso falhar.
+
+    python -m benchmarks.pdf_profiles
+    python -m benchmarks.pdf_profiles --presos 500 --tamanho-max-mb 10
+    python -m benchmarks.pdf_profiles --perfis impressao email --presos 1000
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import tempfile
+from typing import List, Optional
+
+from benchmarks.fixtures import photo_bytes, preso_records
+from utils.pdf_builder import PDF_PROFILES, build_pdf, describe_pdf_report, resolve_pdf_profile
+
+
+def _budget_without_photos(presos, fotos, path) -> bool:
+    """Limite de tamanho com presos sem foto e foto que não decodifica: as fotos boas recomprimem, o resto fica em branco."""
+    amostra = [dict(p) for p in presos[:20]]
+    amostra[0]["imagem_link"] = ""
+    fotos = {p["imagem_link"]: fotos[p["imagem_link"]] for p in amostra[2:]}
+    fotos[amostra[1]["imagem_link"]] = b"nao e um jpeg"
+    try:
+        report = build_pdf(None, amostra, path, fotos=fotos, profile="email", max_mb=0.01)
+    except Exception as e:
+        print(f"\nFALHA: limite de tamanho com preso sem foto/foto corrompida: {type(e).__name__}: {e}")
+        return False
+    print(f"\nsem foto/foto corrompida com limite: ok ({describe_pdf_report(report)})", flush=True)
+    return True
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Mede tamanho e tempo do PDF por perfil de saída.")
+    parser.add_argument("--presos", type=int, default=200)
+    parser.add_argument("--perfis", nargs="+", default=list(PDF_PROFILES))
+    parser.add_argument("--tamanho-max-mb", type=float, default=0.0)
+    args = parser.parse_args(argv)
+    try:
+        perfis = [resolve_pdf_profile(p) for p in args.perfis]
+    except ValueError as e:
+        parser.error(str(e))
+
+    presos = preso_records(args.presos)
+    fotos = {p["imagem_link"]: photo_bytes(i) for i, p in enumerate(presos)}
+    print(f"{len(presos)} presos, {len(fotos)} fotos distintas "
+          f"({sum(len(f) for f in fotos.values()) / 1048576:.1f} MiB de JPEG original)", flush=True)
+
+    acima = []
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "saida.pdf")
+        limites = [None] + ([args.tamanho_max_mb] if args.tamanho_max_mb else [])
+        for limite in limites:
+            if limite:
+                print(f"\ncom limite de {limite:g} MiB:")
+            for perfil in perfis:
+                report = build_pdf(None, presos, path, fotos=fotos, profile=perfil, max_mb=limite)
+                print(f"{perfil:10s} {report['bytes'] / 1048576:7.1f} MiB  {report['segundos']:6.2f} s  "
+                      f"{report['bytes'] / len(presos) / 1024:6.0f} KiB/página  ({describe_pdf_report(report)})", flush=True)
+                if limite and report["bytes"] > limite * 1048576:
+                    acima.append(perfil)
+        if not _budget_without_photos(presos, fotos, path):
+            return 1
+    if acima:
+        print(f"FALHA: acima de {args.tamanho_max_mb:g} MiB: {', '.join(acima)}")
+        return 1
+    if args.tamanho_max_mb:
+        print(f"OK: todos os perfis dentro de {args.tamanho_max_mb:g} MiB.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
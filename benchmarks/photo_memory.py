@@ -0,0 +1,112 @@
+"""Memória das fotos numa coleta grande: dict de bytes x `SpooledPhotoStore`.
+
+Guarda N fotos JPEG distintas (as fotos das fixtures com um sufixo único, como
+se cada preso tivesse a sua) e depois lê cada uma como o `build_pdf` lê (Pillow
+abrindo e decodificando), medindo em subprocessos separados o pico de RSS, a
+memória anônima do processo (RssAnon, no Linux) e o tempo de leitura.
+
+    python -m benchmarks.photo_memory
+    python -m benchmarks.photo_memory --fotos 5000 --orcamento 16
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional
+
+from PIL import Image
+
+from benchmarks.fixtures import photo_bytes
+from utils.photo_store import SpooledPhotoStore, open_photo
+
+
+def _rss_anon() -> Optional[float]:
+    """Memória anônima atual (sem as páginas de arquivo do mmap), quando o /proc existe."""
+    try:
+        with open("/proc/self/status", encoding="ascii") as fh:
+            for line in fh:
+                if line.startswith("RssAnon:"):
+                    return float(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def _peak_rss() -> Optional[float]:
+    try:
+        import resource
+    except ImportError:
+        return None
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return float(maxrss if sys.platform == "darwin" else maxrss * 1024)
+
+
+def run_variant(variant: str, n_photos: int, budget_mib: int) -> Dict[str, float]:
+    pool = [photo_bytes(seed) for seed in range(20)]
+    base_anon = _rss_anon()
+    store = {} if variant == "dict" else SpooledPhotoStore(memory_budget=budget_mib * 1024 * 1024)
+    total = 0
+    for i in range(n_photos):
+        data = pool[i % len(pool)] + i.to_bytes(4, "big")  # bytes depois do EOI: JPEG continua válido
+        store[f"foto/{i}.jpg"] = data
+        total += len(data)
+    del data
+
+    t0 = time.perf_counter()
+    for i in range(n_photos):
+        with Image.open(open_photo(store[f"foto/{i}.jpg"])) as img:
+            img.load()
+    elapsed = time.perf_counter() - t0
+
+    anon = _rss_anon()
+    result = {"fotos_mib": total / 1024 / 1024, "leitura_s": elapsed}
+    if anon is not None and base_anon is not None:
+        result["anon_mib"] = (anon - base_anon) / 1024 / 1024
+    peak = _peak_rss()
+    if peak is not None:
+        result["pico_rss_mib"] = peak / 1024 / 1024
+    return result
+
+
+def _run_subprocess(variant: str, n_photos: int, budget_mib: int) -> Dict[str, float]:
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    proc = subprocess.run(
+        [sys.executable, "-m", "benchmarks.photo_memory", "--variante", variant,
+         "--fotos", str(n_photos), "--orcamento", str(budget_mib)],
+        cwd=root, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"Variante '{variant}' falhou:\n{proc.stderr}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Compara a memória de fotos em dict e em SpooledPhotoStore.")
+    parser.add_argument("--fotos", type=int, default=3000)
+    parser.add_argument("--orcamento", type=int, default=16, help="Orçamento em memória do SpooledPhotoStore (MiB).")
+    parser.add_argument("--variante", choices=("dict", "spool"), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.variante:
+        print(json.dumps(run_variant(args.variante, args.fotos, args.orcamento)))
+        return 0
+
+    for variant in ("dict", "spool"):
+        r = _run_subprocess(variant, args.fotos, args.orcamento)
+        label = "dict" if variant == "dict" else f"spool ({args.orcamento} MiB)"
+        print(
+            f"{label:<16} {args.fotos} fotos ({r['fotos_mib']:.0f} MiB)"
+            + (f"  pico RSS {r['pico_rss_mib']:7.1f} MiB" if "pico_rss_mib" in r else "")
+            + (f"  memória anônima {r['anon_mib']:7.1f} MiB" if "anon_mib" in r else "")
+            + f"  leitura {r['leitura_s']:.2f} s",
+            flush=True,
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
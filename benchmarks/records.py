@@ -0,0 +1,97 @@
+"""Memória retida pelos registros de presos: dicts mesclados x `PresoRecord`.
+
+Monta N presos completos (listagem + cadastro + informes) das fixtures e mede,
+com `tracemalloc`, quanto fica retido depois de descartados os intermediários,
+além do tamanho em pickle da lista (o que cruzaria as filas do multiprocessing).
+Para não parsear 2·N páginas, os detalhes de um conjunto menor de páginas são
+replicados como cópias independentes das strings, como o parser as produziria.
+
+    python -m benchmarks.records
+    python -m benchmarks.records --presos 5000 --paginas 300
+"""
+from __future__ import annotations
+
+import argparse
+import gc
+import pickle
+import sys
+import tracemalloc
+from typing import Callable, Dict, List
+
+from benchmarks.fixtures import FakeSession
+from gui.selectors.pamc_scraper import TARGET_URL, parse_pamc_html
+from gui.selectors.preso_details import fetch_preso_cadastro, fetch_preso_informes
+from utils.preso_record import PresoRecord
+
+
+def _fresh(value: str) -> str:
+    """Cópia independente da string (o parser cria um objeto novo por página)."""
+    return value.encode("utf-8").decode("utf-8")
+
+
+def _sources(n_presos: int, n_pages: int):
+    session = FakeSession(n_presos=n_presos, n_fotos=1, photo_size=(32, 32))
+    html = session.listing
+    pool: List[Dict[str, str]] = []
+    for i in range(min(n_pages, n_presos)):
+        pid = str(10000 + i)
+        pool.append({**fetch_preso_cadastro(session, pid), **fetch_preso_informes(session, pid)})
+    return html, pool
+
+
+def _build_dicts(html: str, pool: List[Dict[str, str]]) -> list:
+    """Como antes: dict da listagem mesclado com os dicts de detalhes."""
+    presos = [{k: _fresh(v) for k, v in p.items()} for p in parse_pamc_html(html, base_url=TARGET_URL)]
+    return [
+        {**p, **{k: _fresh(v) for k, v in pool[i % len(pool)].items()}}
+        for i, p in enumerate(presos)
+    ]
+
+
+def _build_records(html: str, pool: List[Dict[str, str]]) -> list:
+    """Como agora: `PresoRecord` da listagem mesclado com o registro de detalhes."""
+    presos = parse_pamc_html(html, base_url=TARGET_URL)
+    return [
+        p.merged(PresoRecord(**{k: _fresh(v) for k, v in pool[i % len(pool)].items()}))
+        for i, p in enumerate(presos)
+    ]
+
+
+def _retained(build: Callable[[], list]) -> tuple[int, list]:
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    gc.collect()
+    retained = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return retained, result
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Compara a memória de dicts e PresoRecord.")
+    parser.add_argument("--presos", type=int, default=5000)
+    parser.add_argument("--paginas", type=int, default=300, help="Páginas de detalhe distintas parseadas.")
+    args = parser.parse_args(argv)
+
+    html, pool = _sources(args.presos, args.paginas)
+    rows = []
+    for name, build in (("dict", _build_dicts), ("PresoRecord", _build_records)):
+        retained, result = _retained(lambda: build(html, pool))
+        pickled = len(pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL))
+        rows.append((name, retained, pickled, len(result)))
+        del result
+
+    base = rows[0]
+    for name, retained, pickled, n in rows:
+        print(
+            f"{name:<12} {n} presos  retido {retained / 1024 / 1024:7.2f} MiB ({retained / n:6.0f} B/preso)"
+            f"  pickle {pickled / 1024 / 1024:6.2f} MiB ({pickled / n:5.0f} B/preso)"
+            + ("" if name == base[0] else f"  [{retained / base[1] - 1:+.0%} memória, {pickled / base[2] - 1:+.0%} pickle]"),
+            flush=True,
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,179 @@
+"""Reprodução de uma execução completa de `process_task_func` a partir de um cassete.
+
+O cassete (gravado com `python main.py --gravar-cassete ARQ`) tem todas as
+requisições da execução original e a seleção feita na janela; aqui
+`process_task_func` roda numa thread, sem rede e sem janela: a seleção gravada é
+respondida automaticamente, o PDF vai para uma pasta temporária e cada repetição
+usa um diretório de estado novo (sem cache de páginas, sem diário, sem fotos em
+disco de execuções anteriores). Mostra o tempo de cada repetição e confere se os
+PDFs saíram idênticos. Sem cassete, `--fixture N` grava antes um a partir das
+fixtures (N presos), para rodar sem acesso ao Canaimé.
+
+    python -m benchmarks.replay coleta.cassete.jsonl.gz
+    python -m benchmarks.replay coleta.cassete.jsonl.gz --escala 0 --repeticoes 3
+    python -m benchmarks.replay --fixture 200 --latencia 0.02
+    CANAIME_PROFILE=cpu python -m benchmarks.replay coleta.cassete.jsonl.gz --repeticoes 1
+"""
+from __future__ import annotations
+
+import argparse
+import gzip
+import hashlib
+import os
+import queue as queue_mod
+import sys
+import tempfile
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import main as app_main
+from benchmarks.fake_http import mount_fake
+from benchmarks.fixtures import FakeSession
+from utils.cassette import CASSETTE_SUFFIX, read_cassette
+from utils.http_session import new_session
+from utils.local_state import STATE_DIR_ENV
+
+
+USERNAME = "usuario.bench"
+PASSWORD = "senha-bench-123"
+RUN_TIMEOUT_S = 600.0
+
+
+def _answer_selection(command_queue: queue_mod.Queue, selecao: List[str], alas: List[str]) -> None:
+    ids = [s.split(":", 1)[1] for s in selecao if s.startswith("preso:")]
+    if ids:
+        command_queue.put(("selected_presos", ids))
+    else:
+        command_queue.put(("selected_alas", selecao or alas[:2]))
+
+
+def _run(task_kwargs: Dict, selecao: List[str], workdir: str) -> Tuple[float, List[str], List[str]]:
+    """Roda uma execução completa; devolve (segundos, PDFs gerados, mensagens de status)."""
+    out_queue: queue_mod.Queue = queue_mod.Queue()
+    command_queue: queue_mod.Queue = queue_mod.Queue()
+    stop_event = threading.Event()
+    os.environ[STATE_DIR_ENV] = os.path.join(workdir, "estado")
+    pdf_path = os.path.join(workdir, "saida.pdf")
+    worker = threading.Thread(
+        target=app_main.process_task_func,
+        args=(True, out_queue, command_queue, stop_event, USERNAME, PASSWORD),
+        kwargs={"cache_paginas": False, **task_kwargs},
+        daemon=True,
+    )
+    status: List[str] = []
+    t0 = time.perf_counter()
+    worker.start()
+    deadline = time.monotonic() + RUN_TIMEOUT_S
+    while worker.is_alive() or not out_queue.empty():
+        if time.monotonic() > deadline:
+            stop_event.set()
+            raise RuntimeError(f"execução passou de {RUN_TIMEOUT_S:.0f} s")
+        try:
+            msg = out_queue.get(timeout=0.1)
+        except queue_mod.Empty:
+            continue
+        if msg[0] == "choose_alas":
+            _answer_selection(command_queue, selecao, msg[1])
+        elif msg[0] == "ask_save_path":
+            command_queue.put(("save_path", pdf_path))
+        elif msg[0] == "validation_error":
+            raise RuntimeError(f"pré-voo reprovou: {msg[1]}")
+        elif msg[0] == "error":
+            raise RuntimeError(msg[1])
+        elif msg[0] == "status":
+            status.append(msg[1])
+    elapsed = time.perf_counter() - t0
+    pdfs = sorted(os.path.join(workdir, f) for f in os.listdir(workdir) if f.endswith(".pdf"))
+    return elapsed, pdfs, status
+
+
+def _digest(paths: List[str]) -> str:
+    h = hashlib.md5()
+    for path in paths:
+        with open(path, "rb") as fh:
+            h.update(fh.read())
+    return h.hexdigest()
+
+
+def _record_fixture(path: str, presos: int, latency: float) -> str:
+    """Grava um cassete de uma execução contra as fixtures (sem rede); devolve o md5 do PDF gravado."""
+    original = app_main.new_session
+
+    def fake_new_session(*args, **kwargs):
+        session = new_session(*args, **kwargs)
+        mount_fake(session, FakeSession(n_presos=presos, n_fotos=2), latency=latency)
+        return session
+
+    app_main.new_session = fake_new_session
+    try:
+        with tempfile.TemporaryDirectory() as workdir:
+            elapsed, pdfs, _status = _run({"gravar_cassete": path, "processos_parsing": 0}, [], workdir)
+            digest = _digest(pdfs)
+    finally:
+        app_main.new_session = original
+    print(f"cassete gravado das fixtures em {elapsed:.2f} s (md5 do PDF {digest[:12]}): {path}", flush=True)
+    return digest
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Reproduz uma execução gravada em cassete e mede o tempo.")
+    parser.add_argument("cassete", nargs="?", default="", help=f"Arquivo {CASSETTE_SUFFIX} gravado.")
+    parser.add_argument("--fixture", type=int, default=0, metavar="N",
+                        help="Sem cassete: grava um antes, com N presos das fixtures.")
+    parser.add_argument("--latencia", type=float, default=0.01, help="Com --fixture: latência simulada na gravação.")
+    parser.add_argument("--escala", type=float, default=1.0, help="Multiplica o tempo gravado (0 = sem espera).")
+    parser.add_argument("--repeticoes", type=int, default=2)
+    parser.add_argument("--processos-parsing", type=int, default=0)
+    args = parser.parse_args(argv)
+    if not args.cassete and not args.fixture:
+        parser.error("informe um cassete ou --fixture N")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cassete = args.cassete or os.path.join(tmp, "fixture" + CASSETTE_SUFFIX)
+        original = None
+        if not args.cassete:
+            original = _record_fixture(cassete, args.fixture, args.latencia)
+            with gzip.open(cassete, "rt", encoding="utf-8") as fh:
+                gravado = fh.read()
+            vazou = [s for s in (USERNAME, PASSWORD) if s in gravado]
+            if vazou:
+                print(f"FALHA: credenciais no cassete: {vazou}")
+                return 1
+        header, exchanges, bodies, meta = read_cassette(cassete)
+        selecao = meta.get("selecao") or []
+        task_kwargs = {
+            "reproduzir_cassete": cassete,
+            "escala_tempo": args.escala,
+            "processos_parsing": args.processos_parsing,
+            "unidades": header.get("unidades") or None,
+            "campos": header.get("campos") or "completo",
+        }
+        gravado_s = max((e.get("inicio", 0.0) + e.get("duracao", 0.0) for e in exchanges), default=0.0)
+        print(f"{len(exchanges)} requisições, {len(bodies)} corpos distintos, {gravado_s:.2f} s de rede gravados; "
+              f"seleção: {', '.join(selecao) or '(duas primeiras alas)'}; tempo x{args.escala:g}", flush=True)
+
+        digests = []
+        for rep in range(1, args.repeticoes + 1):
+            workdir = tempfile.mkdtemp(dir=tmp)
+            elapsed, pdfs, status = _run(task_kwargs, selecao, workdir)
+            if not pdfs:
+                print(f"FALHA: repetição {rep} não gerou PDF ({status[-1] if status else 'sem status'})")
+                return 1
+            digests.append(_digest(pdfs))
+            fora = next((s for s in status if s.startswith("Cassete reproduzido")), "")
+            print(f"repetição {rep}: {elapsed:6.2f} s  {len(pdfs)} PDF(s)  md5 {digests[-1][:12]}", flush=True)
+            if fora:
+                print(f"    {fora}", flush=True)
+    if len(set(digests)) > 1:
+        print("FALHA: os PDFs das repetições diferem.")
+        return 1
+    if original is not None and digests[0] != original:
+        print("FALHA: o PDF reproduzido difere do PDF da gravação.")
+        return 1
+    print("OK: PDFs idênticos em todas as repetições" + (" e à gravação." if original else "."))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
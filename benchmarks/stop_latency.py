@@ -0,0 +1,148 @@
+"""Verifica a latência de parada do processo de trabalho (`stop_event`).
+
+Roda `process_task_func` contra o servidor falso das fixtures, sinaliza o
+`stop_event` em fases diferentes e mede quanto tempo o trabalho leva para
+terminar. Falha (código de saída 1) se alguma fase passar do limite, se sobrar
+thread não-daemon (que impediria o processo de sair) ou se um PDF parcial for gravado.
+
+    python -m benchmarks.stop_latency
+    python -m benchmarks.stop_latency --limite 0.5
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import queue as queue_mod
+import sys
+import tempfile
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+import main as app_main
+from benchmarks.fake_http import mount_fake
+from benchmarks.fixtures import FakeSession
+from utils.http_session import new_session
+
+
+DEFAULT_LIMIT_S = 1.0
+
+
+def _run_scenario(
+    name: str,
+    latency: float,
+    n_presos: int,
+    trigger: Callable[[tuple], bool],
+    out_dir: str,
+    answer_selection: bool = True,
+    slow_pattern: Optional[str] = None,
+) -> Dict[str, object]:
+    """Executa o fluxo completo e sinaliza a parada quando `trigger(mensagem)` for verdadeiro."""
+    server = FakeSession(n_presos=n_presos, n_fotos=2)
+    original = app_main.new_session
+
+    def fake_new_session(*args, **kwargs):
+        session = new_session(*args, **kwargs)
+        mount_fake(session, server, latency=latency, slow_pattern=slow_pattern)
+        return session
+
+    out_queue: queue_mod.Queue = queue_mod.Queue()
+    command_queue: queue_mod.Queue = queue_mod.Queue()
+    stop_event = threading.Event()
+    pdf_path = os.path.join(out_dir, f"{name}.pdf")
+    threads_before = {t.ident for t in threading.enumerate()}
+
+    app_main.new_session = fake_new_session
+    try:
+        worker = threading.Thread(
+            target=app_main.process_task_func,
+            args=(True, out_queue, command_queue, stop_event, "usuario", "senha"),
+            daemon=True,
+        )
+        worker.start()
+        stop_at: Optional[float] = None
+        deadline = time.monotonic() + 120
+        while worker.is_alive() and time.monotonic() < deadline:
+            try:
+                msg = out_queue.get(timeout=0.05)
+            except queue_mod.Empty:
+                continue
+            if msg[0] == "choose_alas" and answer_selection:
+                command_queue.put(("selected_alas", list(msg[1])))
+            elif msg[0] == "ask_save_path":
+                command_queue.put(("save_path", pdf_path))
+            if stop_at is None and trigger(msg):
+                stop_at = time.monotonic()
+                stop_event.set()
+        worker.join(timeout=30)
+        finished = time.monotonic()
+    finally:
+        app_main.new_session = original
+
+    lingering = [
+        t.name for t in threading.enumerate()
+        if t.ident not in threads_before and t.is_alive() and not t.daemon
+    ]
+    return {
+        "cenario": name,
+        "latencia_s": (finished - stop_at) if stop_at is not None else float("nan"),
+        "sinalizado": stop_at is not None,
+        "threads_nao_daemon": lingering,
+        "pdf_parcial": os.path.exists(pdf_path),
+    }
+
+
+SCENARIOS = {
+    # Requisição de detalhe "pendurada" (servidor leva 30 s para responder)
+    "requisicao_lenta": dict(
+        latency=30.0,
+        slow_pattern=r"cadastro\.php|Informes_LER\.php",
+        n_presos=20,
+        trigger=lambda m: m[0] == "status" and "Total de presos nas alas" in m[1],
+    ),
+    # Parada durante a espera da seleção de alas (com pré-carregamento em andamento)
+    "selecao_alas": dict(
+        latency=5.0,
+        slow_pattern=r"cadastro\.php|Informes_LER\.php|/fotos/",
+        n_presos=20,
+        trigger=lambda m: m[0] == "status" and "Aguardando seleção" in m[1],
+        answer_selection=False,
+    ),
+    # Parada no meio da renderização do PDF
+    "renderizacao": dict(
+        latency=0.0,
+        n_presos=300,
+        trigger=lambda m: m[0] == "status" and m[1].startswith("Gerando PDF"),
+    ),
+}
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Mede a latência de parada do processo de trabalho.")
+    parser.add_argument("--limite", type=float, default=DEFAULT_LIMIT_S, help="Latência máxima aceita, em segundos.")
+    args = parser.parse_args(argv)
+
+    failures = 0
+    with tempfile.TemporaryDirectory() as out_dir:
+        for name, cfg in SCENARIOS.items():
+            result = _run_scenario(name, out_dir=out_dir, **cfg)
+            ok = (
+                result["sinalizado"]
+                and result["latencia_s"] <= args.limite
+                and not result["threads_nao_daemon"]
+                and not result["pdf_parcial"]
+            )
+            failures += 0 if ok else 1
+            print(
+                f"{'ok  ' if ok else 'FALHA'} {name:<18} parada em {result['latencia_s']:.3f} s "
+                f"(limite {args.limite:.1f} s)"
+                + (f"  threads presas: {result['threads_nao_daemon']}" if result["threads_nao_daemon"] else "")
+                + ("  PDF parcial gravado" if result["pdf_parcial"] else "")
+                + ("" if result["sinalizado"] else "  gatilho não ocorreu"),
+                flush=True,
+            )
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
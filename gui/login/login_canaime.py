@@ -7,6 +7,7 @@ import logging
 import threading
 import sys
 import os
+import subprocess
 
 from multiprocessing import Process, Queue, Event
 from queue import Empty
@@ -34,8 +35,17 @@ except ImportError as e:
 # URL de login do sistema Canaimé (não mais usada diretamente aqui)
 # URL_LOGIN_CANAIME = 'https://canaime.com.br/sgp2rr/login/login_principal.php'
 
+from gui.selectors.roster_index import RosterIndex, roster_label
+from utils.run_estimates import describe_estimate
+
 logger = Logger.get_logger()
 
+# Tempo máximo de espera pelo processo filho após pedir a parada
+STOP_TIMEOUT_S = 3.0
+
+# Intervalo mínimo entre avisos de digitação ao processo pré-aquecido
+WARM_PING_S = 5.0
+
 class LogHandler(logging.Handler):
     def __init__(self, text_widget):
         super().__init__()
@@ -59,7 +69,7 @@ class LogHandler(logging.Handler):
             pass
 
 class LoginApp:
-    def __init__(self, root, headless, process_task_func):
+    def __init__(self, root, headless, process_task_func, prewarm=False):
         self.root = root
         self.login_successful = False
         self.frames = itertools.cycle(["◐", "◓", "◑", "◒"])
@@ -69,9 +79,13 @@ class LoginApp:
         self.process_queue = Queue() # Queue for communication from child process (child -> UI)
         self.command_queue = Queue() # Queue for commands from UI to child process (UI -> child)
         self.process_stop_event = Event() # Event to signal child process to stop
+        self.process = None  # Processo filho em execução (para encerramento limitado no tempo)
         self.process_finalized = False  # Flag para evitar finalização duplicada
         self._login_error_window = None  # Referência para janela de erro de login
         self._validation_error_window = None  # Referência para janela de erro de validação
+        self.prewarm = prewarm  # Abrir o processo filho junto com a janela (aquece conexão e formulário de login)
+        self._processo_aquecido = False  # Processo filho aberto e aguardando as credenciais
+        self._ultimo_aviso_digitacao = 0.0
 
         self.root.title(f"{APP_NAME} {APP_VERSION}")
         self.root.geometry("400x600")
@@ -81,6 +95,8 @@ class LoginApp:
         self.center_window()
         self.create_widgets()
         self.bind_events()
+        if self.prewarm:
+            self._preparar_processo()
 
         # Add the custom handler to the logger
         # self.log_handler = LogHandler(self.log_text)
@@ -218,6 +234,53 @@ class LoginApp:
 
     def bind_events(self):
         self.root.bind('<Return>', lambda event: self.iniciar_login()) # Bind Enter key to login
+        self.username_entry.bind('<Key>', self._avisar_digitacao, add='+')
+        self.password_entry.bind('<Key>', self._avisar_digitacao, add='+')
+
+    def _preparar_processo(self):
+        """Abre o processo de trabalho antes do clique, sem credenciais.
+
+        Enquanto o operador digita, o processo resolve o servidor, abre conexões
+        keep-alive e busca o formulário de login; usuário e senha chegam depois pelo
+        comando "credentials". Se não abrir, o clique em Login abre o processo normalmente.
+        """
+        if self.process is not None and self.process.is_alive():
+            return
+        try:
+            p = Process(
+                target=self.process_task_func,
+                args=(
+                    self.headless,
+                    self.process_queue,
+                    self.command_queue,
+                    self.process_stop_event,
+                    None,
+                    None,
+                ),
+            )
+            p.start()
+        except Exception as e:
+            logger.warning(f"Não foi possível abrir o processo de trabalho antecipadamente: {e}")
+            return
+        self.process = p
+        self._processo_aquecido = True
+
+    def _rearmar_processo(self):
+        """Após um erro (ex.: senha errada), prepara um novo processo aquecido para a próxima tentativa."""
+        if self.animation_running or self.process_stop_event.is_set():
+            return  # nova tentativa já em andamento ou aplicativo encerrando
+        if self.process is not None and self.process.is_alive():
+            self.root.after(200, self._rearmar_processo)
+            return
+        self._preparar_processo()
+
+    def _avisar_digitacao(self, event=None):
+        """Operador digitando: o processo aquecido renova conexões que o servidor pode ter fechado."""
+        agora = time.monotonic()
+        if not self._processo_aquecido or agora - self._ultimo_aviso_digitacao < WARM_PING_S:
+            return
+        self._ultimo_aviso_digitacao = agora
+        self.command_queue.put(("warm_up", None))
 
     def set_placeholder(self, entry, placeholder_text):
         entry.insert(0, placeholder_text)
@@ -274,6 +337,14 @@ class LoginApp:
 
         logger.info("Iniciando processo de login...")
 
+        if self._processo_aquecido and self.process is not None and self.process.is_alive():
+            # Processo aberto com a janela: conexão e formulário de login já estão prontos
+            self._processo_aquecido = False
+            self.command_queue.put(("credentials", (username, password)))
+            self.root.after(100, self.verificar_fila)
+            return
+        self._processo_aquecido = False
+
         try:
             # Iniciar o processo em segundo plano
             p = Process(
@@ -288,6 +359,7 @@ class LoginApp:
                 ),
             )
             p.start()
+            self.process = p
             
             self.root.after(100, self.verificar_fila)
         except Exception as e:
@@ -337,7 +409,9 @@ class LoginApp:
                     if hasattr(self, '_finalization_countdown'):
                         delattr(self, '_finalization_countdown')
                     # Exibir janela de erro de validação ANTES de marcar como finalizado
-                    self.show_validation_error(message_content[0], message_content[1])
+                    self.show_validation_error(
+                        message_content[0], message_content[1], message_content[2] if len(message_content) > 2 else None
+                    )
                     # Marcar como finalizado APÓS exibir a janela
                     self.process_finalized = True
                     # Definir stop_event APÓS processar a mensagem (similar ao erro de login)
@@ -348,12 +422,18 @@ class LoginApp:
                 elif message_type == "choose_alas":
                     # Exibir janela para seleção de alas
                     alas = message_content[0] if message_content else []
-                    self.show_ala_selection(alas)
+                    roster = message_content[1] if len(message_content) > 1 else None
+                    resumo = message_content[2] if len(message_content) > 2 else None
+                    self.show_ala_selection(alas, roster, resumo)
                 elif message_type == "ask_save_path":
                     # Perguntar onde salvar o PDF
                     suggested_name = message_content[0] if message_content else "cara_cracha.pdf"
                     path = self.ask_save_path(suggested_name)
                     self.command_queue.put(("save_path", path))
+                elif message_type == "draft_ready":
+                    # Rascunho pronto: abrir no visualizador e perguntar se gera o PDF final
+                    decisao = self.show_draft_confirmation(message_content[0], message_content[1])
+                    self.command_queue.put(("draft_decision", decisao))
             except Empty:
                 # Sem mensagens ainda, continuar verificando
                 pass
@@ -397,6 +477,8 @@ class LoginApp:
         elif title == "Erro":
             self.add_status_message(f"❌ ERRO: {message}")
             logger.info(f"Detectado erro: {message}")
+            if self.prewarm:
+                self.root.after(200, self._rearmar_processo)
             
             # Verificar se é erro de login para exibir janela especial
             if "login" in message.lower() or "credenciais" in message.lower():
@@ -537,6 +619,7 @@ class LoginApp:
         if not self.process_stop_event.is_set():
             self.process_stop_event.set()
             logger.info("Encerrando processos em segundo plano...")
+        self._aguardar_processo_filho()
         
         # Encerrar a aplicação completamente
         logger.info("Encerrando aplicação...")
@@ -544,6 +627,25 @@ class LoginApp:
         import sys
         sys.exit(0)  # Força o encerramento completo do programa
 
+    def _aguardar_processo_filho(self):
+        """Espera o processo filho sair após o stop_event, por no máximo STOP_TIMEOUT_S.
+
+        O filho cancela requisições em andamento e sai sozinho em poucos décimos de
+        segundo; se não sair no prazo, é terminado para que o encerramento não trave.
+        """
+        p = self.process
+        if p is None:
+            return
+        try:
+            p.join(timeout=STOP_TIMEOUT_S)
+            if p.is_alive():
+                logger.warning("Processo filho não encerrou a tempo; forçando término.")
+                p.terminate()
+                p.join(timeout=1.0)
+        except Exception:
+            pass
+        self.process = None
+
     def on_closing(self):
         if messagebox.askokcancel("Sair", "Você deseja sair da aplicação?"):
             self.encerrar_aplicativo()
@@ -555,8 +657,13 @@ class LoginApp:
         self.status_text.see(tk.END)
         self.status_text.config(state='disabled')
 
-    def show_validation_error(self, title, unmapped_prisoners):
-        """Exibe erro de validação com lista de presos não mapeados"""
+    def show_validation_error(self, title, unmapped_prisoners, explanation=None):
+        """Exibe erro de validação com lista de presos não mapeados.
+
+        Presos com a chave 'Campos' vêm do pré-voo de seletores (campos vazios na
+        amostra); `explanation` substitui o texto explicativo padrão.
+        """
+        drift = any('Campos' in p for p in (unmapped_prisoners or []))
         # Verificar se já existe uma janela de erro aberta
         if hasattr(self, '_validation_error_window') and self._validation_error_window is not None and self._validation_error_window.winfo_exists():
             logger.info("Janela de erro de validação já existe, não criando nova")
@@ -608,7 +715,7 @@ class LoginApp:
         # Mensagem explicativa
         msg_label = tk.Label(
             validation_window,
-            text="Os seguintes presos não puderam ser mapeados para alas/celas válidas:",
+            text=explanation or "Os seguintes presos não puderam ser mapeados para alas/celas válidas:",
             font=('Segoe UI', 10),
             bg='#1b2838',
             fg='#ffffff',
@@ -640,22 +747,33 @@ class LoginApp:
 
         # Formatar e inserir a lista de presos
         formatted_list = []
-        formatted_list.append("PRESOS NÃO MAPEADOS ENCONTRADOS:")
+        formatted_list.append("PRESOS COM CAMPOS VAZIOS NA AMOSTRA:" if drift else "PRESOS NÃO MAPEADOS ENCONTRADOS:")
         formatted_list.append("=" * 70)
         formatted_list.append("")
         
         for i, prisoner in enumerate(unmapped_prisoners, 1):
             formatted_list.append(f"{i:2d}. Código: {prisoner['Código']:<8} | Nome: {prisoner['Nome']:<30} | Ala: {prisoner['Ala']:<10} | Cela: {prisoner['Cela']}")
+            if prisoner.get('Campos'):
+                formatted_list.append(f"    Campos vazios: {prisoner['Campos']}")
         
         formatted_list.append("")
         formatted_list.append("=" * 70)
-        formatted_list.append(f"TOTAL: {len(unmapped_prisoners)} presos não mapeados")
-        formatted_list.append("")
-        formatted_list.append("INSTRUÇÕES:")
-        formatted_list.append("1. Copie esta lista usando o botão 'Copiar Lista'")
-        formatted_list.append("2. Verifique as alas e celas no sistema Canaimé")
-        formatted_list.append("3. Atualize a configuração das unidades se necessário")
-        formatted_list.append("4. Execute o programa novamente")
+        if drift:
+            formatted_list.append(f"TOTAL: {len(unmapped_prisoners)} presos da amostra com campos vazios")
+            formatted_list.append("")
+            formatted_list.append("INSTRUÇÕES:")
+            formatted_list.append("1. Copie esta lista usando o botão 'Copiar Lista'")
+            formatted_list.append("2. Abra as páginas de cadastro/informes desses presos no Canaimé e confira se os dados existem")
+            formatted_list.append("3. Se existem, o HTML mudou: ajuste os seletores em gui/selectors/preso_details.py")
+            formatted_list.append("4. Se faltam de verdade, execute novamente com --sem-preflight")
+        else:
+            formatted_list.append(f"TOTAL: {len(unmapped_prisoners)} presos não mapeados")
+            formatted_list.append("")
+            formatted_list.append("INSTRUÇÕES:")
+            formatted_list.append("1. Copie esta lista usando o botão 'Copiar Lista'")
+            formatted_list.append("2. Verifique as alas e celas no sistema Canaimé")
+            formatted_list.append("3. Atualize a configuração das unidades se necessário")
+            formatted_list.append("4. Execute o programa novamente")
 
         list_text.insert(tk.END, "\n".join(formatted_list))
         list_text.config(state='disabled')
@@ -694,22 +812,31 @@ class LoginApp:
         close_button.pack(pady=5)
 
         # Adicionar mensagem no status
-        self.add_status_message(f"ERRO: {len(unmapped_prisoners)} presos não mapeados encontrados. Verifique a janela de erro.")
+        if drift:
+            self.add_status_message(f"ERRO: {title}. Verifique a janela de erro.")
+        else:
+            self.add_status_message(f"ERRO: {len(unmapped_prisoners)} presos não mapeados encontrados. Verifique a janela de erro.")
 
         logger.info("Exibindo janela de erro de validação (grab_set + wait_window)")
         validation_window.grab_set()
         validation_window.wait_window()
         logger.info("Janela de erro de validação foi fechada")
 
-    def show_ala_selection(self, alas):
-        """Exibe janela para seleção de uma ou mais alas e envia a seleção para o processo filho."""
+    def show_ala_selection(self, alas, roster=None, resumo=None):
+        """Exibe janela para seleção de uma ou mais alas e envia a seleção para o processo filho.
+
+        Com `roster` (a listagem de presos), a janela também permite buscar e marcar
+        presos específicos; nesse caso só eles são coletados ("selected_presos").
+        Com `resumo` ({"contagens", "em_cache", "modelo"}), cada ala mostra quantos
+        presos tem e a seleção mostra o tempo e o tamanho do PDF estimados.
+        """
         if not alas:
             self.add_status_message("ERRO: Nenhuma ala encontrada.")
             return
 
         sel_win = tk.Toplevel(self.root)
         sel_win.title("Selecione as Alas")
-        sel_win.geometry("520x520")
+        sel_win.geometry("560x780" if roster else "520x520")
         sel_win.configure(bg="#1E2C44")
         sel_win.attributes('-topmost', True)
 
@@ -750,15 +877,41 @@ class LoginApp:
         )
         lb_right.pack(fill="both", expand=True)
 
+        contagens = (resumo or {}).get("contagens") or {}
+        em_cache = (resumo or {}).get("em_cache") or {}
+        modelo = (resumo or {}).get("modelo")
         alas_sorted = sorted(set(alas))
         mid = (len(alas_sorted) + 1) // 2
-        for a in alas_sorted[:mid]:
-            lb_left.insert(tk.END, a)
-        for a in alas_sorted[mid:]:
-            lb_right.insert(tk.END, a)
+        colunas = ((lb_left, alas_sorted[:mid]), (lb_right, alas_sorted[mid:]))
+        for lb, nomes in colunas:
+            for a in nomes:
+                lb.insert(tk.END, f"{a}  ({contagens[a]})" if a in contagens else a)
+
+        def selecionadas():
+            return [nomes[i] for lb, nomes in colunas for i in lb.curselection()]
+
+        estimativa = tk.Label(
+            sel_win,
+            text="",
+            font=('Segoe UI', 11),
+            bg="#1E2C44",
+            fg="#BFD4F0"
+        )
+        if contagens and modelo:
+            estimativa.pack(pady=(0, 4))
+
+            def atualizar_estimativa(_event=None):
+                escolha = selecionadas()
+                total = sum(contagens.get(a, 0) for a in escolha)
+                cache = sum(em_cache.get(a, 0) for a in escolha)
+                estimativa.config(text=describe_estimate(total, cache, modelo))
+
+            for lb, _nomes in colunas:
+                lb.bind("<<ListboxSelect>>", atualizar_estimativa)
+            atualizar_estimativa()
 
         def confirm():
-            selections = [lb_left.get(i) for i in lb_left.curselection()] + [lb_right.get(i) for i in lb_right.curselection()]
+            selections = selecionadas()
             if not selections:
                 messagebox.showwarning("Atenção", "Selecione ao menos uma ala.", parent=sel_win)
                 return
@@ -778,6 +931,9 @@ class LoginApp:
             command=confirm
         ).pack(pady=10)
 
+        if roster:
+            self._build_roster_search(sel_win, roster)
+
         # Centralizar janela
         sel_win.update_idletasks()
         width = sel_win.winfo_width()
@@ -789,6 +945,121 @@ class LoginApp:
         sel_win.grab_set()
         sel_win.wait_window()
 
+    def _build_roster_search(self, sel_win, roster):
+        """Busca na listagem (código, nome ou ala/cela) para marcar presos específicos."""
+        index = RosterIndex(roster)
+        show_unit = len({p.get("unidade", "") for p in roster}) > 1
+        picked = {}  # id -> preso marcado (mantido entre buscas)
+        shown = []  # presos exibidos na lista, na mesma ordem das linhas
+        pending = [None]  # after() da busca adiada enquanto digita
+        paused = [False]  # pré-carregamento do processo filho já interrompido?
+
+        tk.Label(
+            sel_win,
+            text="Ou busque presos específicos (código, nome ou ala/cela):",
+            font=('Segoe UI', 11, 'bold'),
+            bg="#1E2C44",
+            fg="#FFFFFF"
+        ).pack(pady=(5, 2))
+
+        query_var = tk.StringVar()
+        entry = tk.Entry(sel_win, textvariable=query_var, font=('Segoe UI', 12))
+        entry.pack(fill="x", padx=10)
+
+        lb_results = tk.Listbox(
+            sel_win,
+            selectmode=tk.MULTIPLE,
+            bg="#2B3C57",
+            fg="#FFFFFF",
+            font=('Segoe UI', 11),
+            height=8,
+            activestyle='none',
+            exportselection=False
+        )
+        lb_results.pack(fill="both", expand=True, padx=10, pady=5)
+
+        picked_label = tk.Label(sel_win, text="Nenhum preso marcado", font=('Segoe UI', 10), bg="#1E2C44", fg="#FFFFFF")
+        picked_label.pack()
+
+        def refresh():
+            pending[0] = None
+            query = query_var.get().strip()
+            # Sem busca, mostra os já marcados
+            shown[:] = index.search(query) if query else list(picked.values())
+            lb_results.delete(0, tk.END)
+            for i, preso in enumerate(shown):
+                lb_results.insert(tk.END, roster_label(preso, show_unit))
+                if preso.get("id") in picked:
+                    lb_results.selection_set(i)
+
+        def on_type(_event=None):
+            if not paused[0]:
+                # Busca de presos específicos: o pré-carregamento de alas inteiras deixa de valer
+                self.command_queue.put(("pause_prefetch", None))
+                paused[0] = True
+            if pending[0] is not None:
+                sel_win.after_cancel(pending[0])
+            pending[0] = sel_win.after(150, refresh)
+
+        def on_select(_event=None):
+            selected = set(lb_results.curselection())
+            for i, preso in enumerate(shown):
+                if i in selected:
+                    picked[preso.get("id")] = preso
+                else:
+                    picked.pop(preso.get("id"), None)
+            picked_label.config(text=f"{len(picked)} preso(s) marcado(s)" if picked else "Nenhum preso marcado")
+
+        def confirm_presos():
+            if not picked:
+                messagebox.showwarning("Atenção", "Marque ao menos um preso.", parent=sel_win)
+                return
+            ids = [p.get("id") for p in roster if p.get("id") in picked]
+            self.command_queue.put(("selected_presos", ids))
+            self.add_status_message(f"Presos selecionados: {', '.join(ids)}")
+            sel_win.destroy()
+
+        query_var.trace_add("write", lambda *_: on_type())
+        lb_results.bind("<<ListboxSelect>>", on_select)
+
+        tk.Button(
+            sel_win,
+            text="Gerar só os presos marcados",
+            font=('Segoe UI', 12, 'bold'),
+            bg="#27ae60",
+            fg='white',
+            relief='flat',
+            cursor='hand2',
+            command=confirm_presos
+        ).pack(pady=10)
+
+    def _abrir_arquivo(self, path: str) -> None:
+        """Abre o arquivo no visualizador padrão do sistema."""
+        try:
+            if sys.platform.startswith("win"):
+                os.startfile(path)
+            elif sys.platform == "darwin":
+                subprocess.Popen(["open", path])
+            else:
+                subprocess.Popen(["xdg-open", path])
+        except Exception as e:
+            self.add_status_message(f"Não foi possível abrir o rascunho ({e}); abra manualmente: {path}")
+
+    def show_draft_confirmation(self, path: str, total: int) -> str:
+        """Abre o rascunho e devolve a decisão: "final", "alas" ou "cancelar"."""
+        self._abrir_arquivo(path)
+        resposta = messagebox.askyesnocancel(
+            "Rascunho",
+            f"Rascunho com {total} página(s) aberto:\n{path}\n\n"
+            "Sim: coletar os detalhes e gerar o PDF final\n"
+            "Não: escolher outras alas\n"
+            "Cancelar: encerrar sem gerar o PDF",
+            parent=self.root,
+        )
+        if resposta is None:
+            return "cancelar"
+        return "final" if resposta else "alas"
+
     def ask_save_path(self, suggested_name: str) -> str:
         # Caixa de diálogo para salvar PDF (centralizada e topmost)
         dialog = tk.Toplevel(self.root)
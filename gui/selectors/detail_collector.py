@@ -0,0 +1,312 @@
+
+from __future__ import annotations
+
+import threading
+from collections import Counter
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, Iterable, List, MutableMapping, Optional, Tuple
+
+from gui.selectors.parse_pool import ParsePool
+from gui.selectors.preso_details import DETAIL_PAGES, fetch_detail_page
+from utils.cancellation import OperationCancelled, raise_if_cancelled
+from utils.pdf_builder import _download_image_to_bytes
+from utils.photo_store import PhotoData, SpooledPhotoStore
+from utils.preso_record import FIELD_SETS, PresoRecord, resolve_field_set
+
+
+# Limite de presos pré-carregados enquanto o operador escolhe as alas.
+PREFETCH_MAX_PRESOS = 400
+
+
+def prefetch_order(
+    presos: List[Dict[str, str]],
+    preferred_alas: Iterable[str] = (),
+    key: Callable[[Dict[str, str]], str] = lambda p: p.get("ala", ""),
+) -> List[Dict[str, str]]:
+    """Ordena os presos para o pré-carregamento especulativo.
+
+    Primeiro as alas escolhidas da última vez (se ainda existirem), depois as demais
+    da maior para a menor. Sem histórico, começa pela maior ala. `key` dá o rótulo
+    da ala de cada preso (no modo lote, "unidade · ala").
+    """
+    sizes = Counter(key(p) for p in presos if key(p))
+    preferred = [a for a in preferred_alas if a in sizes]
+    rest = sorted((a for a in sizes if a not in preferred), key=lambda a: (-sizes[a], a))
+    rank = {ala: i for i, ala in enumerate(preferred + rest)}
+    ordered = [p for p in presos if key(p) in rank]
+    ordered.sort(key=lambda p: rank[key(p)])
+    return ordered
+
+
+class DetailCollector:
+    """Busca e memoriza os detalhes (cadastro + informes) e as fotos dos presos.
+
+    Os resultados ficam em cache durante toda a execução, de modo que o que foi
+    pré-carregado em segundo plano é reaproveitado pela coleta definitiva. Uma busca
+    em andamento no pré-carregamento é aguardada em vez de repetida. `field_set`
+    (ver `utils.preso_record.FIELD_SETS`) decide quais páginas de detalhe são
+    buscadas; no conjunto "basico" nenhuma é. As fotos ficam em `photos`, por padrão
+    um `SpooledPhotoStore` (memória até o orçamento, o resto em arquivo temporário).
+    As páginas baixadas são interpretadas pelo `parser` (`ParsePool`); sem ele, na
+    própria thread de coleta.
+    """
+
+    def __init__(
+        self,
+        session,
+        field_set: str = "completo",
+        photos: Optional[MutableMapping[str, PhotoData]] = None,
+        parser: Optional[ParsePool] = None,
+    ):
+        self.session = session
+        self.field_set = resolve_field_set(field_set)
+        self._pages = [page for page in DETAIL_PAGES if page in FIELD_SETS[self.field_set]]
+        self.parser = parser if parser is not None else ParsePool(workers=0)
+        self.photos: MutableMapping[str, PhotoData] = photos if photos is not None else SpooledPhotoStore()
+        self._details: Dict[str, PresoRecord] = {}
+        self._inflight: Dict[str, Future] = {}
+        # Uma busca por URL de foto; quem pede a mesma URL enquanto ela está em andamento aguarda o resultado
+        self._photo_inflight: Dict[str, Future] = {}
+        self._photo_first: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._prefetch_stop = threading.Event()
+        self._prefetch_thread: Optional[threading.Thread] = None
+        self.journal = None
+        self.prefetched = 0
+        self.prefetched_photos = 0
+        self.reused = 0
+        self.restored = 0
+        self.shared_photos = 0
+
+    def _fetch_details(self, pid: str) -> PresoRecord:
+        # A página seguinte é baixada enquanto a anterior é interpretada no pool
+        stop_event = getattr(self.session, "stop_event", None)
+        pending = [
+            self.parser.submit(page, *fetch_detail_page(self.session, page, pid), stop_event=stop_event)
+            for page in self._pages
+        ]
+        det: Dict[str, str] = {}
+        for future in pending:
+            det.update(self.parser.result(future, stop_event))
+        return PresoRecord(**det)
+
+    def _fetch_and_store(self, pid: str) -> PresoRecord:
+        det = self._fetch_details(pid)
+        with self._lock:
+            self._details[pid] = det
+        return det
+
+    def get_details(self, pid: str) -> PresoRecord:
+        """Detalhes do preso, do cache, de uma busca em andamento ou da rede.
+
+        Uma busca por preso de cada vez: quem pede o mesmo código enquanto ela está em
+        andamento (pré-carregamento ou outra thread da coleta) aguarda o mesmo resultado.
+        """
+        with self._lock:
+            cached = self._details.get(pid)
+            future = self._inflight.get(pid) if cached is None else None
+            owner = cached is None and future is None
+            if owner:
+                future = self._inflight[pid] = Future()
+            elif cached is not None:
+                self.reused += 1
+        if cached is not None:
+            return cached
+        if not owner:
+            try:
+                det = future.result()
+                with self._lock:
+                    self.reused += 1
+                return det
+            except Exception:
+                return self._fetch_and_store(pid)  # falhou na outra busca: tenta de novo
+        try:
+            det = self._fetch_and_store(pid)
+            future.set_result(det)
+            return det
+        except BaseException as exc:
+            future.set_exception(exc)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(pid, None)
+
+    def cached_ids(self) -> frozenset:
+        """Códigos dos presos cujos detalhes já estão em cache."""
+        with self._lock:
+            return frozenset(self._details)
+
+    def restore(self, journal) -> int:
+        """Carrega o diário de uma execução interrompida e passa a registrar nele.
+
+        Presos do diário não são buscados de novo; devolve quantos foram restaurados.
+        """
+        details, _photos = journal.load(photos=self.photos)
+        with self._lock:
+            self._details.update((pid, PresoRecord.from_mapping(det)) for pid, det in details.items())
+        self.journal = journal
+        self.restored = len(details)
+        return self.restored
+
+    def _count_shared(self, url: str, pid: str) -> None:
+        with self._lock:
+            first = self._photo_first.get(url)
+            if first is not None and pid and first != pid:
+                self.shared_photos += 1
+
+    def get_photo(self, url: str, pid: str = "") -> Optional[PhotoData]:
+        """Foto do cache, de um download em andamento ou da rede; falhas devolvem None (foto em branco no PDF).
+
+        Presos diferentes com a mesma URL (foto genérica) fazem um único download; os
+        que chegam depois de `pid` contam em `shared_photos`. Falhas não ficam
+        memorizadas: o próximo pedido da URL tenta de novo.
+        """
+        if not url:
+            return None
+        cached = self.photos.get(url)
+        if cached is not None:
+            self._count_shared(url, pid)
+            return cached
+        with self._lock:
+            future = self._photo_inflight.get(url)
+            owner = future is None
+            if owner:
+                future = self._photo_inflight[url] = Future()
+                self._photo_first.setdefault(url, pid)
+        if not owner:
+            data = future.result()
+            self._count_shared(url, pid)
+            return data
+        try:
+            try:
+                data = _download_image_to_bytes(self.session, url)
+            except OperationCancelled:
+                raise
+            except Exception:
+                data = None
+            if data is not None:
+                self.photos[url] = data
+            future.set_result(data)
+            return data
+        except BaseException as exc:
+            future.set_exception(exc)
+            raise
+        finally:
+            with self._lock:
+                self._photo_inflight.pop(url, None)
+
+    @property
+    def max_workers(self) -> int:
+        """Threads de coleta: o teto do limitador da sessão (ele decide a concorrência real)."""
+        limiter = getattr(self.session, "limiter", None)
+        return limiter.maximum if limiter is not None else 1
+
+    def collect(
+        self,
+        presos: List[Dict[str, str]],
+        stop_event=None,
+        on_progress: Optional[Callable[[int, int, str], None]] = None,
+    ) -> List[Tuple[Dict[str, str], Optional[Dict[str, str]], Optional[BaseException]]]:
+        """Coleta detalhes e fotos em paralelo, mantendo a ordem de `presos`.
+
+        Devolve `(preso, detalhes, erro)` por preso (detalhes None quando houve erro).
+        `on_progress(concluidos, total, pid)` é chamado a cada preso terminado. Se
+        `stop_event` for sinalizado, as tarefas pendentes são canceladas e
+        `OperationCancelled` é levantada.
+        """
+        total = len(presos)
+        results: List[Tuple[Dict[str, str], Optional[Dict[str, str]], Optional[BaseException]]] = [
+            (p, None, None) for p in presos
+        ]
+
+        def task(preso: Dict[str, str]) -> Dict[str, str]:
+            pid = (preso.get("id") or "").strip()
+            url = preso.get("imagem_link", "")
+            det = self.get_details(pid)
+            photo = self.get_photo(url, pid)
+            if self.journal is not None:
+                self.journal.append(pid, det, url, photo)
+            return det
+
+        executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="coleta")
+        try:
+            futures = {executor.submit(task, p): i for i, p in enumerate(presos)}
+            done = 0
+            for future in as_completed(futures):
+                idx = futures[future]
+                preso = presos[idx]
+                try:
+                    results[idx] = (preso, future.result(), None)
+                except OperationCancelled:
+                    raise
+                except Exception as exc:
+                    results[idx] = (preso, None, exc)
+                done += 1
+                if on_progress is not None:
+                    on_progress(done, total, preso.get("id", ""))
+                raise_if_cancelled(stop_event, f"coleta de detalhes ({done} de {total} presos)")
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+        return results
+
+    # ---- Pré-carregamento especulativo ----
+
+    def start_prefetch(self, presos: List[Dict[str, str]], limit: int = PREFETCH_MAX_PRESOS) -> None:
+        """Inicia, em uma única thread de baixa prioridade, a busca de detalhes e fotos."""
+        if self._prefetch_thread is not None:
+            return
+        # Um sinal por rodada: a thread de uma rodada já parada não volta a correr com a nova
+        self._prefetch_stop = threading.Event()
+        self._prefetch_thread = threading.Thread(
+            target=self._prefetch_loop, args=(presos[:limit], self._prefetch_stop), name="prefetch-detalhes",
+            daemon=True,
+        )
+        self._prefetch_thread.start()
+
+    def stop_prefetch(self) -> None:
+        """Interrompe o pré-carregamento sem esperar a requisição em andamento.
+
+        O item em andamento continua registrado em `_inflight` e, ao terminar, entra
+        no cache; quem precisar dele aguarda o mesmo resultado.
+        """
+        self._prefetch_stop.set()
+        self._prefetch_thread = None
+
+    def _should_stop(self, prefetch_stop: threading.Event) -> bool:
+        stop_event = getattr(self.session, "stop_event", None)
+        return prefetch_stop.is_set() or (stop_event is not None and stop_event.is_set())
+
+    def _prefetch_loop(self, presos: List[Dict[str, str]], prefetch_stop: threading.Event) -> None:
+        for preso in presos:
+            if self._should_stop(prefetch_stop):
+                return
+            pid = (preso.get("id") or "").strip()
+            if not pid:
+                continue
+            future: Future = Future()
+            with self._lock:
+                if pid in self._details or pid in self._inflight:
+                    continue
+                self._inflight[pid] = future
+            try:
+                det = self._fetch_details(pid)
+                with self._lock:
+                    self._details[pid] = det
+                    self.prefetched += 1
+                future.set_result(det)
+            except Exception as exc:
+                future.set_exception(exc)
+            finally:
+                with self._lock:
+                    self._inflight.pop(pid, None)
+
+            if self._should_stop(prefetch_stop):
+                return
+            url = preso.get("imagem_link", "")
+            if url and url not in self.photos:
+                try:
+                    if self.get_photo(url, pid) is not None:
+                        with self._lock:
+                            self.prefetched_photos += 1
+                except OperationCancelled:
+                    return
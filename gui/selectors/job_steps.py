@@ -0,0 +1,175 @@
+from __future__ import annotations
+
+import os
+import re
+from contextlib import nullcontext
+from typing import Any, Callable, ContextManager, Dict, List, Mapping, Optional, Sequence, Tuple
+
+import requests
+import urllib3
+
+from gui.selectors.detail_collector import DetailCollector
+from gui.selectors.preflight import (
+    DEFAULT_MIN_FILL,
+    FIELD_LABELS,
+    checked_fields,
+    evaluate_sample,
+    sample_presos,
+    should_abort,
+)
+from utils.cancellation import OperationCancelled
+from utils.preso_record import PresoRecord
+from utils.snapshot import snapshot_path_for, write_snapshot
+
+
+# Intervalo de espera por comandos da UI (limita a latência de parada nas esperas)
+COMMAND_POLL_S = 0.2
+
+# No modo lote as alas aparecem na seleção como "<unidade> · <ala>"
+ALA_LABEL_SEP = " · "
+
+
+def ala_label(preso: Mapping[str, str], lote: bool) -> str:
+    """Rótulo da ala do preso na janela de seleção (prefixado pela unidade no modo lote)."""
+    ala = preso.get("ala", "")
+    if lote and ala:
+        return f"{preso.get('unidade', '')}{ALA_LABEL_SEP}{ala}"
+    return ala
+
+
+def file_tag(text: str) -> str:
+    return re.sub(r"[^\w-]+", "-", text).strip("-")
+
+
+def split_outputs(save_path: str, resultados: List[PresoRecord], lote: bool) -> List[Tuple[str, List[PresoRecord]]]:
+    """Um PDF por unidade no modo lote (`<nome>_<UNIDADE>.pdf`); fora dele, o caminho escolhido."""
+    if not lote:
+        return [(save_path, resultados)]
+    base, ext = os.path.splitext(save_path)
+    por_unidade: Dict[str, List[PresoRecord]] = {}
+    for preso in resultados:
+        por_unidade.setdefault(preso.get("unidade", ""), []).append(preso)
+    return [(f"{base}_{file_tag(u) or 'unidade'}{ext or '.pdf'}", lista) for u, lista in por_unidade.items()]
+
+
+def suggested_pdf_name(unidades: Sequence[str], selected_ids: Sequence[str], selected_alas: Sequence[str]) -> str:
+    """Nome sugerido ao salvar: lote, presos específicos ou alas escolhidas."""
+    if len(unidades) > 1:
+        return f"cara_cracha_lote_{'_'.join(file_tag(u) for u in unidades)[:60]}.pdf"
+    if selected_ids:
+        return f"cara_cracha_presos_{'_'.join(selected_ids)[:60]}.pdf"
+    alas_tag = "_".join(a.replace("/", "-").replace(" ", "-") for a in selected_alas)[:60]
+    return f"cara_cracha_{alas_tag or 'todas'}.pdf"
+
+
+def listed_presos(
+    unidades: Sequence[str],
+    listagens: Mapping[str, List[PresoRecord]],
+    falhas: Mapping[str, BaseException],
+    report,
+) -> List[PresoRecord]:
+    """Presos das listagens na ordem das unidades; só falha se nenhuma unidade respondeu.
+
+    As unidades cuja listagem falhou são informadas em `report` e as demais seguem.
+    """
+    if falhas and not listagens:
+        raise next(iter(falhas.values()))
+    for unidade, erro in falhas.items():
+        report.put(("status", f"Falha ao acessar a listagem da unidade {unidade}: {erro}"))
+    return [p for u in unidades for p in listagens.get(u, [])]
+
+
+def select_presos(
+    presos: Sequence[PresoRecord], lote: bool, alas: Sequence[str] = (), ids: Sequence[str] = ()
+) -> List[PresoRecord]:
+    """Presos escolhidos: os códigos em `ids` (busca na janela) ou os das alas (rótulos de `ala_label`)."""
+    if ids:
+        wanted = set(ids)
+        return [p for p in presos if (p.get("id") or "").strip() in wanted]
+    wanted = set(alas)
+    return [p for p in presos if ala_label(p, lote) in wanted]
+
+
+class PreflightFailed(RuntimeError):
+    """A amostra do pré-voo veio com campos vazios demais (provável mudança no HTML do Canaimé)."""
+
+    def __init__(
+        self, rates: Mapping[str, float], failing: Sequence[str], problems: List[Dict[str, str]], sample_size: int
+    ):
+        self.rates = dict(rates)
+        self.failing = list(failing)
+        self.problems = problems
+        self.sample_size = sample_size
+        self.summary = ", ".join(f"{FIELD_LABELS.get(f, f)} {rates[f]:.0%}" for f in failing)
+        super().__init__(f"Pré-voo: preenchimento abaixo de {DEFAULT_MIN_FILL:.0%} em: {self.summary}")
+
+
+def _no_phase(_name: str) -> ContextManager[Any]:
+    return nullcontext()
+
+
+def collect_selection(
+    collector: DetailCollector,
+    presos: Sequence[PresoRecord],
+    report,
+    stop_event=None,
+    preflight: bool = True,
+    on_progress: Optional[Callable[[int, int, str], None]] = None,
+    phase: Callable[[str], ContextManager[Any]] = _no_phase,
+) -> List[PresoRecord]:
+    """Pré-voo numa amostra e coleta dos detalhes e fotos dos presos escolhidos.
+
+    Com `preflight`, a amostra é coletada antes e `PreflightFailed` é levantada se
+    `should_abort` reprovar os campos vazios; com amostra pequena, vira aviso em
+    `report`. Presos cuja coleta falhou ficam de fora (informados em `report`); erro
+    de certificado desliga a verificação da sessão e o preso é buscado de novo.
+    `phase(nome)` envolve as etapas "preflight" e "detalhes" (perfil por fase).
+    """
+    presos = [p for p in presos if (p.get("id") or "").strip()]
+    campos_verificados = checked_fields(collector.field_set)
+    if preflight and campos_verificados and presos:
+        amostra = sample_presos(presos)
+        report.put(("status", f"Verificando seletores numa amostra de {len(amostra)} presos..."))
+        with phase("preflight"):
+            coletados = collector.collect(amostra, stop_event=stop_event)
+            taxas, falhos, problemas = evaluate_sample(coletados, campos_verificados)
+        if falhos and should_abort(coletados, taxas, falhos):
+            raise PreflightFailed(taxas, falhos, problemas, len(amostra))
+        if falhos:
+            resumo = ", ".join(f"{FIELD_LABELS.get(f, f)} {taxas[f]:.0%}" for f in falhos)
+            report.put(("status", f"Aviso do pré-voo: preenchimento abaixo de {DEFAULT_MIN_FILL:.0%} em: {resumo} "
+                                  "(amostra pequena ou um campo só; a coleta segue, confira o PDF)."))
+        elif taxas:
+            report.put(("status", f"Seletores OK na amostra (menor preenchimento: {min(taxas.values()):.0%})."))
+
+    # Detalhes (e fotos) em paralelo; a concorrência é ajustada pelo limitador da sessão
+    session = collector.session
+    resultados: List[PresoRecord] = []
+    with phase("detalhes"):
+        for preso, det, erro in collector.collect(presos, stop_event=stop_event, on_progress=on_progress):
+            pid = preso.get("id", "").strip()
+            if isinstance(erro, requests.exceptions.SSLError) and session.verify is not False:
+                report.put(("status", "Aviso: SSL nos detalhes. Repetindo sem verificação."))
+                session.verify = False
+                urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+            if isinstance(erro, requests.exceptions.SSLError) and session.verify is False:
+                try:
+                    det, erro = collector.get_details(pid), None
+                except OperationCancelled:
+                    raise
+                except Exception as e:
+                    erro = e
+            if erro is not None:
+                report.put(("status", f"Falha ao coletar detalhes do preso {pid}: {erro}"))
+                continue
+            resultados.append(preso.merged(det))
+    return resultados
+
+
+def save_snapshot(report, pdf_path: str, presos: List[PresoRecord], fotos: Mapping[str, bytes], meta: dict) -> None:
+    """Grava o instantâneo do PDF (falhas só geram aviso: o PDF já está salvo)."""
+    try:
+        path = write_snapshot(snapshot_path_for(pdf_path), presos, fotos, meta=meta)
+        report.put(("status", f"Instantâneo salvo: {path} (reimpressão: python main.py --offline \"{path}\")"))
+    except Exception as e:
+        report.put(("status", f"Aviso: falha ao gravar o instantâneo de '{pdf_path}': {e}"))
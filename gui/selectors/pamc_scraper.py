@@ -1,14 +1,27 @@
 from __future__ import annotations
 
-from typing import List, Dict, Optional
-from urllib.parse import urljoin
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Dict, Optional, Sequence, Tuple
+from urllib.parse import quote, urljoin
 
 from bs4 import BeautifulSoup
 
+from utils.cancellation import OperationCancelled
+from utils.preso_record import PresoRecord
 
-TARGET_URL = (
-    "https://canaime.com.br/sgp2rr/areas/impressoes/UND_ChamadaFOTOS_todos2.php?id_und_prisional=PAMC"
+
+UNIT_URL_TEMPLATE = (
+    "https://canaime.com.br/sgp2rr/areas/impressoes/UND_ChamadaFOTOS_todos2.php?id_und_prisional={unidade}"
 )
+DEFAULT_UNIT = "PAMC"
+
+
+def unit_url(unidade: str) -> str:
+    """URL da listagem de chamada da unidade prisional (`id_und_prisional`)."""
+    return UNIT_URL_TEMPLATE.format(unidade=quote(unidade.strip(), safe=""))
+
+
+TARGET_URL = unit_url(DEFAULT_UNIT)
 
 
 def _resolve_image_link(tag, base_url: Optional[str]) -> str:
@@ -40,7 +53,7 @@ def _resolve_image_link(tag, base_url: Optional[str]) -> str:
     return ""
 
 
-def parse_pamc_html(html: str, base_url: Optional[str] = None) -> List[Dict[str, str]]:
+def parse_pamc_html(html: str, base_url: Optional[str] = None) -> List[PresoRecord]:
     """
     Faz o parsing do HTML da página de chamadas da PAMC.
 
@@ -51,12 +64,14 @@ def parse_pamc_html(html: str, base_url: Optional[str] = None) -> List[Dict[str,
     - Linha 4: ignorar
     - Linha 5: "Ala/Cela" (remover os 5 primeiros caracteres); split pelo último '/'
     - Imagem: atributo 'link' da tag <img> (fallback para 'src')
+
+    Cada preso vira um `PresoRecord` (acesso de dict, campos repetidos internados).
     """
 
     soup = BeautifulSoup(html, "html.parser")
     blocks = soup.select(".titulobkSingCAPS")
 
-    prisoners: List[Dict[str, str]] = []
+    prisoners: List[PresoRecord] = []
 
     for block in blocks:
         # Coleta e normaliza as linhas de texto
@@ -92,19 +107,47 @@ def parse_pamc_html(html: str, base_url: Optional[str] = None) -> List[Dict[str,
         img_link = _resolve_image_link(block, base_url)
 
         prisoners.append(
-            {
-                "id": prisoner_id,
-                "nome": prisoner_name,
-                "ala": ala,
-                "cela": cela,
-                "imagem_link": img_link,
-            }
+            PresoRecord(
+                id=prisoner_id,
+                nome=prisoner_name,
+                ala=ala,
+                cela=cela,
+                imagem_link=img_link,
+            )
         )
 
     return prisoners
 
 
-def fetch_pamc_data(session, target_url: Optional[str] = None) -> List[Dict[str, str]]:
+def merge_duplicate_presos(presos: Sequence[PresoRecord]) -> Tuple[List[PresoRecord], Dict[str, int]]:
+    """Une blocos repetidos do mesmo preso (mesmo código na mesma unidade), mantendo a ordem.
+
+    Recadastros e artefatos da página repetem o bloco de um preso; cada cópia faria as
+    próprias requisições de detalhes e foto e sairia como página extra no PDF. Fica a
+    primeira ocorrência, completada com os campos que só as cópias trazem. Devolve
+    `(presos, cópias unidas por código)`.
+    """
+    merged: List[PresoRecord] = []
+    index: Dict[Tuple[str, str], int] = {}
+    copies: Dict[str, int] = {}
+    for preso in presos:
+        pid = (preso.get("id") or "").strip()
+        key = (preso.get("unidade", ""), pid)
+        pos = index.get(key) if pid else None
+        if pos is None:
+            if pid:
+                index[key] = len(merged)
+            merged.append(preso)
+            continue
+        kept = merged[pos]
+        missing = {k: v for k, v in preso.items() if v and not kept.get(k)}
+        if missing:
+            merged[pos] = kept.merged(missing)
+        copies[pid] = copies.get(pid, 0) + 1
+    return merged, copies
+
+
+def fetch_pamc_data(session, target_url: Optional[str] = None) -> List[PresoRecord]:
     """
     Usa uma sessão autenticada (requests.Session) para buscar a página da PAMC
     e retorna a lista de presos parseada via `parse_pamc_html`.
@@ -115,3 +158,35 @@ def fetch_pamc_data(session, target_url: Optional[str] = None) -> List[Dict[str,
     return parse_pamc_html(response.text, base_url=url)
 
 
+def fetch_units_data(
+    session, unidades: Sequence[str], max_workers: int = 4
+) -> Tuple[Dict[str, List[PresoRecord]], Dict[str, BaseException]]:
+    """
+    Busca em paralelo, com a mesma sessão autenticada, as listagens de várias unidades.
+
+    Retorna `(presos por unidade, erro por unidade)`, ambos na ordem de `unidades`;
+    cada preso recebe a chave `unidade`. A falha de uma unidade não interrompe as
+    demais; `OperationCancelled` é propagada.
+    """
+    unidades = list(dict.fromkeys(unidades))
+    listings: Dict[str, List[PresoRecord]] = {}
+    errors: Dict[str, BaseException] = {}
+    executor = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(unidades))), thread_name_prefix="listagem")
+    try:
+        futures = {executor.submit(fetch_pamc_data, session, unit_url(u)): u for u in unidades}
+        for future in as_completed(futures):
+            unidade = futures[future]
+            try:
+                presos = future.result()
+            except OperationCancelled:
+                raise
+            except Exception as exc:
+                errors[unidade] = exc
+                continue
+            for preso in presos:
+                preso["unidade"] = unidade
+            listings[unidade] = presos
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+    ordered = {u: listings[u] for u in unidades if u in listings}
+    return ordered, {u: errors[u] for u in unidades if u in errors}
@@ -0,0 +1,138 @@
+
+from __future__ import annotations
+
+import multiprocessing as mp
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Optional
+
+from gui.selectors.preso_details import parse_detail_page
+from utils.cancellation import raise_if_cancelled
+
+
+# Teto de processos de parsing (o processo de trabalho fica com a rede e o PDF)
+MAX_PARSE_WORKERS = 4
+# Páginas baixadas aguardando parsing, por processo; acima disso a coleta espera
+PENDING_PER_WORKER = 4
+# Fatia das esperas (vaga no pool ou resultado), para atender o pedido de parada
+PARSE_POLL_S = 0.1
+
+
+def default_parse_workers() -> int:
+    """Processos de parsing padrão: um núcleo fica para o processo de trabalho (0 = parsing local)."""
+    return max(0, min(MAX_PARSE_WORKERS, (os.cpu_count() or 1) - 1))
+
+
+def _ready() -> bool:
+    return True
+
+
+class ParsePool:
+    """Estágio de parsing das páginas de detalhe, separado da busca.
+
+    As threads de coleta só baixam: o corpo bruto vai para um pool de processos
+    (`spawn`) que devolve o dict de campos, fora do GIL do processo de trabalho. No
+    máximo `max_pending` páginas (padrão `workers * PENDING_PER_WORKER`) esperam
+    parsing; quem tentar enviar mais aguarda uma vaga (contrapressão), então a rede
+    não acumula páginas em memória quando o parsing fica para trás. Com `workers=0`
+    o parsing é feito na própria thread, como antes. Se um processo do pool morrer,
+    as páginas pendentes e as seguintes são interpretadas localmente.
+    """
+
+    def __init__(self, workers: int = 0, max_pending: Optional[int] = None):
+        self.workers = max(0, int(workers))
+        self.max_pending = max_pending or max(1, self.workers * PENDING_PER_WORKER)
+        self.parsed = 0
+        self.waits = 0
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._broken = False
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.workers > 0 and not self._broken
+
+    def _pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=mp.get_context("spawn"))
+            return self._executor
+
+    def start(self, wait: bool = False) -> None:
+        """Sobe os processos antes da primeira página (cada um importa os módulos ao nascer)."""
+        if self.enabled:
+            pool = self._pool()
+            ready = [pool.submit(_ready) for _ in range(self.workers)]
+            if wait:
+                for future in ready:
+                    future.result()
+
+    def _count(self) -> None:
+        with self._lock:
+            self.parsed += 1
+
+    def _parse_local(self, future: Future, page: str, content: bytes, encoding: Optional[str]) -> Future:
+        try:
+            future.set_result(parse_detail_page(page, content, encoding))
+            self._count()
+        except Exception as exc:
+            future.set_exception(exc)
+        return future
+
+    def submit(self, page: str, content: bytes, encoding: Optional[str], stop_event=None) -> Future:
+        """Envia a página baixada para parsing; aguarda vaga se o pool já tem `max_pending` pendentes."""
+        result: Future = Future()
+        if not self.enabled:
+            return self._parse_local(result, page, content, encoding)
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.waits += 1
+            while not self._slots.acquire(timeout=PARSE_POLL_S):
+                raise_if_cancelled(stop_event, "espera do parsing de detalhes")
+        try:
+            pending = self._pool().submit(parse_detail_page, page, content, encoding)
+        except (BrokenProcessPool, RuntimeError):
+            self._slots.release()
+            self._broken = True
+            return self._parse_local(result, page, content, encoding)
+
+        def done(pending: Future) -> None:
+            self._slots.release()
+            try:
+                result.set_result(pending.result())
+                self._count()
+            except BrokenProcessPool:
+                self._broken = True
+                self._parse_local(result, page, content, encoding)
+            except BaseException as exc:
+                result.set_exception(exc)
+
+        pending.add_done_callback(done)
+        return result
+
+    def result(self, future: Future, stop_event=None) -> Dict[str, str]:
+        """Campos extraídos de uma página enviada por `submit` (espera cancelável)."""
+        while True:
+            try:
+                return future.result(timeout=PARSE_POLL_S)
+            except FutureTimeout:
+                raise_if_cancelled(stop_event, "parsing de detalhes")
+
+    def describe(self) -> str:
+        if not self.workers:
+            return f"{self.parsed} página(s) interpretadas no processo de trabalho"
+        broken = "; pool interrompido, restante no processo de trabalho" if self._broken else ""
+        return (
+            f"{self.parsed} página(s) interpretadas em {self.workers} processo(s), "
+            f"{self.waits} espera(s) por vaga (limite de {self.max_pending} pendentes){broken}"
+        )
+
+    def close(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,89 @@
+
+from __future__ import annotations
+
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple
+
+from utils.preso_record import CADASTRO_FIELDS, FIELD_SETS, INFORMES_FIELDS
+
+
+# Presos da amostra coletados antes da execução completa
+PREFLIGHT_SAMPLE = 8
+# Taxa mínima de preenchimento na amostra; abaixo disso o seletor provavelmente quebrou
+DEFAULT_MIN_FILL = 0.5
+# Com menos presos coletados na amostra, campos vazios viram só aviso (podem faltar de verdade)
+MIN_FETCHED_TO_ABORT = 5
+# Campos que costumam faltar de verdade no cadastro: não são verificados
+OPTIONAL_FIELDS = frozenset({"pai", "cpf", "endereco", "dentes", "sinais_particulares"})
+
+FIELD_LABELS = {
+    "mae": "Mãe", "pai": "Pai", "nascimento": "Nascimento", "cpf": "CPF",
+    "cidade_origem": "Cidade Origem", "estado_origem": "Estado Origem", "endereco": "Endereço",
+    "cor_etnia": "Cor/Etnia", "rosto": "Rosto", "olhos": "Olhos", "nariz": "Nariz", "boca": "Boca",
+    "dentes": "Dentes", "cabelos": "Cabelos", "altura": "Altura", "sinais_particulares": "Sinais Particulares",
+}
+
+_PAGE_FIELDS = {"cadastro": CADASTRO_FIELDS, "informes": INFORMES_FIELDS}
+
+
+def checked_fields(field_set: str) -> List[str]:
+    """Campos verificados no pré-voo para o conjunto de campos (vazio no "basico")."""
+    return [f for page in FIELD_SETS[field_set] for f in _PAGE_FIELDS[page] if f not in OPTIONAL_FIELDS]
+
+
+def sample_presos(presos: Sequence[Mapping[str, str]], size: int = PREFLIGHT_SAMPLE) -> list:
+    """Amostra determinística espalhada pela lista (início, meio e fim das alas)."""
+    presos = [p for p in presos if (p.get("id") or "").strip()]
+    if len(presos) <= size:
+        return list(presos)
+    step = len(presos) / size
+    return [presos[int(i * step)] for i in range(size)]
+
+
+def _fetched(results) -> list:
+    return [(preso, det) for preso, det, err in results if err is None and det is not None]
+
+
+def evaluate_sample(
+    results: Sequence[Tuple[Mapping[str, str], Optional[Mapping[str, str]], Optional[BaseException]]],
+    fields: Sequence[str],
+    min_fill: float = DEFAULT_MIN_FILL,
+) -> Tuple[Dict[str, float], List[str], List[Dict[str, str]]]:
+    """Taxas de preenchimento da amostra, campos abaixo do mínimo e presos afetados.
+
+    Presos cuja coleta falhou (rede) não entram na conta: erro de rede não é
+    mudança de HTML. Os presos afetados vêm no formato de `show_validation_error`.
+    """
+    fetched = _fetched(results)
+    if not fetched or not fields:
+        return {}, [], []
+    rates = {f: sum(1 for _, det in fetched if det.get(f)) / len(fetched) for f in fields}
+    failing = [f for f in fields if rates[f] < min_fill]
+    problems: List[Dict[str, str]] = []
+    for preso, det in fetched:
+        empty = [f for f in failing if not det.get(f)]
+        if empty:
+            problems.append({
+                "Código": preso.get("id", ""),
+                "Nome": preso.get("nome", ""),
+                "Ala": preso.get("ala", ""),
+                "Cela": preso.get("cela", ""),
+                "Campos": ", ".join(FIELD_LABELS.get(f, f) for f in empty),
+            })
+    return rates, failing, problems
+
+
+def should_abort(
+    results: Sequence[Tuple[Mapping[str, str], Optional[Mapping[str, str]], Optional[BaseException]]],
+    rates: Mapping[str, float],
+    failing: Sequence[str],
+) -> bool:
+    """Se os campos abaixo do mínimo justificam cancelar a coleta (mudança de HTML) ou só um aviso.
+
+    Exige `MIN_FETCHED_TO_ABORT` presos coletados: com 1 a 3 presos escolhidos na
+    busca, um preso sem "nariz" de verdade zera a taxa. Mesmo com amostra suficiente,
+    um campo só aborta quando veio vazio em todos os presos; dois ou mais campos
+    abaixo do mínimo abortam sempre.
+    """
+    if not failing or len(_fetched(results)) < MIN_FETCHED_TO_ABORT:
+        return False
+    return len(failing) > 1 or rates[failing[0]] == 0.0
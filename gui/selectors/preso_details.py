@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from typing import Dict
+from typing import Dict, Optional, Tuple
 
 from bs4 import BeautifulSoup
 
@@ -21,11 +21,16 @@ def _safe_select_text(soup: BeautifulSoup, selector: str) -> str:
         return ""
 
 
-def fetch_preso_cadastro(session, preso_id: str) -> Dict[str, str]:
-    url = CADASTRO_URL.format(id=preso_id)
-    resp = session.get(url, timeout=30)
-    resp.raise_for_status()
-    soup = BeautifulSoup(resp.text, "html.parser")
+def _decode(content: bytes, encoding: Optional[str]) -> str:
+    """Mesma decodificação de `requests.Response.text` (para o parsing fora do processo)."""
+    try:
+        return str(content, encoding or "utf-8", errors="replace")
+    except (LookupError, TypeError):
+        return str(content, errors="replace")
+
+
+def parse_cadastro(html: str) -> Dict[str, str]:
+    soup = BeautifulSoup(html, "html.parser")
 
     return {
         "mae": _safe_select_text(soup, "tr:nth-child(3) .titulobk"),
@@ -38,11 +43,8 @@ def fetch_preso_cadastro(session, preso_id: str) -> Dict[str, str]:
     }
 
 
-def fetch_preso_informes(session, preso_id: str) -> Dict[str, str]:
-    url = INFORMES_URL.format(id=preso_id)
-    resp = session.get(url, timeout=30)
-    resp.raise_for_status()
-    soup = BeautifulSoup(resp.text, "html.parser")
+def parse_informes(html: str) -> Dict[str, str]:
+    soup = BeautifulSoup(html, "html.parser")
 
     return {
         "cor_etnia": _safe_select_text(soup, "tr:nth-child(16) .titulobk:nth-child(2)"),
@@ -57,3 +59,34 @@ def fetch_preso_informes(session, preso_id: str) -> Dict[str, str]:
     }
 
 
+# Página de detalhe -> (URL, parser); os nomes são os de `utils.preso_record.FIELD_SETS`
+DETAIL_PAGES = {
+    "cadastro": (CADASTRO_URL, parse_cadastro),
+    "informes": (INFORMES_URL, parse_informes),
+}
+
+
+def fetch_detail_page(session, page: str, preso_id: str) -> Tuple[bytes, Optional[str]]:
+    """Baixa a página de detalhe sem interpretar; devolve (corpo, encoding) para `parse_detail_page`."""
+    resp = session.get(DETAIL_PAGES[page][0].format(id=preso_id), timeout=30)
+    resp.raise_for_status()
+    return resp.content, resp.encoding or resp.apparent_encoding
+
+
+def parse_detail_page(page: str, content: bytes, encoding: Optional[str]) -> Dict[str, str]:
+    """Extrai os campos da página de detalhe baixada (função de módulo: roda num processo do pool)."""
+    return DETAIL_PAGES[page][1](_decode(content, encoding))
+
+
+def fetch_preso_cadastro(session, preso_id: str) -> Dict[str, str]:
+    url = CADASTRO_URL.format(id=preso_id)
+    resp = session.get(url, timeout=30)
+    resp.raise_for_status()
+    return parse_cadastro(resp.text)
+
+
+def fetch_preso_informes(session, preso_id: str) -> Dict[str, str]:
+    url = INFORMES_URL.format(id=preso_id)
+    resp = session.get(url, timeout=30)
+    resp.raise_for_status()
+    return parse_informes(resp.text)
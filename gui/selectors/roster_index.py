@@ -0,0 +1,101 @@
+
+from __future__ import annotations
+
+import bisect
+import unicodedata
+from typing import Dict, List, Mapping, Sequence, Tuple
+
+
+# Máximo de resultados devolvidos por busca (a lista da janela não precisa de mais)
+SEARCH_LIMIT = 200
+
+
+def normalize_name(text: str) -> str:
+    """Maiúsculas, sem acentos e com espaços colapsados (chave de busca por nome)."""
+    decomposed = unicodedata.normalize("NFKD", text or "")
+    plain = "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return " ".join(plain.upper().split())
+
+
+class RosterIndex:
+    """Índice em memória da listagem de presos para buscar presos específicos.
+
+    Busca por código (exato ou prefixo), por prefixo do nome normalizado (nome
+    completo ou qualquer palavra; várias palavras precisam casar todas) e por
+    ala/cela ("ALA 1" ou "ALA 1/CELA 03"). As chaves de nome ficam em listas
+    ordenadas, então cada prefixo custa uma busca binária.
+    """
+
+    def __init__(self, presos: Sequence[Mapping[str, str]]):
+        self.presos = list(presos)
+        self._by_id: Dict[str, int] = {}
+        self._ids: List[Tuple[str, int]] = []
+        self._names: List[Tuple[str, int]] = []
+        self._words: List[Tuple[str, int]] = []
+        self._by_ala: Dict[str, List[int]] = {}
+        self._by_ala_cela: Dict[Tuple[str, str], List[int]] = {}
+        for idx, preso in enumerate(self.presos):
+            pid = (preso.get("id") or "").strip()
+            if pid:
+                self._by_id.setdefault(pid, idx)
+                self._ids.append((pid, idx))
+            name = normalize_name(preso.get("nome", ""))
+            if name:
+                self._names.append((name, idx))
+                self._words.extend((word, idx) for word in set(name.split()))
+            ala = normalize_name(preso.get("ala", ""))
+            cela = normalize_name(preso.get("cela", ""))
+            if ala:
+                self._by_ala.setdefault(ala, []).append(idx)
+                self._by_ala_cela.setdefault((ala, cela), []).append(idx)
+        self._ids.sort()
+        self._names.sort()
+        self._words.sort()
+
+    def __len__(self) -> int:
+        return len(self.presos)
+
+    def get(self, pid: str):
+        idx = self._by_id.get((pid or "").strip())
+        return self.presos[idx] if idx is not None else None
+
+    @staticmethod
+    def _prefix(keys: List[Tuple[str, int]], prefix: str) -> List[int]:
+        start = bisect.bisect_left(keys, (prefix, -1))
+        found: List[int] = []
+        for key, idx in keys[start:]:
+            if not key.startswith(prefix):
+                break
+            found.append(idx)
+        return found
+
+    def search(self, query: str, limit: int = SEARCH_LIMIT) -> List[Mapping[str, str]]:
+        """Presos que casam com `query`, na ordem da listagem (no máximo `limit`)."""
+        q = normalize_name(query)
+        if not q:
+            return []
+        if q.isdigit():
+            hits = set(self._prefix(self._ids, q))
+        elif "/" in q or q in self._by_ala:
+            ala, _, cela = (part.strip() for part in q.partition("/"))
+            if cela:
+                hits = set(self._by_ala_cela.get((ala, cela), []))
+            else:
+                hits = set(self._by_ala.get(ala, []))
+        else:
+            hits = set(self._prefix(self._names, q))
+            words = q.split()
+            by_word = set(self._prefix(self._words, words[0]))
+            for word in words[1:]:
+                by_word &= set(self._prefix(self._words, word))
+            hits |= by_word
+        return [self.presos[idx] for idx in sorted(hits)[:limit]]
+
+
+def roster_label(preso: Mapping[str, str], show_unit: bool = False) -> str:
+    """Linha exibida na lista de resultados da busca (com a unidade no modo lote)."""
+    local = "/".join(x for x in (preso.get("ala", ""), preso.get("cela", "")) if x)
+    unidade = preso.get("unidade", "") if show_unit else ""
+    where = f"{unidade} · {local}" if unidade and local else (unidade or local)
+    return f"{preso.get('id', '')} — {preso.get('nome', '')}" + (f" ({where})" if where else "")
+
@@ -1,8 +1,14 @@
 from __future__ import annotations
 
+import argparse
+import functools
 import json
 import logging
+import os
+import re
 import sys
+import tempfile
+import time
 from types import ModuleType
 from urllib.parse import urljoin
 
@@ -63,9 +69,49 @@ def _ensure_fallback_modules() -> None:
 _ensure_fallback_modules()
 
 
-from gui.selectors.pamc_scraper import fetch_pamc_data  # noqa: E402
-from gui.selectors.preso_details import fetch_preso_cadastro, fetch_preso_informes  # noqa: E402
-from utils.pdf_builder import build_pdf  # noqa: E402
+from gui.selectors.pamc_scraper import (  # noqa: E402
+    DEFAULT_UNIT,
+    fetch_units_data,
+    merge_duplicate_presos,
+    unit_url,
+)
+from gui.selectors.detail_collector import DetailCollector, prefetch_order  # noqa: E402
+from gui.selectors.parse_pool import MAX_PARSE_WORKERS, ParsePool, default_parse_workers  # noqa: E402
+from gui.selectors.job_steps import (  # noqa: E402
+    COMMAND_POLL_S,
+    PreflightFailed,
+    ala_label,
+    collect_selection,
+    listed_presos,
+    save_snapshot,
+    select_presos,
+    split_outputs,
+    suggested_pdf_name,
+)
+from utils.page_cache import PageCache  # noqa: E402
+from utils.pdf_builder import (  # noqa: E402
+    DEFAULT_LAYOUT,
+    DEFAULT_PDF_PROFILE,
+    PAGE_LAYOUTS,
+    build_pdf,
+    describe_pdf_report,
+    resolve_pdf_profile,
+)
+from utils.preso_record import FIELD_SETS, PresoRecord, resolve_field_set  # noqa: E402
+from utils.cancellation import OperationCancelled, raise_if_cancelled  # noqa: E402
+from utils.cassette import CASSETTE_SUFFIX, CassettePlayer, CassetteRecorder, record_session, replay_session  # noqa: E402
+from utils.concurrency import AdaptiveLimiter  # noqa: E402
+from utils.http_session import new_session  # noqa: E402
+from utils.journal import JobJournal, prune_journals  # noqa: E402
+from utils.local_state import load_state, save_state  # noqa: E402
+from utils.photo_store import DEFAULT_MEMORY_BUDGET_MB, SpooledPhotoStore  # noqa: E402
+from utils.profiling import PROFILE_ENV, WorkerProfiler, configure_from_args  # noqa: E402
+from utils.run_estimates import load_estimates, record_run  # noqa: E402
+from utils.snapshot import SNAPSHOT_SUFFIX, read_snapshot  # noqa: E402
+from utils.warmup import LoginForm, LoginWarmup  # noqa: E402
+from service.client import service_client_task_func  # noqa: E402
+from service.daemon import DEFAULT_HOST, DEFAULT_PORT  # noqa: E402
+from service.jobs import run_service  # noqa: E402
 from gui.login.login_canaime import LoginApp  # noqa: E402
 
 if TYPE_CHECKING:  # Tipos corretos para anotações
@@ -74,9 +120,9 @@ if TYPE_CHECKING:  # Tipos corretos para anotações
 
 
 LOGIN_URL = "https://canaime.com.br/sgp2rr/login/login_principal.php"
-TARGET_URL = (
-    "https://canaime.com.br/sgp2rr/areas/impressoes/UND_ChamadaFOTOS_todos2.php?id_und_prisional=PAMC"
-)
+
+# Chave do estado local com as alas escolhidas na última execução
+LAST_ALAS_KEY = "ultimas_alas"
 
 
 def _discover_login_form(
@@ -186,121 +232,345 @@ def _fill_login_credentials(
     return payload, username_name, password_name
 
 
-def process_task_func(
-    headless: bool,
-    queue: 'MpQueue',
-    command_queue: 'MpQueue',
-    stop_event: 'MpEvent',
+def _login(
+    session: requests.Session,
     username: str,
     password: str,
+    queue: 'MpQueue',
+    verbose: bool = True,
+    form: Optional[LoginForm] = None,
 ) -> None:
-    """Executa login + scraping no processo separado e envia mensagens para a UI."""
-    try:
-        queue.put(("status", "Iniciando sessão..."))
-        session = requests.Session()
-        session.headers.update({
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
-            "(KHTML, like Gecko) Chrome/125.0 Safari/537.36",
-            "Referer": LOGIN_URL,
-        })
-
-        # Descobre formulário e payload base
-        action_url, payload_base, form_html = _discover_login_form(session, LOGIN_URL, queue)
+    """Faz o login no Canaimé com a sessão (descoberta do formulário + POST das credenciais).
+
+    `form` é o formulário já descoberto pelo aquecimento; sem ele, a página de login é buscada agora.
+    """
+    # Descobre formulário e payload base
+    action_url, payload_base, form_html = form or _discover_login_form(session, LOGIN_URL, queue)
+    payload, user_field, pwd_field = _fill_login_credentials(payload_base, username, password, form_html)
+    if verbose:
         queue.put(("status", f"Form action: {action_url}"))
-        payload, user_field, pwd_field = _fill_login_credentials(payload_base, username, password, form_html)
         queue.put(("status", f"Campos detectados -> usuário: {user_field or 'desconhecido'}, senha: {pwd_field or 'desconhecido'}"))
-
         queue.put(("status", "Enviando credenciais..."))
-        try:
-            resp_post = session.post(action_url, data=payload, timeout=30, allow_redirects=True)
-        except requests.exceptions.SSLError:
-            if session.verify is not False:
-                if queue:
-                    queue.put((
-                        "status",
-                        "Aviso: problema de certificado no POST. Repetindo sem verificação (inseguro).",
-                    ))
-                session.verify = False
-                urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
-            resp_post = session.post(action_url, data=payload, timeout=30, allow_redirects=True)
-        resp_post.raise_for_status()
+    try:
+        resp_post = session.post(action_url, data=payload, timeout=30, allow_redirects=True)
+    except requests.exceptions.SSLError:
+        if session.verify is not False:
+            if queue:
+                queue.put((
+                    "status",
+                    "Aviso: problema de certificado no POST. Repetindo sem verificação (inseguro).",
+                ))
+            session.verify = False
+            urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+        resp_post = session.post(action_url, data=payload, timeout=30, allow_redirects=True)
+    resp_post.raise_for_status()
+    if verbose:
         queue.put(("status", f"Após login, URL atual: {resp_post.url}"))
 
-        # Tenta acessar a página alvo
-        queue.put(("status", "Acessando a página da PAMC..."))
+
+def _relogin(session: requests.Session, username: str, password: str, queue: 'MpQueue') -> None:
+    """Chamado pela sessão quando uma resposta cai na página de login (sessão expirada)."""
+    queue.put(("status", "Sessão expirada: refazendo login e repetindo as requisições afetadas..."))
+    _login(session, username, password, queue, verbose=False)
+
+
+def _wait_credentials(
+    command_queue: 'MpQueue', stop_event: 'MpEvent', warmup: LoginWarmup
+) -> Optional[tuple[str, str]]:
+    """Processo pré-aquecido: espera usuário e senha da UI; None se a janela fechar antes.
+
+    "warm_up" (o operador voltou a digitar) refaz o aquecimento se a rodada anterior envelheceu.
+    """
+    while True:
         try:
-            presos = fetch_pamc_data(session, TARGET_URL)
-        except requests.exceptions.SSLError:
-            if session.verify is not False:
-                if queue:
-                    queue.put((
-                        "status",
-                        "Aviso: problema de certificado ao acessar a PAMC. Repetindo sem verificação (inseguro).",
-                    ))
+            cmd, payload = command_queue.get(timeout=COMMAND_POLL_S)
+            if cmd == "credentials":
+                return payload[0], payload[1]
+            if cmd == "warm_up":
+                warmup.refresh()
+        except Exception:
+            if stop_event.is_set():
+                return None
+            continue
+
+
+def process_task_func(
+    headless: bool,
+    queue: 'MpQueue',
+    command_queue: 'MpQueue',
+    stop_event: 'MpEvent',
+    username: Optional[str],
+    password: Optional[str],
+    unidades: Optional[list[str]] = None,
+    snapshot: bool = False,
+    campos: str = "completo",
+    preflight: bool = True,
+    memoria_fotos: int = DEFAULT_MEMORY_BUDGET_MB,
+    cache_paginas: bool = True,
+    processos_parsing: Optional[int] = None,
+    gravar_cassete: str = "",
+    reproduzir_cassete: str = "",
+    escala_tempo: float = 1.0,
+    rascunho: bool = False,
+    perfil_pdf: str = DEFAULT_PDF_PROFILE,
+    tamanho_max_mb: Optional[float] = None,
+    por_pagina: int = DEFAULT_LAYOUT,
+) -> None:
+    """Executa login + scraping no processo separado e envia mensagens para a UI.
+
+    Com mais de uma unidade em `unidades` (modo lote), as listagens são buscadas em
+    paralelo na mesma sessão, os caches de detalhes/fotos são compartilhados e é
+    gerado um PDF por unidade. Com `snapshot`, cada PDF ganha ao lado um instantâneo
+    dos dados para reimpressão offline (`--offline`). `campos` ("basico", "pessoal"
+    ou "completo") decide quais páginas de detalhe são buscadas e o que o PDF mostra.
+    Com `preflight`, uma amostra pequena é coletada antes e a execução é abortada com
+    `validation_error` se campos vierem vazios demais (HTML do Canaimé mudou; ver
+    `should_abort`), ou segue com um aviso se a amostra for pequena.
+    As fotos ficam em memória até `memoria_fotos` MiB; o excedente vai para um
+    arquivo temporário mapeado em memória. Com `cache_paginas`, páginas de presos que
+    não mudaram desde um PDF anterior são montadas do cache de páginas.
+    As páginas de detalhe são interpretadas em `processos_parsing` processos (padrão:
+    núcleos - 1, até 4; 0 = no próprio processo de trabalho).
+    Sem `username` (processo aberto junto com a janela), a conexão e o formulário de
+    login são preparados enquanto o operador digita e as credenciais chegam depois
+    pelo comando "credentials".
+    Com `gravar_cassete`, todo o tráfego da sessão é gravado num cassete sem as
+    credenciais; com `reproduzir_cassete`, a sessão responde só a partir dele, com as
+    durações gravadas multiplicadas por `escala_tempo` (0 = sem espera).
+    Com `rascunho`, logo após a seleção um PDF de conferência (só listagem e fotos já
+    baixadas) é aberto na UI ("draft_ready"); o PDF final só é gerado quando o
+    operador confirma ("draft_decision": "final"), e "alas" volta à seleção.
+    `perfil_pdf` e `tamanho_max_mb` são repassados a `build_pdf` (perfil de saída e
+    tamanho máximo do arquivo; None = o do perfil) e `por_pagina` (1, 2 ou 4 presos
+    por página, também no rascunho).
+    """
+    unidades = list(dict.fromkeys(u.strip() for u in (unidades or []) if u.strip())) or [DEFAULT_UNIT]
+    lote = len(unidades) > 1
+    parser: Optional[ParsePool] = None
+    recorder: Optional[CassetteRecorder] = None
+    player: Optional[CassettePlayer] = None
+    try:
+        campos = resolve_field_set(campos)
+        if campos != "completo":
+            paginas = ", ".join(FIELD_SETS[campos]) or "nenhuma"
+            queue.put(("status", f"Conjunto de campos: {campos} (páginas de detalhe buscadas: {paginas})"))
+        profiler = WorkerProfiler.from_env(queue)
+        if profiler.enabled:
+            queue.put(("status", f"Perfil ativado ({PROFILE_ENV}); diagnósticos em: {os.path.abspath(profiler.out_dir)}"))
+        # Sessão com cancelamento cooperativo: requisições em andamento abortam ao sinalizar stop_event
+        limiter = AdaptiveLimiter()
+        session = new_session(stop_event=stop_event, referer=LOGIN_URL, limiter=limiter)
+        if reproduzir_cassete:
+            player = replay_session(session, reproduzir_cassete, time_scale=escala_tempo, secrets=(username, password))
+            queue.put(("status", f"Reproduzindo cassete {reproduzir_cassete} ({player.total} respostas, "
+                                 f"tempo x{player.time_scale:g}); nenhuma requisição vai à rede."))
+        if gravar_cassete:
+            recorder = record_session(session, gravar_cassete, secrets=(username, password),
+                                      meta={"unidades": unidades, "campos": campos})
+            queue.put(("status", f"Gravando cassete: {os.path.abspath(gravar_cassete)}"))
+        warmup = LoginWarmup(session, LOGIN_URL, functools.partial(_discover_login_form, queue=queue))
+        if username is None:
+            # DNS, TCP/TLS e formulário de login enquanto o operador digita as credenciais
+            warmup.start()
+            credenciais = _wait_credentials(command_queue, stop_event, warmup)
+            if credenciais is None:
+                return
+            username, password = credenciais
+            for adapter in (recorder, player):
+                if adapter is not None:
+                    adapter.add_secrets(username, password)
+        queue.put(("status", "Iniciando sessão..."))
+
+        with profiler.phase("login"):
+            _login(session, username, password, queue, form=warmup.login_form(stop_event))
+        if warmup.rounds:
+            queue.put(("status", f"Aquecimento: {warmup.describe()}."))
+        # Sessão expirada no meio da execução: a sessão refaz o login (uma vez, sob trava) e repete
+        session.reauthenticate = functools.partial(_relogin, username=username, password=password, queue=queue)
+
+        # Tenta acessar a(s) página(s) alvo; no lote, todas as listagens em paralelo
+        tempo_trabalho = 0.0
+        inicio = time.perf_counter()
+        with profiler.phase("listagem"):
+            if lote:
+                queue.put(("status", f"Acessando as listagens de {len(unidades)} unidades: {', '.join(unidades)}..."))
+            else:
+                queue.put(("status", f"Acessando a página da {unidades[0]}..."))
+            listagens, falhas = fetch_units_data(session, unidades, max_workers=limiter.maximum)
+            ssl_falhas = [u for u, e in falhas.items() if isinstance(e, requests.exceptions.SSLError)]
+            if ssl_falhas and session.verify is not False:
+                queue.put((
+                    "status",
+                    "Aviso: problema de certificado ao acessar a listagem. Repetindo sem verificação (inseguro).",
+                ))
                 session.verify = False
                 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
-        presos = fetch_pamc_data(session, TARGET_URL)
-        queue.put(("status", f"Blocos '.titulobkSingCAPS' encontrados: {len(presos)}"))
+                repetidas, novas_falhas = fetch_units_data(session, ssl_falhas, max_workers=limiter.maximum)
+                listagens.update(repetidas)
+                falhas = {u: e for u, e in {**falhas, **novas_falhas}.items() if u not in listagens}
+            presos = listed_presos(unidades, listagens, falhas, queue)
+            queue.put(("status", f"Blocos '.titulobkSingCAPS' encontrados: {len(presos)}"))
+            # Presos repetidos na listagem: uma página e uma busca de detalhes/foto por código
+            presos, repetidos = merge_duplicate_presos(presos)
+            if repetidos:
+                queue.put((
+                    "status",
+                    f"Presos repetidos na listagem: {sum(repetidos.values())} bloco(s) unidos "
+                    f"({len(repetidos)} código(s)); {len(presos)} presos distintos.",
+                ))
+            if lote:
+                queue.put((
+                    "status",
+                    "Presos por unidade: " + ", ".join(f"{u}: {len(listagens[u])}" for u in unidades if u in listagens),
+                ))
+        tempo_trabalho += time.perf_counter() - inicio
 
         # Descobrir todas as alas disponíveis
-        alas_disponiveis = sorted({p.get("ala", "") for p in presos if p.get("ala")})
-        queue.put(("choose_alas", alas_disponiveis))
-
-        # Aguardar seleção do usuário via command_queue
-        queue.put(("status", "Aguardando seleção de alas pelo usuário..."))
-        selected_alas: list[str] = []
+        def rotulo(preso: PresoRecord) -> str:
+            return ala_label(preso, lote)
+
+        alas_disponiveis = sorted({rotulo(p) for p in presos if p.get("ala")})
+        # A listagem vai junto para a busca de presos específicos na janela de seleção; as contagens e
+        # o modelo de custo das execuções anteriores, para a estimativa de tempo e tamanho por seleção
+        queue.put(("choose_alas", alas_disponiveis, presos, _ala_summary(presos, rotulo, perfil_pdf=perfil_pdf, por_pagina=por_pagina)))
+
+        # Enquanto o operador escolhe, pré-carrega detalhes e fotos (últimas alas ou a maior)
+        fotos = SpooledPhotoStore(memory_budget=memoria_fotos * 1024 * 1024)
+        parser = ParsePool(default_parse_workers() if processos_parsing is None else processos_parsing)
+        parser.start()  # os processos de parsing sobem durante a seleção
+        collector = DetailCollector(session, field_set=campos, photos=fotos, parser=parser)
+        collector.start_prefetch(prefetch_order(presos, load_state(LAST_ALAS_KEY, []), key=rotulo))
+
+        # Aguardar seleção do usuário via command_queue (de novo se o rascunho for recusado)
         while True:
-            try:
-                cmd, payload = command_queue.get(timeout=1.0)
-                if cmd == "selected_alas":
-                    selected_alas = list(payload or [])
-                    break
-            except Exception:
-                if stop_event.is_set():
-                    return
-                continue
-
-        queue.put(("status", f"Processando alas selecionadas: {', '.join(selected_alas)}"))
-
-        # Filtrar presos pelas alas escolhidas
-        presos_filtrados = [p for p in presos if p.get("ala") in selected_alas]
-        queue.put(("status", f"Total de presos nas alas selecionadas: {len(presos_filtrados)}"))
-
-        # Coletar detalhes para cada preso
-        resultados: list[dict] = []
-        for idx, preso in enumerate(presos_filtrados, 1):
-            if stop_event.is_set():
+            queue.put(("status", "Aguardando seleção de alas pelo usuário..."))
+            selected_alas: list[str] = []
+            selected_ids: list[str] = []
+            while True:
+                try:
+                    cmd, payload = command_queue.get(timeout=COMMAND_POLL_S)
+                    if cmd == "selected_alas":
+                        selected_alas = list(payload or [])
+                        break
+                    if cmd == "selected_presos":
+                        selected_ids = [str(pid).strip() for pid in (payload or []) if str(pid).strip()]
+                        break
+                    if cmd == "pause_prefetch":
+                        # Operador começou a buscar presos específicos: não adianta carregar alas inteiras
+                        collector.stop_prefetch()
+                except Exception:
+                    if stop_event.is_set():
+                        collector.stop_prefetch()
+                        return
+                    continue
+
+            collector.stop_prefetch()
+            queue.put((
+                "status",
+                f"Pré-carregados durante a seleção: {collector.prefetched} presos, {collector.prefetched_photos} fotos",
+            ))
+            if selected_ids:
+                # Presos específicos (busca na janela): só eles são coletados
+                selecao = [f"preso:{pid}" for pid in selected_ids]
+                queue.put(("status", f"Processando presos selecionados: {', '.join(selected_ids)}"))
+                presos_filtrados = select_presos(presos, lote, ids=selected_ids)
+                queue.put(("status", f"Total de presos selecionados: {len(presos_filtrados)}"))
+            else:
+                try:
+                    save_state(LAST_ALAS_KEY, selected_alas)
+                except Exception:
+                    pass
+                selecao = selected_alas
+                queue.put(("status", f"Processando alas selecionadas: {', '.join(selected_alas)}"))
+
+                # Filtrar presos pelas alas escolhidas
+                presos_filtrados = select_presos(presos, lote, alas=selected_alas)
+                queue.put(("status", f"Total de presos nas alas selecionadas: {len(presos_filtrados)}"))
+
+            if not rascunho:
                 break
-            pid = preso.get("id", "").strip()
-            if not pid:
-                continue
-            queue.put(("status", f"[{idx}/{len(presos_filtrados)}] Buscando detalhes do preso {pid}..."))
-            try:
-                det_a = fetch_preso_cadastro(session, pid)
-                det_b = fetch_preso_informes(session, pid)
-                preso_full = {**preso, **det_a, **det_b}
-                resultados.append(preso_full)
-            except requests.exceptions.SSLError:
-                if session.verify is not False:
-                    queue.put(("status", "Aviso: SSL nos detalhes. Repetindo sem verificação."))
-                    session.verify = False
-                    urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
-                    det_a = fetch_preso_cadastro(session, pid)
-                    det_b = fetch_preso_informes(session, pid)
-                    preso_full = {**preso, **det_a, **det_b}
-                    resultados.append(preso_full)
-            except Exception as e:
-                queue.put(("status", f"Falha ao coletar detalhes do preso {pid}: {e}"))
+            # Rascunho: confere listagem e layout em segundos; os selecionados carregam enquanto isso
+            collector.start_prefetch(presos_filtrados)
+            decisao = _draft_preview(
+                queue, command_queue, stop_event, presos_filtrados, collector.photos,
+                suggested_pdf_name(unidades, selected_ids, selected_alas), por_pagina,
+            )
+            collector.stop_prefetch()
+            if decisao == "final":
+                break
+            if decisao is None:
+                queue.put(("status", "Operação cancelada após o rascunho; PDF final não gerado."))
+                queue.put(("success", "Processo concluído sem gerar PDF."))
+                queue.put(("exit_app", "Finalizado."))
+                return
+            queue.put(("choose_alas", alas_disponiveis, presos, _ala_summary(
+                presos, rotulo, collector.cached_ids(), perfil_pdf=perfil_pdf, por_pagina=por_pagina,
+            )))
+            collector.start_prefetch(prefetch_order(presos, load_state(LAST_ALAS_KEY, []), key=rotulo))
+        if recorder is not None:
+            recorder.note(selecao=selecao)  # benchmarks/replay.py lê a escolha para responder à janela de seleção
+
+        # Diário em disco: retoma uma execução interrompida com as mesmas unidades e seleção
+        journal = JobJournal.for_job("|".join(unit_url(u) for u in unidades), selecao, campos=campos)
+        if collector.restore(journal):
+            queue.put(("status", f"Retomando execução anterior: {collector.restored} presos já coletados."))
+
+        # Pré-voo numa amostra (mudança de seletores) e coleta de detalhes e fotos em paralelo;
+        # a concorrência é ajustada pelo limitador AIMD
+        inicio = time.perf_counter()
+        reaproveitados_antes = collector.reused
+        total = len(presos_filtrados)
+
+        def _progresso(done: int, total: int, pid: str) -> None:
+            queue.put((
+                "status",
+                f"[{done}/{total}] Detalhes do preso {pid} coletados (concorrência: {limiter.current})",
+            ))
+
+        try:
+            resultados = collect_selection(
+                collector, presos_filtrados, queue, stop_event=stop_event, preflight=preflight,
+                on_progress=_progresso, phase=profiler.phase,
+            )
+        except PreflightFailed as falha:
+            journal.discard()  # registros em branco não devem ser retomados depois do ajuste
+            queue.put(("status", str(falha)))
+            queue.put((
+                "validation_error",
+                "Possível mudança no HTML do Canaimé",
+                falha.problems,
+                f"Na amostra de {falha.sample_size} presos, estes campos vieram vazios demais ({falha.summary}). "
+                "A coleta completa foi cancelada antes de gerar crachás em branco:",
+            ))
+            return
+        if collector.reused:
+            queue.put(("status", f"Detalhes reaproveitados do pré-carregamento: {collector.reused}"))
+        economizadas = _saved_requests(presos_filtrados, repetidos, campos) + collector.shared_photos
+        if economizadas:
+            queue.put((
+                "status",
+                f"Requisições economizadas: {economizadas} (presos repetidos na listagem e "
+                f"{collector.shared_photos} foto(s) compartilhada(s) entre presos)",
+            ))
+        if parser.workers:
+            queue.put(("status", f"Parsing: {parser.describe()}."))
+        queue.put((
+            "status",
+            f"Detalhes coletados: {len(resultados)}/{total} (concorrência final: {limiter.current}, "
+            f"falhas/lentidão do servidor: {limiter.failures}/{limiter.slowdowns})",
+        ))
+        tempo_detalhes = time.perf_counter() - inicio
+        tempo_trabalho += tempo_detalhes
+        # Parada durante a coleta: não gera PDF incompleto; o diário em disco permite retomar
+        raise_if_cancelled(stop_event, f"coleta de detalhes ({len(resultados)} de {len(presos_filtrados)} presos)")
 
         # Perguntar caminho de salvamento do PDF (UI responde via command_queue)
-        alas_tag = "_".join(a.replace("/", "-").replace(" ", "-") for a in selected_alas)[:60]
-        suggested_pdf = f"cara_cracha_{alas_tag or 'todas'}.pdf"
-        queue.put(("ask_save_path", suggested_pdf))
+        queue.put(("ask_save_path", suggested_pdf_name(unidades, selected_ids, selected_alas)))
         save_path = ""
         queue.put(("status", "Aguardando local para salvar o PDF..."))
         while True:
             try:
-                cmd, payload = command_queue.get(timeout=1.0)
+                cmd, payload = command_queue.get(timeout=COMMAND_POLL_S)
                 if cmd == "save_path":
                     save_path = (payload or "").strip()
                     break
@@ -315,19 +585,68 @@ def process_task_func(
             queue.put(("exit_app", "Finalizado."))
             return
 
-        # Gerar PDF
-        try:
-            queue.put(("status", f"Gerando PDF em '{save_path}'..."))
-            build_pdf(session, resultados, save_path)
-            queue.put(("status", f"PDF gerado: {save_path}"))
-        except Exception as e:
-            queue.put(("status", f"Falha ao gerar PDF: {e}"))
+        # Gerar PDF (no lote, um por unidade)
+        saidas = split_outputs(save_path, resultados, lote)
+        page_cache = PageCache() if cache_paginas else None
+        gerados = 0
+        paginas = 0
+        inicio = time.perf_counter()
+        with profiler.phase("pdf"):
+            for caminho, presos_pdf in saidas:
+                try:
+                    queue.put(("status", f"Gerando PDF em '{caminho}'..."))
+                    relatorio = build_pdf(
+                        session, presos_pdf, caminho, fotos=collector.photos, stop_event=stop_event,
+                        field_set=campos, page_cache=page_cache, profile=perfil_pdf, max_mb=tamanho_max_mb,
+                        per_page=por_pagina,
+                    )
+                    queue.put(("status", f"PDF gerado: {caminho}"))
+                    paginas += relatorio["paginas"]
+                    if perfil_pdf != DEFAULT_PDF_PROFILE or tamanho_max_mb or por_pagina != DEFAULT_LAYOUT:
+                        queue.put(("status", f"PDF {describe_pdf_report(relatorio)}."))
+                    gerados += 1
+                    if snapshot:
+                        meta = {"unidades": unidades, "selecao": selecao, "campos": campos}
+                        save_snapshot(queue, caminho, presos_pdf, collector.photos, meta)
+                except OperationCancelled:
+                    raise
+                except Exception as e:
+                    queue.put(("status", f"Falha ao gerar PDF '{caminho}': {e}"))
+        tempo_pdf = time.perf_counter() - inicio
+        tempo_trabalho += tempo_pdf
+        if page_cache is not None:
+            if page_cache.hits:
+                queue.put(("status", f"Páginas: {page_cache.describe()}."))
+            page_cache.prune()
+        if fotos.spilled:
+            queue.put(("status", f"Fotos: {fotos.describe()}."))
+        fotos.close()
+        if session.reauth_count:
+            queue.put(("status", f"Login refeito {session.reauth_count} vez(es) por expiração da sessão."))
+        prune_journals()
+        if gerados and gerados == len(saidas):
+            journal.discard()
+            # Vazão medida alimenta a estimativa da janela de seleção nas próximas execuções
+            do_cache = min(total, collector.reused - reaproveitados_antes)
+            try:
+                record_run(
+                    total - do_cache, do_cache, tempo_detalhes, paginas, tempo_pdf,
+                    sum(os.path.getsize(c) for c, _p in saidas if os.path.exists(c)),
+                    profile=perfil_pdf, per_page=por_pagina,
+                )
+            except Exception:
+                pass
+        queue.put((
+            "status",
+            f"Vazão: {len(resultados)} presos de {len(unidades)} unidade(s) em {tempo_trabalho:.1f} s de trabalho "
+            f"({60 * len(resultados) / max(tempo_trabalho, 1e-6):.0f} presos/min), {gerados} PDF(s) gerado(s).",
+        ))
 
         # Se não encontrou nada, possivelmente login falhou
         if not presos:
             queue.put(("status", "Nenhum registro encontrado. Verificando se a sessão está autenticada..."))
             # Heurística simples: página alvo contém a palavra 'login'?
-            check_resp = session.get(TARGET_URL, timeout=30)
+            check_resp = session.get(unit_url(unidades[0]), timeout=30)
             check_resp.raise_for_status()
             if "login" in check_resp.url.lower() or "login" in check_resp.text.lower():
                 raise RuntimeError("Falha no login: verifique usuário/senha ou alterações no formulário.")
@@ -335,6 +654,10 @@ def process_task_func(
         queue.put(("success", "Coleta concluída com sucesso e PDF gerado."))
         queue.put(("exit_app", "Finalizado com sucesso."))
 
+    except OperationCancelled as exc:
+        # Parada pedida pela UI: nada de PDF parcial; apenas informa e sai limpo.
+        queue.put(("status", f"{exc}. PDF não gerado; presos já coletados ficam no diário para retomar."))
+
     except Exception as exc:
         import traceback
 
@@ -343,11 +666,336 @@ def process_task_func(
         # para permitir que a UI consuma a mensagem de erro antes de encerrar.
         queue.put(("error", str(exc), tb))
 
+    finally:
+        # Cancelamento ou erro no meio da coleta: os processos de parsing não ficam para trás
+        if parser is not None:
+            parser.close()
+        if recorder is not None:
+            recorder.close()
+            queue.put(("status", f"Cassete gravado: {recorder.describe()}."))
+        if player is not None:
+            queue.put(("status", f"Cassete reproduzido: {player.describe()}."))
+
+
+def _saved_requests(presos: list[PresoRecord], repetidos: dict[str, int], campos: str) -> int:
+    """Requisições que as cópias unidas dos presos selecionados teriam feito (páginas de detalhe + foto)."""
+    total = 0
+    for preso in presos:
+        copias = repetidos.get((preso.get("id") or "").strip(), 0)
+        if copias:
+            total += copias * (len(FIELD_SETS[campos]) + (1 if preso.get("imagem_link") else 0))
+    return total
+
+
+def _ala_summary(
+    presos: list[PresoRecord], rotulo, cached_ids: frozenset = frozenset(),
+    perfil_pdf: str = DEFAULT_PDF_PROFILE, por_pagina: int = DEFAULT_LAYOUT,
+) -> dict:
+    """Presos por ala, quantos já estão em cache e o modelo de custo salvo do perfil/layout (para a janela de alas)."""
+    contagens: dict[str, int] = {}
+    em_cache: dict[str, int] = {}
+    for preso in presos:
+        ala = rotulo(preso) if preso.get("ala") else ""
+        if not ala:
+            continue
+        contagens[ala] = contagens.get(ala, 0) + 1
+        if (preso.get("id") or "").strip() in cached_ids:
+            em_cache[ala] = em_cache.get(ala, 0) + 1
+    return {"contagens": contagens, "em_cache": em_cache, "modelo": load_estimates(perfil_pdf, por_pagina)}
+
+
+def _draft_preview(
+    queue: 'MpQueue',
+    command_queue: 'MpQueue',
+    stop_event: 'MpEvent',
+    presos: list[PresoRecord],
+    fotos,
+    nome: str,
+    por_pagina: int = DEFAULT_LAYOUT,
+) -> Optional[str]:
+    """Gera o rascunho, pede à UI que o abra e aguarda a decisão do operador.
+
+    Devolve "final" (gerar o PDF completo), "alas" (voltar à seleção) ou None
+    (cancelar, ou parada pedida pela UI).
+    """
+    caminho = os.path.join(tempfile.gettempdir(), f"rascunho_{nome}")
+    inicio = time.perf_counter()
+    relatorio = build_pdf(None, presos, caminho, fotos=fotos, stop_event=stop_event, draft=True, per_page=por_pagina)
+    com_foto = sum(1 for p in presos if p.get("imagem_link") and p.get("imagem_link") in fotos)
+    queue.put((
+        "status",
+        f"Rascunho com {relatorio['paginas']} página(s) ({com_foto} com foto) gerado em "
+        f"{time.perf_counter() - inicio:.1f} s: {caminho}",
+    ))
+    queue.put(("draft_ready", caminho, relatorio["paginas"]))
+    queue.put(("status", "Aguardando confirmação do rascunho..."))
+    while True:
+        try:
+            cmd, payload = command_queue.get(timeout=COMMAND_POLL_S)
+            if cmd == "draft_decision":
+                return payload if payload in ("final", "alas") else None
+        except Exception:
+            if stop_event.is_set():
+                return None
+            continue
+
+
+def _run_offline(
+    snapshot_path: str,
+    out_path: str = "",
+    campos: str = "",
+    cache_paginas: bool = True,
+    perfil_pdf: str = DEFAULT_PDF_PROFILE,
+    tamanho_max_mb: Optional[float] = None,
+    por_pagina: int = DEFAULT_LAYOUT,
+) -> int:
+    """Gera o PDF a partir de um instantâneo, sem login e sem rede.
+
+    Sem `campos`, usa o conjunto de campos gravado no instantâneo. Páginas que não
+    mudaram desde a última impressão vêm do cache de páginas.
+    """
+    if not out_path:
+        base = snapshot_path[: -len(SNAPSHOT_SUFFIX)] if snapshot_path.endswith(SNAPSHOT_SUFFIX) else os.path.splitext(snapshot_path)[0]
+        out_path = base + "_reimpressao.pdf"
+    inicio = time.perf_counter()
+    page_cache = PageCache() if cache_paginas else None
+    try:
+        meta, presos, fotos, ausentes = read_snapshot(snapshot_path)
+        relatorio = build_pdf(
+            None, presos, out_path, fotos=fotos, field_set=campos or meta.get("campos", "completo"), page_cache=page_cache,
+            profile=perfil_pdf, max_mb=tamanho_max_mb, per_page=por_pagina,
+        )
+    except Exception as e:
+        print(f"Falha na reimpressão offline: {e}", file=sys.stderr)
+        return 1
+    print(
+        f"PDF gerado offline: {out_path} ({len(presos)} presos, {time.perf_counter() - inicio:.1f} s"
+        + (f", {ausentes} foto(s) ausente(s) no armazenamento local" if ausentes else "")
+        + (f"; {page_cache.describe()}" if page_cache is not None else "")
+        + (f"; {describe_pdf_report(relatorio)}"
+           if perfil_pdf != DEFAULT_PDF_PROFILE or tamanho_max_mb or por_pagina != DEFAULT_LAYOUT else "")
+        + ")"
+    )
+    return 0
+
+
+def _parse_args(argv: Optional[list[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Canaimé Cara-Crachá")
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const="cpu",
+        default="",
+        help="Perfila o processo de trabalho por fase: cpu, mem ou cpu,mem (equivale a CANAIME_PROFILE).",
+    )
+    parser.add_argument(
+        "--profile-dir",
+        default="",
+        help="Pasta onde salvar os arquivos .prof e de alocações (padrão: diagnostics).",
+    )
+    parser.add_argument(
+        "--unidades",
+        default="",
+        help="Modo lote: ids das unidades prisionais separados por vírgula (ex.: PAMC,CPBV). Padrão: PAMC.",
+    )
+    parser.add_argument(
+        "--campos",
+        default="",
+        help="Conjunto de campos: basico (foto, nome, ala/cela; sem páginas de detalhe), "
+        "pessoal (+ cadastro) ou completo (+ informes, padrão).",
+    )
+    parser.add_argument(
+        "--sem-preflight",
+        action="store_true",
+        help="Não verifica os seletores numa amostra antes da coleta completa.",
+    )
+    parser.add_argument(
+        "--memoria-fotos",
+        type=int,
+        default=DEFAULT_MEMORY_BUDGET_MB,
+        metavar="MIB",
+        help=f"Memória máxima para fotos; o excedente vai para um arquivo temporário (padrão: {DEFAULT_MEMORY_BUDGET_MB}).",
+    )
+    parser.add_argument(
+        "--processos-parsing",
+        type=int,
+        default=None,
+        metavar="N",
+        help="Processos que interpretam as páginas de detalhe; 0 = no próprio processo de trabalho "
+        f"(padrão: núcleos - 1, até {MAX_PARSE_WORKERS}).",
+    )
+    parser.add_argument(
+        "--sem-cache-paginas",
+        action="store_true",
+        help="Desenha todas as páginas do PDF, sem reaproveitar as de impressões anteriores.",
+    )
+    parser.add_argument(
+        "--snapshot",
+        action="store_true",
+        help="Grava ao lado de cada PDF um instantâneo dos dados (<nome>.snapshot.jsonl) para reimpressão offline.",
+    )
+    parser.add_argument(
+        "--offline",
+        default="",
+        metavar="INSTANTANEO",
+        help="Gera o PDF a partir de um instantâneo, sem login e sem rede (não abre a janela).",
+    )
+    parser.add_argument(
+        "--saida",
+        default="",
+        help="Com --offline: caminho do PDF (padrão: <nome>_reimpressao.pdf ao lado do instantâneo).",
+    )
+    parser.add_argument(
+        "--rascunho",
+        action="store_true",
+        help="Antes da coleta completa, abre um PDF de rascunho (só listagem e fotos já baixadas) para "
+        "conferência; o PDF final só é gerado após a confirmação.",
+    )
+    parser.add_argument(
+        "--perfil-pdf",
+        default="",
+        help="Perfil de saída do PDF: padrao, impressao, arquivo (fonte Unicode embutida) ou email "
+        "(aceita print/archive; padrão: padrao).",
+    )
+    parser.add_argument(
+        "--tamanho-max-mb",
+        type=float,
+        default=None,
+        metavar="MB",
+        help="Tamanho máximo do PDF: as fotos são recomprimidas até caber (padrão: o do perfil; 0 = sem limite).",
+    )
+    parser.add_argument(
+        "--por-pagina",
+        type=int,
+        choices=sorted(PAGE_LAYOUTS),
+        default=DEFAULT_LAYOUT,
+        help="Presos por página do PDF; com 2 ou 4, o crachá sai em escala e com os campos compactos "
+        f"(padrão: {DEFAULT_LAYOUT}).",
+    )
+    parser.add_argument(
+        "--gravar-cassete",
+        default="",
+        metavar="ARQUIVO",
+        help=f"Grava todas as requisições/respostas da execução num cassete comprimido, sem as credenciais "
+        f"(ex.: coleta{CASSETTE_SUFFIX}).",
+    )
+    parser.add_argument(
+        "--reproduzir-cassete",
+        default="",
+        metavar="ARQUIVO",
+        help="Responde às requisições a partir de um cassete gravado, sem rede (qualquer usuário/senha serve).",
+    )
+    parser.add_argument(
+        "--escala-tempo",
+        type=float,
+        default=1.0,
+        metavar="F",
+        help="Com --reproduzir-cassete: multiplica o tempo gravado de cada resposta (padrão: 1; 0 = sem espera).",
+    )
+    parser.add_argument(
+        "--sem-aquecimento",
+        action="store_true",
+        help="Não abre o processo de trabalho junto com a janela (conexão e formulário só depois do clique).",
+    )
+    parser.add_argument(
+        "--servico",
+        action="store_true",
+        help="Roda o serviço local (sem janela): um login só, caches quentes e fila de trabalhos via HTTP.",
+    )
+    parser.add_argument(
+        "--porta",
+        type=int,
+        default=DEFAULT_PORT,
+        help=f"Com --servico: porta HTTP em {DEFAULT_HOST} (padrão: {DEFAULT_PORT}).",
+    )
+    parser.add_argument(
+        "--usar-servico",
+        action="store_true",
+        help="A janela envia o trabalho ao serviço local já autenticado em vez de fazer login e coletar.",
+    )
+    # parse_known_args: o executável congelado pode receber argumentos do multiprocessing
+    args, _ = parser.parse_known_args(argv)
+    if args.campos:
+        try:
+            args.campos = resolve_field_set(args.campos)
+        except ValueError as e:
+            parser.error(str(e))
+    if args.perfil_pdf:
+        try:
+            args.perfil_pdf = resolve_pdf_profile(args.perfil_pdf)
+        except ValueError as e:
+            parser.error(str(e))
+    if args.tamanho_max_mb is not None and args.tamanho_max_mb < 0:
+        parser.error("--tamanho-max-mb não pode ser negativo.")
+    if args.memoria_fotos < 0:
+        parser.error("--memoria-fotos não pode ser negativo.")
+    if args.processos_parsing is not None and args.processos_parsing < 0:
+        parser.error("--processos-parsing não pode ser negativo.")
+    if args.escala_tempo < 0:
+        parser.error("--escala-tempo não pode ser negativo.")
+    if args.gravar_cassete and args.reproduzir_cassete:
+        parser.error("--gravar-cassete e --reproduzir-cassete não podem ser usados juntos.")
+    if args.usar_servico and args.rascunho:
+        parser.error("--rascunho não funciona com --usar-servico (a coleta e o rascunho são feitos no serviço).")
+    if args.reproduzir_cassete and not os.path.isfile(args.reproduzir_cassete):
+        parser.error(f"Cassete não encontrado: {args.reproduzir_cassete}")
+    return args
+
 
 def main() -> None:
     mp.freeze_support()
+    args = _parse_args()
+    if args.offline:
+        sys.exit(_run_offline(
+            args.offline, args.saida, args.campos, cache_paginas=not args.sem_cache_paginas,
+            perfil_pdf=args.perfil_pdf or DEFAULT_PDF_PROFILE, tamanho_max_mb=args.tamanho_max_mb,
+            por_pagina=args.por_pagina,
+        ))
+    if args.servico:
+        sys.exit(run_service(
+            _login, referer=LOGIN_URL, port=args.porta, memoria_fotos=args.memoria_fotos, cache_paginas=not args.sem_cache_paginas,
+            processos_parsing=args.processos_parsing,
+        ))
+    configure_from_args(args.profile, args.profile_dir)
+    unidades = [u for u in re.split(r"[,\s]+", args.unidades.upper()) if u]
+    task_kwargs = {"unidades": unidades} if unidades else {}
+    if args.snapshot:
+        task_kwargs["snapshot"] = True
+    if args.campos:
+        task_kwargs["campos"] = args.campos
+    if args.sem_preflight:
+        task_kwargs["preflight"] = False
+    if args.sem_cache_paginas:
+        task_kwargs["cache_paginas"] = False
+    if args.memoria_fotos != DEFAULT_MEMORY_BUDGET_MB:
+        task_kwargs["memoria_fotos"] = args.memoria_fotos
+    if args.processos_parsing is not None:
+        task_kwargs["processos_parsing"] = args.processos_parsing
+    if args.rascunho:
+        task_kwargs["rascunho"] = True
+    if args.perfil_pdf:
+        task_kwargs["perfil_pdf"] = args.perfil_pdf
+    if args.tamanho_max_mb is not None:
+        task_kwargs["tamanho_max_mb"] = args.tamanho_max_mb
+    if args.por_pagina != DEFAULT_LAYOUT:
+        task_kwargs["por_pagina"] = args.por_pagina
+    if args.gravar_cassete:
+        task_kwargs["gravar_cassete"] = os.path.abspath(args.gravar_cassete)
+    if args.reproduzir_cassete:
+        task_kwargs["reproduzir_cassete"] = os.path.abspath(args.reproduzir_cassete)
+        task_kwargs["escala_tempo"] = args.escala_tempo
+    task = functools.partial(process_task_func, **task_kwargs) if task_kwargs else process_task_func
+    if args.usar_servico:
+        # Cliente fino: seleção e opções do PDF vão no pedido; coleta e caches são do serviço
+        task = functools.partial(
+            service_client_task_func, unidades=unidades, campos=args.campos or "completo", snapshot=args.snapshot,
+            perfil_pdf=args.perfil_pdf or DEFAULT_PDF_PROFILE, tamanho_max_mb=args.tamanho_max_mb,
+            por_pagina=args.por_pagina,
+        )
     root = tk.Tk()
-    app = LoginApp(root=root, headless=False, process_task_func=process_task_func)
+    # O cliente fino não faz login: não há conexão com o Canaimé para aquecer
+    app = LoginApp(root=root, headless=False, process_task_func=task,
+                   prewarm=not (args.sem_aquecimento or args.usar_servico))
     root.mainloop()
 
 
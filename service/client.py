@@ -0,0 +1,187 @@
+
+from __future__ import annotations
+
+import json
+import os
+import traceback
+import urllib.error
+import urllib.request
+from typing import Any, Dict, List, Mapping, Optional, Sequence
+from urllib.parse import quote
+
+from gui.selectors.job_steps import COMMAND_POLL_S, suggested_pdf_name
+from gui.selectors.pamc_scraper import DEFAULT_UNIT
+from service.daemon import DONE, FAILED, TOKEN_HEADER, service_file_path
+from utils.pdf_builder import DEFAULT_LAYOUT, DEFAULT_PDF_PROFILE
+from utils.preso_record import PresoRecord
+
+
+# Intervalo de consulta do andamento do trabalho pela janela
+SERVICE_POLL_S = 0.5
+
+
+class ServiceError(RuntimeError):
+    """Resposta de erro do serviço local (ou serviço inacessível)."""
+
+
+class ServiceClient:
+    """Cliente da API do serviço local (`python main.py --servico`)."""
+
+    def __init__(self, url: str, token: str, timeout: float = 30.0):
+        self.url = url.rstrip("/")
+        self.token = token
+        self.timeout = timeout
+
+    @classmethod
+    def discover(cls, timeout: float = 2.0) -> Optional["ServiceClient"]:
+        """Cliente do serviço publicado nesta máquina, ou None se não houver serviço respondendo."""
+        try:
+            with open(service_file_path(), encoding="utf-8") as fh:
+                info = json.load(fh)
+            client = cls(info["url"], info["token"])
+            client.health(timeout=timeout)
+        except (OSError, ValueError, KeyError, ServiceError):
+            return None
+        return client
+
+    def _call(self, method: str, path: str, body: Any = None, timeout: Optional[float] = None) -> Any:
+        data = json.dumps(body).encode("utf-8") if body is not None else None
+        request = urllib.request.Request(f"{self.url}{path}", data=data, method=method)
+        request.add_header(TOKEN_HEADER, self.token)
+        if data is not None:
+            request.add_header("Content-Type", "application/json")
+        try:
+            with urllib.request.urlopen(request, timeout=timeout or self.timeout) as resp:
+                return json.loads(resp.read().decode("utf-8"))
+        except urllib.error.HTTPError as exc:
+            try:
+                message = json.loads(exc.read().decode("utf-8")).get("erro", "")
+            except ValueError:
+                message = ""
+            raise ServiceError(message or f"HTTP {exc.code} em {path}") from exc
+        except (urllib.error.URLError, OSError) as exc:
+            raise ServiceError(f"Serviço local inacessível em {self.url}: {exc}") from exc
+
+    def health(self, timeout: Optional[float] = None) -> Dict[str, Any]:
+        return self._call("GET", "/saude", timeout=timeout)
+
+    def listing(self, unidades: Sequence[str] = ()) -> Dict[str, Any]:
+        """Alas disponíveis e presos das unidades, pela sessão já autenticada do serviço."""
+        return self._call("GET", f"/listagem?unidades={quote(','.join(unidades))}")
+
+    def submit(self, spec: Mapping[str, Any]) -> Dict[str, Any]:
+        """Enfileira um PDF; a resposta traz `id` e `duplicado` (pedido igual já em andamento)."""
+        return self._call("POST", "/trabalhos", dict(spec))
+
+    def status(self, job_id: str, since: int = 0) -> Dict[str, Any]:
+        return self._call("GET", f"/trabalhos/{quote(job_id)}?desde={since}")
+
+    def jobs(self) -> List[Dict[str, Any]]:
+        return self._call("GET", "/trabalhos")
+
+
+def service_client_task_func(
+    headless: bool,
+    queue,
+    command_queue,
+    stop_event,
+    username: str,
+    password: str,
+    unidades: Optional[List[str]] = None,
+    campos: str = "completo",
+    snapshot: bool = False,
+    perfil_pdf: str = DEFAULT_PDF_PROFILE,
+    tamanho_max_mb: Optional[float] = None,
+    por_pagina: int = DEFAULT_LAYOUT,
+) -> None:
+    """Cliente fino do serviço local para a janela: mesma conversa com a UI, sem login nem coleta aqui.
+
+    A listagem vem do serviço, o PDF é um trabalho na fila dele e o andamento é
+    consultado até terminar. As credenciais digitadas não são usadas (a sessão é a do
+    serviço). `perfil_pdf`, `tamanho_max_mb` e `por_pagina` vão no pedido e o serviço
+    os repassa a `build_pdf`. Fechar a janela não cancela o trabalho já enfileirado.
+    """
+    try:
+        client = ServiceClient.discover()
+        if client is None:
+            raise RuntimeError("Serviço local não encontrado. Inicie-o com: python main.py --servico")
+        queue.put(("status", f"Usando o serviço local em {client.url} (sessão já autenticada)."))
+        unidades = list(dict.fromkeys(u.strip() for u in (unidades or []) if u.strip())) or [DEFAULT_UNIT]
+        listagem = client.listing(unidades)
+        for unidade, erro in (listagem.get("falhas") or {}).items():
+            queue.put(("status", f"Falha ao acessar a listagem da unidade {unidade}: {erro}"))
+        presos = [PresoRecord.from_mapping(p) for p in listagem["presos"]]
+        queue.put(("choose_alas", listagem["alas"], presos))
+
+        queue.put(("status", "Aguardando seleção de alas pelo usuário..."))
+        selected_alas: List[str] = []
+        selected_ids: List[str] = []
+        while True:
+            try:
+                cmd, payload = command_queue.get(timeout=COMMAND_POLL_S)
+                if cmd == "selected_alas":
+                    selected_alas = list(payload or [])
+                    break
+                if cmd == "selected_presos":
+                    selected_ids = [str(pid).strip() for pid in (payload or []) if str(pid).strip()]
+                    break
+            except Exception:
+                if stop_event.is_set():
+                    return
+                continue
+
+        queue.put(("ask_save_path", suggested_pdf_name(unidades, selected_ids, selected_alas)))
+        save_path = ""
+        queue.put(("status", "Aguardando local para salvar o PDF..."))
+        while True:
+            try:
+                cmd, payload = command_queue.get(timeout=COMMAND_POLL_S)
+                if cmd == "save_path":
+                    save_path = (payload or "").strip()
+                    break
+            except Exception:
+                if stop_event.is_set():
+                    return
+                continue
+        if not save_path:
+            queue.put(("status", "Operação cancelada: caminho não informado."))
+            queue.put(("success", "Processo concluído sem gerar PDF."))
+            queue.put(("exit_app", "Finalizado."))
+            return
+
+        job = client.submit({
+            "unidades": unidades,
+            "alas": selected_alas,
+            "presos": selected_ids,
+            "campos": campos,
+            "saida": save_path,
+            "snapshot": snapshot,
+            "perfil_pdf": perfil_pdf,
+            "tamanho_max_mb": tamanho_max_mb,
+            "por_pagina": por_pagina,
+        })
+        if job["duplicado"]:
+            queue.put(("status", f"Pedido igual já em andamento no serviço (trabalho {job['id']}): o PDF será copiado."))
+        else:
+            queue.put(("status", f"Trabalho {job['id']} enfileirado no serviço."))
+        visto = 0
+        while True:
+            if stop_event.is_set():
+                queue.put(("status", f"Janela fechada: o trabalho {job['id']} continua no serviço."))
+                return
+            estado = client.status(job["id"], since=visto)
+            for texto in estado["mensagens"]:
+                queue.put(("status", texto))
+            visto = estado["proxima"]
+            if estado["estado"] == DONE:
+                gerados = [a for a in estado["arquivos"] if os.path.exists(a)]
+                queue.put(("status", f"PDF(s) gerado(s) pelo serviço: {', '.join(gerados) or 'nenhum'}"))
+                queue.put(("success", "Coleta concluída com sucesso e PDF gerado."))
+                queue.put(("exit_app", "Finalizado com sucesso."))
+                return
+            if estado["estado"] == FAILED:
+                raise RuntimeError(f"O serviço não gerou o PDF: {estado['erro']}")
+            stop_event.wait(SERVICE_POLL_S)
+
+    except Exception as exc:
+        queue.put(("error", str(exc), traceback.format_exc()))
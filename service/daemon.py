@@ -0,0 +1,440 @@
+
+from __future__ import annotations
+
+import collections
+import itertools
+import json
+import os
+import secrets
+import shutil
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from queue import Empty, Queue
+from typing import Any, Callable, Dict, List, Mapping, Optional, Sequence, Tuple
+from urllib.parse import parse_qs, urlparse
+
+from gui.selectors.detail_collector import DetailCollector
+from gui.selectors.parse_pool import ParsePool
+from gui.selectors.pamc_scraper import DEFAULT_UNIT, fetch_units_data, merge_duplicate_presos
+from utils.concurrency import AdaptiveLimiter
+from utils.http_session import new_session
+from utils.local_state import state_dir
+from utils.pdf_builder import DEFAULT_PDF_PROFILE, resolve_layout, resolve_pdf_profile
+from utils.photo_store import DEFAULT_MEMORY_BUDGET_MB, SpooledPhotoStore
+from utils.preso_record import PresoRecord, resolve_field_set
+
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+# Arquivo de descoberta (url + token) lido pelos clientes na mesma máquina
+SERVICE_FILE = "servico.json"
+TOKEN_HEADER = "X-Canaime-Token"
+# Listagem reaproveitada entre trabalhos por este tempo (o efetivo muda pouco em minutos)
+LISTING_TTL_S = 300.0
+# Detalhes de presos reaproveitados por até 1 h; depois são buscados de novo (fotos continuam)
+DETAILS_TTL_S = 3600.0
+# Mensagens de status guardadas por trabalho e trabalhos terminados mantidos para consulta
+JOB_MESSAGES = 500
+JOB_HISTORY = 200
+
+# Estados de um trabalho
+QUEUED, RUNNING, DONE, FAILED = "na_fila", "executando", "concluido", "falhou"
+
+
+def service_file_path() -> str:
+    return os.path.join(state_dir(), SERVICE_FILE)
+
+
+def normalize_spec(spec: Mapping[str, Any]) -> Dict[str, Any]:
+    """Pedido de PDF validado: unidades, alas ou presos, campos, saída e perfil/limite/layout do PDF."""
+    unidades = [str(u).strip().upper() for u in (spec.get("unidades") or []) if str(u).strip()]
+    alas = [str(a) for a in (spec.get("alas") or []) if str(a).strip()]
+    presos = [str(p).strip() for p in (spec.get("presos") or []) if str(p).strip()]
+    saida = str(spec.get("saida") or "").strip()
+    if not saida:
+        raise ValueError("Informe 'saida' (caminho do PDF).")
+    if not alas and not presos:
+        raise ValueError("Informe 'alas' ou 'presos'.")
+    tamanho_max_mb = spec.get("tamanho_max_mb")
+    if tamanho_max_mb is not None:
+        try:
+            tamanho_max_mb = float(tamanho_max_mb)
+        except (TypeError, ValueError):
+            raise ValueError(f"'tamanho_max_mb' inválido: {tamanho_max_mb!r}") from None
+        if tamanho_max_mb < 0:
+            raise ValueError("'tamanho_max_mb' não pode ser negativo.")
+    return {
+        "unidades": list(dict.fromkeys(unidades)) or [DEFAULT_UNIT],
+        "alas": alas,
+        "presos": presos,
+        "campos": resolve_field_set(spec.get("campos")),
+        "saida": os.path.abspath(saida),
+        "snapshot": bool(spec.get("snapshot")),
+        "perfil_pdf": resolve_pdf_profile(spec.get("perfil_pdf") or DEFAULT_PDF_PROFILE),
+        "tamanho_max_mb": tamanho_max_mb,
+        "por_pagina": resolve_layout(spec.get("por_pagina")),
+    }
+
+
+def spec_key(spec: Mapping[str, Any]) -> str:
+    """Identidade do trabalho para deduplicação (a saída não entra: pedidos iguais viram cópias)."""
+    return json.dumps(
+        [
+            sorted(spec["unidades"]), sorted(spec["alas"]), sorted(spec["presos"]), spec["campos"], spec["snapshot"],
+            spec["perfil_pdf"], spec["tamanho_max_mb"], spec["por_pagina"],
+        ],
+        ensure_ascii=False,
+    )
+
+
+class JobReport:
+    """Recebe as mensagens `("status", texto)` do trabalho, como a fila da UI recebe."""
+
+    def __init__(self, job: Dict[str, Any], echo: bool = False):
+        self.job = job
+        self.echo = echo
+
+    def put(self, message: Tuple[Any, ...]) -> None:
+        if not message or message[0] != "status":
+            return
+        text = str(message[1])
+        self.job["mensagens"].append((self.job["n_mensagens"], text))
+        self.job["n_mensagens"] += 1
+        if self.echo and not text.startswith("["):
+            print(f"[{self.job['id']}] {text}", flush=True)
+
+
+class ConsoleReport:
+    """Mensagens de status fora de um trabalho (login inicial do serviço) vão para o console."""
+
+    def put(self, message: Tuple[Any, ...]) -> None:
+        if message and message[0] == "status":
+            print(f"[serviço] {message[1]}", flush=True)
+
+
+class WarmState:
+    """Sessão autenticada e caches mantidos entre os trabalhos do serviço.
+
+    O login é feito uma vez (e refeito pela sessão se expirar); listagens ficam em
+    cache por `LISTING_TTL_S`, detalhes por `DETAILS_TTL_S`, e fotos e páginas
+    desenhadas valem para todos os trabalhos seguintes. `login(session, queue, verbose)` é o mesmo login
+    do processo de trabalho da janela.
+    As páginas de detalhe de todos os trabalhos são interpretadas no mesmo pool de
+    `processos_parsing` processos (0 = na thread de coleta).
+    """
+
+    def __init__(
+        self,
+        login: Callable[..., None],
+        memoria_fotos: int = DEFAULT_MEMORY_BUDGET_MB,
+        cache_paginas: bool = True,
+        referer: Optional[str] = None,
+        processos_parsing: int = 0,
+    ):
+        self._login = login
+        self._referer = referer
+        self.stop_event = threading.Event()
+        self.limiter = AdaptiveLimiter()
+        self.session = None
+        self.photos = SpooledPhotoStore(memory_budget=memoria_fotos * 1024 * 1024)
+        self.cache_paginas = cache_paginas
+        self.parser = ParsePool(processos_parsing)
+        self.report: Any = None
+        self._collectors: Dict[str, Tuple[float, DetailCollector]] = {}
+        self._listings: Dict[str, Tuple[float, List[PresoRecord]]] = {}
+        self._lock = threading.Lock()
+
+    def ensure_session(self, report) -> Any:
+        with self._lock:
+            if self.session is None:
+                session = new_session(stop_event=self.stop_event, referer=self._referer, limiter=self.limiter)
+                self._login(session, queue=report)
+                session.reauthenticate = self._relogin
+                self.session = session
+            return self.session
+
+    def _relogin(self, session) -> None:
+        report = self.report
+        if report is not None:
+            report.put(("status", "Sessão expirada: refazendo login..."))
+        self._login(session, queue=report, verbose=False)
+
+    def collector(self, campos: str) -> DetailCollector:
+        """Coletor do conjunto de campos; recriado (detalhes frescos) depois de `DETAILS_TTL_S`."""
+        with self._lock:
+            created, collector = self._collectors.get(campos, (0.0, None))
+            if collector is None or time.monotonic() - created > DETAILS_TTL_S:
+                collector = DetailCollector(self.session, field_set=campos, photos=self.photos, parser=self.parser)
+                self._collectors[campos] = (time.monotonic(), collector)
+            return collector
+
+    def listings(
+        self, unidades: Sequence[str], report, max_age: float = LISTING_TTL_S
+    ) -> Tuple[Dict[str, List[PresoRecord]], Dict[str, BaseException]]:
+        """Listagens por unidade, do cache se recentes; as demais buscadas em paralelo."""
+        session = self.ensure_session(report)
+        now = time.monotonic()
+        with self._lock:
+            found = {u: self._listings[u][1] for u in unidades if u in self._listings and now - self._listings[u][0] <= max_age}
+        missing = [u for u in unidades if u not in found]
+        errors: Dict[str, BaseException] = {}
+        if missing:
+            fetched, errors = fetch_units_data(session, missing, max_workers=self.limiter.maximum)
+            for unidade, presos in fetched.items():
+                fetched[unidade], repetidos = merge_duplicate_presos(presos)
+                if repetidos and report is not None:
+                    report.put(("status", f"{unidade}: {sum(repetidos.values())} bloco(s) repetido(s) unido(s)"))
+            with self._lock:
+                for unidade, presos in fetched.items():
+                    self._listings[unidade] = (time.monotonic(), presos)
+            found.update(fetched)
+        elif report is not None:
+            report.put(("status", f"Listagem reaproveitada do cache do serviço: {', '.join(unidades)}"))
+        return found, errors
+
+    def close(self) -> None:
+        self.stop_event.set()
+        self.parser.close()
+        self.photos.close()
+
+
+class JobService:
+    """Fila de trabalhos de PDF executados um por vez sobre o estado quente.
+
+    Um pedido igual a outro ainda na fila ou em execução (mesmas unidades, alas ou
+    presos, campos) não vira trabalho novo: a saída dele é acrescentada ao trabalho
+    existente e o PDF é copiado para lá no fim. `runner(spec, report)` gera os PDFs e
+    devolve os caminhos gravados.
+    """
+
+    def __init__(self, runner: Callable[[Dict[str, Any], JobReport], List[str]], echo: bool = True):
+        self._runner = runner
+        self.echo = echo
+        self.jobs: "collections.OrderedDict[str, Dict[str, Any]]" = collections.OrderedDict()
+        self._active: Dict[str, str] = {}
+        self._pending: "Queue[Optional[str]]" = Queue()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._work, name="servico-trabalhos", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._pending.put(None)
+
+    def submit(self, raw_spec: Mapping[str, Any]) -> Tuple[Dict[str, Any], bool]:
+        """Enfileira o pedido; devolve (estado do trabalho, se foi deduplicado)."""
+        spec = normalize_spec(raw_spec)
+        key = spec_key(spec)
+        with self._lock:
+            existing = self._active.get(key)
+            if existing is not None:
+                job = self.jobs[existing]
+                if spec["saida"] not in job["saidas"]:
+                    job["saidas"].append(spec["saida"])
+                job["pedidos"] += 1
+                return self._public(job), True
+            job_id = f"{next(self._ids):04d}"
+            job: Dict[str, Any] = {
+                "id": job_id,
+                "estado": QUEUED,
+                "spec": spec,
+                "saidas": [spec["saida"]],
+                "arquivos": [],
+                "pedidos": 1,
+                "erro": "",
+                "criado": time.time(),
+                "inicio": None,
+                "fim": None,
+                "mensagens": collections.deque(maxlen=JOB_MESSAGES),
+                "n_mensagens": 0,
+            }
+            self.jobs[job_id] = job
+            self._active[key] = job_id
+            self._trim_history()
+        self._pending.put(job_id)
+        return self._public(job), False
+
+    def status(self, job_id: str, since: int = 0) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            job = self.jobs.get(job_id)
+            return self._public(job, since) if job is not None else None
+
+    def list(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [self._public(job, since=None) for job in self.jobs.values()]
+
+    def queue_size(self) -> int:
+        with self._lock:
+            return sum(1 for job in self.jobs.values() if job["estado"] in (QUEUED, RUNNING))
+
+    def _trim_history(self) -> None:
+        finished = [jid for jid, job in self.jobs.items() if job["estado"] in (DONE, FAILED)]
+        for jid in finished[: max(0, len(self.jobs) - JOB_HISTORY)]:
+            del self.jobs[jid]
+
+    @staticmethod
+    def _public(job: Dict[str, Any], since: Optional[int] = 0) -> Dict[str, Any]:
+        data = {k: v for k, v in job.items() if k != "mensagens"}
+        data["saidas"] = list(job["saidas"])
+        data["arquivos"] = list(job["arquivos"])
+        if since is not None:
+            messages = [(idx, text) for idx, text in list(job["mensagens"]) if idx >= since]
+            data["mensagens"] = [text for _, text in messages]
+            data["proxima"] = messages[-1][0] + 1 if messages else since
+        return data
+
+    def _work(self) -> None:
+        while True:
+            try:
+                job_id = self._pending.get(timeout=1.0)
+            except Empty:
+                continue
+            if job_id is None:
+                return
+            job = self.jobs[job_id]
+            report = JobReport(job, echo=self.echo)
+            with self._lock:
+                job["estado"], job["inicio"] = RUNNING, time.time()
+            try:
+                files = self._runner(job["spec"], report)
+                with self._lock:
+                    # Daqui em diante, pedidos iguais viram um trabalho novo (com dados novos)
+                    self._active.pop(spec_key(job["spec"]), None)
+                    extra = list(job["saidas"][1:])
+                files += _copy_outputs(files, job["saidas"][0], extra, report)
+                with self._lock:
+                    job["arquivos"] = files
+                    job["estado"] = DONE
+            except Exception as exc:
+                report.put(("status", f"Falha no trabalho: {exc}"))
+                with self._lock:
+                    self._active.pop(spec_key(job["spec"]), None)
+                    job["erro"] = str(exc) or exc.__class__.__name__
+                    job["estado"] = FAILED
+            finally:
+                job["fim"] = time.time()
+
+
+def _copy_outputs(files: List[str], base: str, extra: Sequence[str], report) -> List[str]:
+    """Copia os PDFs gerados para as saídas dos pedidos deduplicados (mesmo sufixo de unidade)."""
+    root = os.path.splitext(base)[0]
+    copies: List[str] = []
+    for other in extra:
+        other_root = os.path.splitext(other)[0]
+        for path in files:
+            target = other_root + path[len(root):] if path.startswith(root) else other
+            try:
+                shutil.copyfile(path, target)
+                copies.append(target)
+                report.put(("status", f"PDF copiado para o pedido duplicado: {target}"))
+            except OSError as exc:
+                report.put(("status", f"Falha ao copiar o PDF para '{target}': {exc}"))
+    return copies
+
+
+class _Handler(BaseHTTPRequestHandler):
+    service: JobService
+    listing: Callable[[List[str]], Dict[str, Any]]
+    token: str
+    server_version = "CanaimeServico/1"
+
+    def log_message(self, format: str, *args: Any) -> None:  # noqa: A002
+        pass  # o console do serviço mostra as mensagens dos trabalhos, não cada requisição
+
+    def _send(self, code: int, payload: Any) -> None:
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _authorized(self) -> bool:
+        if secrets.compare_digest(self.headers.get(TOKEN_HEADER, ""), self.token):
+            return True
+        self._send(403, {"erro": "Token inválido."})
+        return False
+
+    def do_GET(self) -> None:  # noqa: N802
+        if not self._authorized():
+            return
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        parts = [p for p in url.path.split("/") if p]
+        try:
+            if parts == ["saude"]:
+                self._send(200, {"ok": True, "fila": self.service.queue_size(), "pid": os.getpid()})
+            elif parts == ["listagem"]:
+                unidades = [u for u in ",".join(query.get("unidades", [])).upper().split(",") if u.strip()]
+                self._send(200, self.listing(unidades or [DEFAULT_UNIT]))
+            elif parts == ["trabalhos"]:
+                self._send(200, self.service.list())
+            elif len(parts) == 2 and parts[0] == "trabalhos":
+                since = int((query.get("desde") or ["0"])[0] or 0)
+                status = self.service.status(parts[1], since)
+                self._send(200 if status else 404, status or {"erro": "Trabalho não encontrado."})
+            else:
+                self._send(404, {"erro": "Rota desconhecida."})
+        except Exception as exc:
+            self._send(500, {"erro": str(exc)})
+
+    def do_POST(self) -> None:  # noqa: N802
+        if not self._authorized():
+            return
+        if urlparse(self.path).path.rstrip("/") != "/trabalhos":
+            self._send(404, {"erro": "Rota desconhecida."})
+            return
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+            spec = json.loads(self.rfile.read(length) or b"{}")
+            job, duplicated = self.service.submit(spec)
+        except ValueError as exc:
+            self._send(400, {"erro": str(exc)})
+            return
+        self._send(202, {**job, "duplicado": duplicated})
+
+
+def make_server(
+    service: JobService,
+    listing: Callable[[List[str]], Dict[str, Any]],
+    host: str = DEFAULT_HOST,
+    port: int = DEFAULT_PORT,
+    token: Optional[str] = None,
+) -> ThreadingHTTPServer:
+    """Servidor HTTP local da API (`/saude`, `/listagem`, `/trabalhos`); exige o token no cabeçalho."""
+    handler = type("Handler", (_Handler,), {
+        "service": service,
+        "listing": staticmethod(listing),
+        "token": token or secrets.token_urlsafe(24),
+    })
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    server.token = handler.token  # type: ignore[attr-defined]
+    return server
+
+
+def write_service_file(server: ThreadingHTTPServer) -> str:
+    """Publica url e token para os clientes desta máquina (arquivo legível só pelo usuário)."""
+    host, port = server.server_address[:2]
+    path = service_file_path()
+    tmp = f"{path}.{os.getpid()}.tmp"
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w", encoding="utf-8") as fh:
+        json.dump({"url": f"http://{host}:{port}", "token": server.token, "pid": os.getpid()}, fh)  # type: ignore[attr-defined]
+    os.replace(tmp, path)
+    return path
+
+
+def remove_service_file() -> None:
+    try:
+        with open(service_file_path(), encoding="utf-8") as fh:
+            if json.load(fh).get("pid") != os.getpid():
+                return  # outro serviço assumiu o arquivo
+        os.remove(service_file_path())
+    except (OSError, ValueError):
+        pass
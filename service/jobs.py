@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+import functools
+import getpass
+import os
+import sys
+from typing import Any, Callable, Dict, List, Optional
+
+from gui.selectors.job_steps import ala_label, collect_selection, listed_presos, save_snapshot, select_presos, split_outputs
+from gui.selectors.pamc_scraper import DEFAULT_UNIT
+from gui.selectors.parse_pool import default_parse_workers
+from service.daemon import (
+    DEFAULT_HOST,
+    DEFAULT_PORT,
+    ConsoleReport,
+    JobReport,
+    JobService,
+    WarmState,
+    make_server,
+    remove_service_file,
+    write_service_file,
+)
+from utils.page_cache import PageCache
+from utils.pdf_builder import DEFAULT_LAYOUT, DEFAULT_PDF_PROFILE, build_pdf, describe_pdf_report
+from utils.photo_store import DEFAULT_MEMORY_BUDGET_MB
+
+
+# Credenciais do serviço local (sem elas, são pedidas no console)
+SERVICE_USER_ENV = "CANAIME_USUARIO"
+SERVICE_PASSWORD_ENV = "CANAIME_SENHA"
+
+
+def service_listing(warm: WarmState, unidades: List[str]) -> Dict[str, Any]:
+    """Resposta de `/listagem` do serviço: rótulos de ala da janela de seleção e os presos."""
+    unidades = list(dict.fromkeys(unidades)) or [DEFAULT_UNIT]
+    lote = len(unidades) > 1
+    listagens, falhas = warm.listings(unidades, report=None)
+    if falhas and not listagens:
+        raise next(iter(falhas.values()))
+    presos = [p for u in unidades for p in listagens.get(u, [])]
+    return {
+        "alas": sorted({ala_label(p, lote) for p in presos if p.get("ala")}),
+        "presos": [dict(p) for p in presos],
+        "falhas": {u: str(e) for u, e in falhas.items()},
+    }
+
+
+def run_service_job(warm: WarmState, spec: Dict[str, Any], report: JobReport) -> List[str]:
+    """Executa um trabalho do serviço local sobre a sessão e os caches quentes; devolve os PDFs gravados.
+
+    Listagem, seleção, pré-voo e coleta são os mesmos passos do processo de trabalho
+    da janela (`gui.selectors.job_steps`).
+    """
+    unidades, campos = spec["unidades"], spec["campos"]
+    lote = len(unidades) > 1
+    warm.report = report
+    try:
+        session = warm.ensure_session(report)
+        listagens, falhas = warm.listings(unidades, report)
+        presos = listed_presos(unidades, listagens, falhas, report)
+        filtrados = select_presos(presos, lote, alas=spec["alas"], ids=spec["presos"])
+        if not filtrados:
+            raise ValueError("Nenhum preso encontrado para as alas/presos pedidos.")
+        report.put(("status", f"{len(filtrados)} presos selecionados (campos: {campos})."))
+
+        collector = warm.collector(campos)
+        reaproveitados = collector.reused
+        resultados = collect_selection(
+            collector, filtrados, report, stop_event=warm.stop_event,
+            on_progress=lambda done, total, pid: report.put(("status", f"[{done}/{total}] Detalhes do preso {pid}")),
+        )
+        report.put((
+            "status",
+            f"Detalhes coletados: {len(resultados)}/{len(filtrados)} "
+            f"({collector.reused - reaproveitados} do cache do serviço).",
+        ))
+
+        arquivos: List[str] = []
+        page_cache = PageCache() if warm.cache_paginas else None
+        personalizado = (
+            spec["perfil_pdf"] != DEFAULT_PDF_PROFILE or spec["tamanho_max_mb"] or spec["por_pagina"] != DEFAULT_LAYOUT
+        )
+        for caminho, presos_pdf in split_outputs(spec["saida"], resultados, lote):
+            relatorio = build_pdf(
+                session, presos_pdf, caminho, fotos=warm.photos, stop_event=warm.stop_event,
+                field_set=campos, page_cache=page_cache, profile=spec["perfil_pdf"],
+                max_mb=spec["tamanho_max_mb"], per_page=spec["por_pagina"],
+            )
+            report.put(("status", f"PDF gerado: {caminho}"))
+            if personalizado:
+                report.put(("status", f"PDF {describe_pdf_report(relatorio)}."))
+            arquivos.append(caminho)
+            if spec["snapshot"]:
+                meta = {"unidades": unidades, "selecao": spec["alas"] or spec["presos"], "campos": campos}
+                save_snapshot(report, caminho, presos_pdf, warm.photos, meta)
+        if page_cache is not None and page_cache.hits:
+            report.put(("status", f"Páginas: {page_cache.describe()}."))
+        return arquivos
+    finally:
+        warm.report = None
+
+
+def run_service(
+    login: Callable[..., None],
+    referer: Optional[str] = None,
+    host: str = DEFAULT_HOST,
+    port: int = DEFAULT_PORT,
+    memoria_fotos: int = DEFAULT_MEMORY_BUDGET_MB,
+    cache_paginas: bool = True,
+    processos_parsing: Optional[int] = None,
+) -> int:
+    """Serviço local: um login só, caches quentes e fila de trabalhos de PDF via HTTP.
+
+    `login(session, username, password, queue, verbose)` é o login do processo de
+    trabalho da janela. As credenciais vêm de `CANAIME_USUARIO`/`CANAIME_SENHA` ou são
+    pedidas no console. O endereço e o token ficam em `~/.canaime-cara-cracha/servico.json`
+    para os clientes.
+    """
+    username = os.environ.get(SERVICE_USER_ENV, "").strip() or input("Usuário do Canaimé: ").strip()
+    password = os.environ.get(SERVICE_PASSWORD_ENV, "") or getpass.getpass("Senha: ")
+    warm = WarmState(
+        functools.partial(login, username=username, password=password),
+        memoria_fotos=memoria_fotos,
+        cache_paginas=cache_paginas,
+        referer=referer,
+        processos_parsing=default_parse_workers() if processos_parsing is None else processos_parsing,
+    )
+    try:
+        warm.ensure_session(ConsoleReport())
+    except Exception as e:
+        print(f"Falha no login do serviço: {e}", file=sys.stderr)
+        return 1
+    service = JobService(functools.partial(run_service_job, warm))
+    try:
+        server = make_server(service, functools.partial(service_listing, warm), host=host, port=port)
+    except OSError as e:
+        print(f"Não foi possível abrir {host}:{port}: {e}", file=sys.stderr)
+        warm.close()
+        return 1
+    service.start()
+    path = write_service_file(server)
+    print(f"Serviço pronto em http://{host}:{port} (token em {path}). Ctrl+C para encerrar.", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("Encerrando o serviço...", flush=True)
+    finally:
+        server.server_close()
+        service.stop()
+        warm.close()
+        remove_service_file()
+    return 0
@@ -0,0 +1,12 @@
+
+from __future__ import annotations
+
+
+class OperationCancelled(Exception):
+    """A operação foi interrompida porque o `stop_event` do processo foi sinalizado."""
+
+
+def raise_if_cancelled(stop_event, what: str = "") -> None:
+    """Levanta `OperationCancelled` se `stop_event` (threading/multiprocessing Event) estiver ativo."""
+    if stop_event is not None and stop_event.is_set():
+        raise OperationCancelled(f"Interrompido: {what}" if what else "Interrompido")
@@ -0,0 +1,272 @@
+
+from __future__ import annotations
+
+import base64
+import gzip
+import json
+import threading
+import time
+from collections import defaultdict
+from datetime import timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import parse_qsl
+
+import requests
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+from utils.photo_blobs import blob_hash
+
+
+# Cassete: JSONL comprimido com gzip, ex.: "coleta.cassete.jsonl.gz"
+CASSETTE_SUFFIX = ".cassete.jsonl.gz"
+CASSETTE_VERSION = 1
+SCRUBBED = "***"
+# Cabeçalhos com sessão ou credenciais: nunca gravados
+_DROPPED_HEADERS = {"set-cookie", "cookie", "authorization", "proxy-authorization"}
+# Só corpos de texto têm usuário/senha apagados (em fotos, trocar bytes corromperia a imagem)
+_TEXT_TYPES = ("text/", "html", "json", "xml", "javascript")
+# Segredos mais curtos que isso não são procurados nos corpos (casariam por acaso)
+MIN_SECRET_LEN = 3
+# Erros de transporte gravados e levantados de novo na reprodução
+_ERRORS = {
+    "SSLError": requests.exceptions.SSLError,
+    "ConnectTimeout": requests.exceptions.ConnectTimeout,
+    "ReadTimeout": requests.exceptions.ReadTimeout,
+    "Timeout": requests.exceptions.Timeout,
+    "ConnectionError": requests.exceptions.ConnectionError,
+}
+
+
+def _dumps(entry: Dict[str, Any]) -> str:
+    return json.dumps(entry, ensure_ascii=False, separators=(",", ":")) + "\n"
+
+
+def _scrub(text: str, secrets: List[str]) -> str:
+    for secret in secrets:
+        text = text.replace(secret, SCRUBBED)
+    return text
+
+
+def _secret_list(values: Iterable[Optional[str]], current: Iterable[str] = ()) -> List[str]:
+    """Segredos a apagar, dos mais longos aos mais curtos (um não fica pela metade dentro do outro)."""
+    found = set(current) | {v for v in values if v and len(v) >= MIN_SECRET_LEN}
+    return sorted(found, key=len, reverse=True)
+
+
+def _form_fields(body: Any) -> List[str]:
+    """Nomes dos campos de um POST de formulário (os valores, com as credenciais, não são gravados)."""
+    if isinstance(body, bytes):
+        body = body.decode("utf-8", errors="replace")
+    if not isinstance(body, str) or not body:
+        return []
+    return sorted({name for name, _value in parse_qsl(body, keep_blank_values=True)})
+
+
+class CassetteRecorder(BaseAdapter):
+    """Adaptador de transporte que grava cada requisição/resposta num cassete.
+
+    Envolve o adaptador que a sessão já usa (`inner`) e repassa tudo a ele; de cada
+    troca guarda método, URL, status, cabeçalhos, duração e início relativo, e o
+    corpo da resposta uma única vez por conteúdo (SHA-256, base64). Credenciais não
+    entram no arquivo: cabeçalhos de cookie/autorização são descartados, do corpo dos
+    POSTs só ficam os nomes dos campos e os `secrets` (usuário e senha) são trocados
+    por `***` em URLs e corpos de texto. Seguro entre threads; `close()` finaliza o gzip.
+    """
+
+    def __init__(self, inner: BaseAdapter, path: str, secrets: Iterable[str] = (), meta: Optional[Dict[str, Any]] = None):
+        super().__init__()
+        self.inner = inner
+        self.path = path
+        self.exchanges = 0
+        self.body_bytes = 0
+        self._secrets: List[str] = []
+        self._bodies: set = set()
+        self._lock = threading.Lock()
+        self._t0 = time.monotonic()
+        self._file = gzip.open(path, "wt", encoding="utf-8")
+        self._file.write(_dumps({"tipo": "cabecalho", "versao": CASSETTE_VERSION, "criado": time.time(), **(meta or {})}))
+        self.add_secrets(*secrets)
+
+    def add_secrets(self, *values: Optional[str]) -> None:
+        """Valores a apagar do que for gravado daqui em diante (ex.: usuário e senha digitados)."""
+        with self._lock:
+            self._secrets = _secret_list(values, self._secrets)
+
+    def _scrub_body(self, body: bytes, content_type: str) -> bytes:
+        if not self._secrets or not any(t in content_type.lower() for t in _TEXT_TYPES):
+            return body
+        for secret in self._secrets:
+            for encoding in ("utf-8", "latin-1"):
+                try:
+                    body = body.replace(secret.encode(encoding), SCRUBBED.encode("ascii"))
+                except UnicodeEncodeError:
+                    continue
+        return body
+
+    def note(self, **meta: Any) -> None:
+        """Anota no cassete dados da execução (ex.: seleção de alas) para a reprodução."""
+        with self._lock:
+            if self._file is not None:
+                self._file.write(_dumps({"tipo": "meta", **meta}))
+
+    def send(self, request, **kwargs):
+        started = time.monotonic()
+        entry: Dict[str, Any] = {"tipo": "troca", "metodo": request.method}
+        try:
+            resp = self.inner.send(request, **kwargs)
+            content = resp.content  # consome o corpo (também com stream=True) para gravá-lo
+        except requests.exceptions.RequestException as exc:
+            entry["erro"] = next((name for name, cls in _ERRORS.items() if isinstance(exc, cls)), "ConnectionError")
+            entry["mensagem"] = str(exc)
+            self._record(request, entry, started, None)
+            raise
+        headers = {k: v for k, v in resp.headers.items() if k.lower() not in _DROPPED_HEADERS}
+        entry.update({"status": resp.status_code, "motivo": resp.reason or "", "cabecalhos": headers})
+        self._record(request, entry, started, self._scrub_body(content or b"", resp.headers.get("Content-Type", "")))
+        return resp
+
+    def _record(self, request, entry: Dict[str, Any], started: float, body: Optional[bytes]) -> None:
+        entry["duracao"] = round(time.monotonic() - started, 4)
+        entry["inicio"] = round(started - self._t0, 4)
+        campos = _form_fields(request.body) if request.method.upper() == "POST" else []
+        if campos:
+            entry["campos"] = campos
+        with self._lock:
+            if self._file is None:
+                return
+            entry["url"] = _scrub(request.url, self._secrets)
+            if body is not None:
+                sha = blob_hash(body)
+                entry["sha"] = sha
+                if sha not in self._bodies:
+                    self._bodies.add(sha)
+                    self.body_bytes += len(body)
+                    self._file.write(_dumps({"tipo": "corpo", "sha": sha, "dados": base64.b64encode(body).decode("ascii")}))
+            self._file.write(_dumps(entry))
+            self.exchanges += 1
+
+    def describe(self) -> str:
+        return f"{self.exchanges} requisição(ões), {len(self._bodies)} corpo(s) distintos ({self.body_bytes / 1048576:.1f} MiB)"
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+        self.inner.close()
+
+
+def read_cassette(path: str) -> Tuple[Dict[str, Any], List[Dict[str, Any]], Dict[str, bytes], Dict[str, Any]]:
+    """Lê um cassete: (cabeçalho, trocas na ordem gravada, corpos por SHA, metadados anotados).
+
+    Um cassete truncado (execução interrompida antes de fechar o arquivo) é lido até
+    a última linha completa.
+    """
+    header: Dict[str, Any] = {}
+    exchanges: List[Dict[str, Any]] = []
+    bodies: Dict[str, bytes] = {}
+    meta: Dict[str, Any] = {}
+    with gzip.open(path, "rt", encoding="utf-8") as fh:
+        try:
+            for line in fh:
+                if not line.endswith("\n"):
+                    break
+                entry = json.loads(line)
+                kind = entry.get("tipo")
+                if kind == "cabecalho":
+                    header = entry
+                    if header.get("versao", CASSETTE_VERSION) > CASSETTE_VERSION:
+                        raise ValueError(f"Cassete de versão mais nova ({header.get('versao')}) que a suportada.")
+                elif kind == "corpo":
+                    bodies[entry["sha"]] = base64.b64decode(entry["dados"])
+                elif kind == "troca":
+                    exchanges.append(entry)
+                elif kind == "meta":
+                    meta.update({k: v for k, v in entry.items() if k != "tipo"})
+        except (EOFError, gzip.BadGzipFile):
+            pass
+    return header, exchanges, bodies, meta
+
+
+class CassettePlayer(BaseAdapter):
+    """Adaptador de transporte que responde a partir de um cassete, sem rede.
+
+    Cada (método, URL) devolve as respostas gravadas na ordem em que aconteceram; se
+    for pedido mais vezes do que foi gravado, a última se repete. `time_scale` aplica
+    a duração gravada de cada resposta (1.0 = tempo original, 0.5 = metade, 0 = sem
+    espera). As URLs pedidas passam pela mesma troca de `secrets` feita na gravação.
+    Requisições que não estão no cassete falham com `ConnectionError`.
+    """
+
+    def __init__(self, path: str, time_scale: float = 1.0, secrets: Iterable[str] = ()):
+        super().__init__()
+        self.path = path
+        self._secrets = _secret_list(secrets)
+        self.time_scale = max(0.0, float(time_scale))
+        self.header, exchanges, self._bodies, self.meta = read_cassette(path)
+        self._exchanges: Dict[Tuple[str, str], List[Dict[str, Any]]] = defaultdict(list)
+        for entry in exchanges:
+            self._exchanges[(entry["metodo"].upper(), entry["url"])].append(entry)
+        self._served: Dict[Tuple[str, str], int] = defaultdict(int)
+        self._lock = threading.Lock()
+        self.total = len(exchanges)
+        self.served = 0
+        self.missing = 0
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        with self._lock:
+            key = (request.method.upper(), _scrub(request.url, self._secrets))
+            entries = self._exchanges.get(key)
+            if not entries:
+                self.missing += 1
+                entry = None
+            else:
+                entry = entries[min(self._served[key], len(entries) - 1)]
+                self._served[key] += 1
+                self.served += 1
+        if entry is None:
+            raise requests.exceptions.ConnectionError(
+                f"Requisição não gravada no cassete: {request.method} {request.url}", request=request
+            )
+        if self.time_scale and entry.get("duracao"):
+            time.sleep(entry["duracao"] * self.time_scale)
+        if "erro" in entry:
+            raise _ERRORS.get(entry["erro"], requests.exceptions.ConnectionError)(entry.get("mensagem", ""), request=request)
+        resp = requests.Response()
+        resp.status_code = entry["status"]
+        resp.reason = entry.get("motivo", "")
+        resp.headers = CaseInsensitiveDict(entry.get("cabecalhos") or {})
+        resp._content = self._bodies.get(entry.get("sha", ""), b"")
+        resp.encoding = get_encoding_from_headers(resp.headers)
+        resp.url = request.url
+        resp.request = request
+        resp.elapsed = timedelta(seconds=entry.get("duracao", 0.0))
+        return resp
+
+    def add_secrets(self, *values: Optional[str]) -> None:
+        with self._lock:
+            self._secrets = _secret_list(values, self._secrets)
+
+    def describe(self) -> str:
+        return f"{self.served} de {self.total} resposta(s) gravadas servidas, {self.missing} fora do cassete"
+
+    def close(self) -> None:
+        pass
+
+
+def record_session(session: requests.Session, path: str, secrets: Iterable[str] = (), meta: Optional[Dict[str, Any]] = None) -> CassetteRecorder:
+    """Passa a gravar todo o tráfego http(s) da sessão em `path` (sobre o transporte atual)."""
+    recorder = CassetteRecorder(session.get_adapter("https://"), path, secrets=secrets, meta=meta)
+    session.mount("https://", recorder)
+    session.mount("http://", recorder)
+    return recorder
+
+
+def replay_session(session: requests.Session, path: str, time_scale: float = 1.0, secrets: Iterable[str] = ()) -> CassettePlayer:
+    """Faz a sessão responder só a partir do cassete em `path`."""
+    player = CassettePlayer(path, time_scale=time_scale, secrets=secrets)
+    session.mount("https://", player)
+    session.mount("http://", player)
+    return player
@@ -0,0 +1,125 @@
+
+from __future__ import annotations
+
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+
+from utils.cancellation import raise_if_cancelled
+
+
+# Parâmetros do controle AIMD (aumento aditivo, redução multiplicativa)
+INITIAL_LIMIT = 2
+MIN_LIMIT = 1
+MAX_LIMIT = 8
+BACKOFF_FACTOR = 0.5        # 429/5xx/timeout: corta o limite pela metade
+SLOWDOWN_FACTOR = 0.8       # latência muito acima da referência: redução suave
+SLOWDOWN_RATIO = 2.5        # "muito acima" = latência > referência * SLOWDOWN_RATIO
+DECREASE_COOLDOWN_S = 1.0   # no máximo uma redução por janela (falhas simultâneas contam uma vez)
+MAX_RETRY_AFTER_S = 120.0
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Converte o cabeçalho `Retry-After` (segundos ou data HTTP) em segundos de espera."""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            when = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        seconds = when.timestamp() - time.time()
+    return min(max(seconds, 0.0), MAX_RETRY_AFTER_S)
+
+
+class AdaptiveLimiter:
+    """Limite de requisições simultâneas ajustado por AIMD para proteger o servidor.
+
+    Cada resposta saudável soma `1/limite` (≈ +1 por janela completa); 429, 5xx,
+    timeouts e erros de conexão cortam o limite pela metade; latência muito acima
+    da referência reduz suavemente. A referência é a menor latência recente de cada
+    tipo de página (`key`, ex.: o caminho da URL) e acompanha devagar as mudanças,
+    já que uma foto e a listagem completa têm tempos naturais bem diferentes.
+    `Retry-After` pausa novas requisições até o prazo indicado.
+    """
+
+    def __init__(self, initial: int = INITIAL_LIMIT, minimum: int = MIN_LIMIT, maximum: int = MAX_LIMIT):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.limit = float(min(max(initial, minimum), maximum))
+        self.inflight = 0
+        self.successes = 0
+        self.failures = 0
+        self.slowdowns = 0
+        self._cond = threading.Condition()
+        self._pause_until = 0.0
+        self._last_decrease = 0.0
+        self._reference_latency: Dict[str, float] = {}
+
+    @property
+    def current(self) -> int:
+        """Limite inteiro em vigor (quantas requisições podem estar em andamento)."""
+        return max(self.minimum, int(self.limit))
+
+    def acquire(self, stop_event=None) -> None:
+        """Bloqueia até haver vaga e a pausa de `Retry-After` ter passado (cancelável)."""
+        with self._cond:
+            while True:
+                raise_if_cancelled(stop_event, "aguardando vaga de requisição")
+                pause = self._pause_until - time.monotonic()
+                if pause <= 0 and self.inflight < self.current:
+                    self.inflight += 1
+                    return
+                self._cond.wait(timeout=min(pause, 0.1) if pause > 0 else 0.1)
+
+    def release(
+        self,
+        latency: float,
+        status: Optional[int] = None,
+        error: bool = False,
+        retry_after: Optional[float] = None,
+        counted: bool = True,
+        key: str = "",
+    ) -> None:
+        """Devolve a vaga e ajusta o limite conforme o resultado da requisição.
+
+        `counted=False` (ex.: requisição cancelada) só devolve a vaga.
+        """
+        with self._cond:
+            self.inflight = max(0, self.inflight - 1)
+            now = time.monotonic()
+            if retry_after:
+                self._pause_until = max(self._pause_until, now + retry_after)
+            if counted:
+                if error or status == 429 or (status is not None and status >= 500):
+                    self.failures += 1
+                    self._decrease(now, BACKOFF_FACTOR)
+                else:
+                    self.successes += 1
+                    reference = self._update_reference(key, latency)
+                    if latency > reference * SLOWDOWN_RATIO:
+                        self.slowdowns += 1
+                        self._decrease(now, SLOWDOWN_FACTOR)
+                    else:
+                        self.limit = min(float(self.maximum), self.limit + 1.0 / self.limit)
+            self._cond.notify_all()
+
+    def _update_reference(self, key: str, latency: float) -> float:
+        ref = self._reference_latency.get(key)
+        if ref is None or latency < ref:
+            ref = latency
+        else:
+            ref += (latency - ref) * 0.02
+        ref = max(ref, 1e-3)
+        self._reference_latency[key] = ref
+        return ref
+
+    def _decrease(self, now: float, factor: float) -> None:
+        if now - self._last_decrease < DECREASE_COOLDOWN_S:
+            return
+        self._last_decrease = now
+        self.limit = max(float(self.minimum), self.limit * factor)
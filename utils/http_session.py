@@ -0,0 +1,206 @@
+
+from __future__ import annotations
+
+import threading
+import time
+from typing import Callable, Optional
+from urllib.parse import urlsplit
+
+import requests
+
+from utils.cancellation import OperationCancelled, raise_if_cancelled
+from utils.concurrency import AdaptiveLimiter, parse_retry_after
+
+
+DEFAULT_USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/125.0 Safari/537.36"
+)
+
+# Intervalo com que uma requisição em andamento verifica o pedido de parada.
+CANCEL_POLL_INTERVAL = 0.1
+
+# Respostas de "servidor ocupado" repetidas após a pausa de Retry-After (ou backoff)
+THROTTLE_STATUSES = (429, 503)
+MAX_THROTTLE_RETRIES = 3
+THROTTLE_BACKOFF_S = 2.0
+
+# Sessão expirada: quantas vezes uma requisição refaz o login e é repetida antes de desistir
+MAX_REAUTH_RETRIES = 2
+LOGIN_PATH_MARKER = "/login/"
+# Só o começo do corpo é inspecionado à procura do formulário de login
+LOGIN_SNIFF_BYTES = 16384
+_PASSWORD_INPUT_MARKERS = (b'type="password"', b"type='password'", b"type=password")
+
+
+class SessionExpired(RuntimeError):
+    """A sessão do Canaimé expirou e o novo login não foi aceito."""
+
+
+def looks_like_login_page(resp: requests.Response, requested_url: str) -> bool:
+    """A resposta é a página de login em vez do conteúdo pedido (sessão expirada)?
+
+    Sinais: redirecionamento para uma URL de login ou um formulário com campo de
+    senha numa página HTML. Requisições à própria página de login não contam.
+    """
+    if LOGIN_PATH_MARKER in requested_url:
+        return False
+    if LOGIN_PATH_MARKER in (resp.url or ""):
+        return True
+    content_type = resp.headers.get("Content-Type", "")
+    if content_type and "html" not in content_type.lower():
+        return False
+    head = (resp.content or b"")[:LOGIN_SNIFF_BYTES].lower()
+    return any(marker in head for marker in _PASSWORD_INPUT_MARKERS)
+
+
+class CanaimeSession(requests.Session):
+    """`requests.Session` usada pelo processo de trabalho.
+
+    - Cancelamento cooperativo: com um `stop_event`, cada requisição roda numa thread
+      daemon e quem a chamou aguarda em fatias de `CANCEL_POLL_INTERVAL`; se o evento
+      for sinalizado, levanta `OperationCancelled` imediatamente em vez de esperar o
+      timeout de rede (30 s). A requisição abandonada termina sozinha em segundo plano
+      e não impede o encerramento do processo.
+    - Controle de concorrência: com um `limiter` (`AdaptiveLimiter`), cada requisição
+      ocupa uma vaga e informa latência/status para o ajuste AIMD.
+    - 429/503 são repetidos até `MAX_THROTTLE_RETRIES` vezes respeitando `Retry-After`
+      (ou, sem ele, com espera exponencial a partir de `THROTTLE_BACKOFF_S`).
+    - Reautenticação: com `reauthenticate` definido, toda resposta que for a página de
+      login dispara um novo login (uma única vez para todas as threads, sob trava) e a
+      requisição é repetida; se continuar caindo no login, levanta `SessionExpired`.
+    """
+
+    def __init__(self, stop_event=None, poll_interval: float = CANCEL_POLL_INTERVAL, limiter: Optional[AdaptiveLimiter] = None):
+        super().__init__()
+        self.stop_event = stop_event
+        self.poll_interval = poll_interval
+        self.limiter = limiter
+        self.reauthenticate: Optional[Callable[["CanaimeSession"], None]] = None
+        self.reauth_count = 0
+        self._auth_lock = threading.Lock()
+        self._auth_generation = 0
+        self._local = threading.local()
+
+    def request(self, method, url, *args, **kwargs):  # type: ignore[override]
+        reauths = 0
+        while True:
+            generation = self._auth_generation
+            resp = self._request_throttled(method, url, *args, **kwargs)
+            if (
+                self.reauthenticate is None
+                or getattr(self._local, "in_reauth", False)
+                or not looks_like_login_page(resp, url)
+            ):
+                return resp
+            if reauths >= MAX_REAUTH_RETRIES:
+                raise SessionExpired(
+                    f"A sessão do Canaimé expirou e o novo login não foi aceito ({method} {url}). "
+                    "Verifique usuário/senha."
+                )
+            reauths += 1
+            self._relogin(generation)
+
+    def _relogin(self, generation: int) -> None:
+        """Refaz o login uma única vez por expiração, mesmo com várias threads detectando-a."""
+        with self._auth_lock:
+            if self._auth_generation != generation:
+                return  # outra thread já refez o login depois desta requisição sair
+            raise_if_cancelled(self.stop_event, "novo login")
+            self._local.in_reauth = True
+            try:
+                self.reauthenticate(self)
+            finally:
+                self._local.in_reauth = False
+            self._auth_generation += 1
+            self.reauth_count += 1
+
+    def _request_throttled(self, method, url, *args, **kwargs):
+        attempt = 0
+        while True:
+            resp = self._send_limited(method, url, *args, **kwargs)
+            if resp.status_code not in THROTTLE_STATUSES or attempt >= MAX_THROTTLE_RETRIES:
+                return resp
+            attempt += 1
+            retry_after = parse_retry_after(resp.headers.get("Retry-After"))
+            if self.limiter is not None and retry_after is not None:
+                continue  # o limitador já pausou todas as requisições pelo Retry-After
+            # Sem limitador ou sem Retry-After, o backoff é feito aqui (cancelável)
+            self._sleep(retry_after if retry_after is not None else THROTTLE_BACKOFF_S * (2 ** (attempt - 1)))
+
+    def _sleep(self, seconds: float) -> None:
+        if self.stop_event is None:
+            time.sleep(seconds)
+            return
+        if self.stop_event.wait(seconds):
+            raise OperationCancelled("Interrompido durante espera de Retry-After")
+
+    def _send_limited(self, method, url, *args, **kwargs):
+        limiter = self.limiter
+        if limiter is None:
+            return self._send_cancellable(method, url, *args, **kwargs)
+
+        limiter.acquire(self.stop_event)
+        t0 = time.monotonic()
+        status: Optional[int] = None
+        retry_after: Optional[float] = None
+        error = False
+        counted = True
+        try:
+            resp = self._send_cancellable(method, url, *args, **kwargs)
+            status = resp.status_code
+            retry_after = parse_retry_after(resp.headers.get("Retry-After")) if status in THROTTLE_STATUSES else None
+            return resp
+        except requests.exceptions.SSLError:
+            counted = False  # problema de certificado não é sinal de sobrecarga
+            raise
+        except (requests.exceptions.Timeout, requests.exceptions.ConnectionError):
+            error = True
+            raise
+        except OperationCancelled:
+            counted = False
+            raise
+        finally:
+            limiter.release(
+                time.monotonic() - t0,
+                status=status,
+                error=error,
+                retry_after=retry_after,
+                counted=counted,
+                key=urlsplit(url).path,
+            )
+
+    def _send_cancellable(self, method, url, *args, **kwargs):
+        if self.stop_event is None:
+            return super().request(method, url, *args, **kwargs)
+
+        raise_if_cancelled(self.stop_event, f"{method} {url}")
+        done = threading.Event()
+        outcome: dict = {}
+
+        def run() -> None:
+            try:
+                outcome["response"] = requests.Session.request(self, method, url, *args, **kwargs)
+            except BaseException as exc:  # repassado para a thread que chamou
+                outcome["error"] = exc
+            finally:
+                done.set()
+
+        threading.Thread(target=run, name="http-request", daemon=True).start()
+        while not done.wait(self.poll_interval):
+            if self.stop_event.is_set():
+                raise OperationCancelled(f"Interrompido: {method} {url}")
+        if "error" in outcome:
+            raise outcome["error"]
+        return outcome["response"]
+
+
+def new_session(
+    stop_event=None, referer: Optional[str] = None, limiter: Optional[AdaptiveLimiter] = None
+) -> CanaimeSession:
+    """Cria a sessão do processo de trabalho com os cabeçalhos padrão."""
+    session = CanaimeSession(stop_event=stop_event, limiter=limiter)
+    session.headers.update({"User-Agent": DEFAULT_USER_AGENT})
+    if referer:
+        session.headers["Referer"] = referer
+    return session
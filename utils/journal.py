@@ -0,0 +1,160 @@
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from typing import Dict, Iterable, Mapping, MutableMapping, Optional, Tuple
+
+from utils.local_state import state_dir
+from utils.photo_blobs import get_blob, put_blob
+
+
+JOURNALS_DIRNAME = "jornadas"
+# Jornadas mais antigas que isto são descartadas (os dados do Canaimé mudam)
+JOURNAL_MAX_AGE_S = 12 * 3600
+# Pasta das fotos de um diário, ao lado dele: "<chave>_fotos/"
+BLOBS_SUFFIX = "_fotos"
+
+
+def job_key(target_url: str, alas: Iterable[str], campos: str = "completo") -> str:
+    """Identifica o trabalho pela unidade (URL da listagem), pelas alas e pelo conjunto de campos."""
+    key = [target_url, sorted(set(alas))]
+    if campos != "completo":
+        key.append(campos)  # o conjunto padrão mantém as chaves de diários já existentes
+    raw = json.dumps(key, ensure_ascii=False)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:16]
+
+
+class JobJournal:
+    """Diário em disco (JSONL) dos presos já coletados, para retomar um trabalho interrompido.
+
+    Cada preso concluído vira uma linha com os detalhes e a referência da foto (hash
+    do conteúdo em `utils.photo_blobs`), gravada com flush + fsync. Ao carregar, uma
+    última linha truncada (queda no meio da escrita) é ignorada. As fotos ficam numa
+    pasta própria do diário (`<diário>_fotos/`), fora do armazenamento compartilhado
+    dos instantâneos; diário e fotos são apagados quando o PDF é gerado com sucesso.
+    """
+
+    def __init__(self, path: str, header: Optional[dict] = None):
+        self.path = path
+        self.blobs_dir = os.path.splitext(path)[0] + BLOBS_SUFFIX
+        self.header = header or {}
+        self._lock = threading.Lock()
+        self._fh = None
+        self._written: set[str] = set()
+
+    @classmethod
+    def for_job(cls, target_url: str, alas: Iterable[str], campos: str = "completo") -> "JobJournal":
+        alas = sorted(set(alas))
+        folder = os.path.join(state_dir(), JOURNALS_DIRNAME)
+        os.makedirs(folder, exist_ok=True)
+        path = os.path.join(folder, f"{job_key(target_url, alas, campos)}.jsonl")
+        return cls(path, header={"alvo": target_url, "alas": alas, "campos": campos})
+
+    def load(
+        self, photos: Optional[MutableMapping[str, bytes]] = None
+    ) -> Tuple[Dict[str, Dict[str, str]], MutableMapping[str, bytes]]:
+        """Lê o diário: (detalhes por id, bytes da foto por URL). Vazio se não houver ou se expirou.
+
+        As fotos vão para `photos` quando informado (ex.: o armazenamento de fotos da
+        coleta), sem montar um dict intermediário com todas elas.
+        """
+        details: Dict[str, Dict[str, str]] = {}
+        if photos is None:
+            photos = {}
+        try:
+            if time.time() - os.path.getmtime(self.path) > JOURNAL_MAX_AGE_S:
+                self.discard()
+                return details, photos
+            with open(self.path, encoding="utf-8") as fh:
+                lines = fh.readlines()
+        except OSError:
+            return details, photos
+
+        for line in lines:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue  # linha truncada por queda durante a escrita
+            if entry.get("tipo") != "preso":
+                continue
+            pid = entry.get("id") or ""
+            if not pid:
+                continue
+            details[pid] = entry.get("det") or {}
+            url, sha = entry.get("foto") or "", entry.get("sha") or ""
+            if url and sha:
+                data = get_blob(sha, self.blobs_dir)
+                if data is not None:
+                    photos[url] = data
+        self._written.update(details)
+        return details, photos
+
+    def _open(self):
+        if self._fh is None:
+            new_file = not os.path.exists(self.path)
+            self._fh = open(self.path, "a", encoding="utf-8")
+            if new_file:
+                self._write_line({"tipo": "cabecalho", "criado": time.time(), **self.header})
+        return self._fh
+
+    def _write_line(self, entry: dict) -> None:
+        fh = self._fh
+        fh.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        fh.flush()
+        os.fsync(fh.fileno())
+
+    def append(self, pid: str, det: Mapping[str, str], photo_url: str = "", photo: Optional[bytes] = None) -> None:
+        """Registra um preso concluído (uma única vez por id)."""
+        with self._lock:
+            if pid in self._written:
+                return
+            sha = put_blob(photo, self.blobs_dir) if photo else ""
+            self._open()
+            self._write_line({"tipo": "preso", "id": pid, "det": dict(det), "foto": photo_url if sha else "", "sha": sha})
+            self._written.add(pid)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._fh is not None:
+                self._fh.close()
+                self._fh = None
+
+    def discard(self) -> None:
+        """Fecha e remove o diário e as fotos dele (trabalho concluído ou expirado)."""
+        self.close()
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+        shutil.rmtree(self.blobs_dir, ignore_errors=True)
+        self._written.clear()
+
+
+def prune_journals(max_age_s: float = JOURNAL_MAX_AGE_S) -> int:
+    """Apaga diários expirados (e suas fotos) de trabalhos que não foram retomados; devolve quantos."""
+    folder = os.path.join(state_dir(), JOURNALS_DIRNAME)
+    cutoff = time.time() - max_age_s
+    removed = 0
+    try:
+        names = os.listdir(folder)
+    except OSError:
+        return 0
+    for name in names:
+        path = os.path.join(folder, name)
+        try:
+            if os.path.getmtime(path) >= cutoff:
+                continue
+            if name.endswith(".jsonl"):
+                os.remove(path)
+                shutil.rmtree(path[: -len(".jsonl")] + BLOBS_SUFFIX, ignore_errors=True)
+                removed += 1
+            elif name.endswith(BLOBS_SUFFIX) and not os.path.exists(path[: -len(BLOBS_SUFFIX)] + ".jsonl"):
+                shutil.rmtree(path, ignore_errors=True)  # fotos de um diário que já não existe
+        except OSError:
+            pass
+    return removed
@@ -0,0 +1,55 @@
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+from typing import Any
+
+
+STATE_DIR_ENV = "CANAIME_STATE_DIR"
+STATE_FILE = "estado.json"
+
+_lock = threading.Lock()
+
+
+def state_dir() -> str:
+    """Pasta de dados locais do app (por usuário), criada sob demanda.
+
+    Padrão: `~/.canaime-cara-cracha`; pode ser trocada por `CANAIME_STATE_DIR`.
+    """
+    path = os.environ.get(STATE_DIR_ENV, "").strip() or os.path.join(os.path.expanduser("~"), ".canaime-cara-cracha")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _state_path() -> str:
+    return os.path.join(state_dir(), STATE_FILE)
+
+
+def load_state(key: str, default: Any = None) -> Any:
+    """Lê um valor do estado local; qualquer falha de leitura devolve `default`."""
+    try:
+        with open(_state_path(), encoding="utf-8") as fh:
+            data = json.load(fh)
+    except Exception:
+        return default
+    return data.get(key, default) if isinstance(data, dict) else default
+
+
+def save_state(key: str, value: Any) -> None:
+    """Grava um valor no estado local (escrita atômica via arquivo temporário)."""
+    with _lock:
+        path = _state_path()
+        try:
+            with open(path, encoding="utf-8") as fh:
+                data = json.load(fh)
+            if not isinstance(data, dict):
+                data = {}
+        except Exception:
+            data = {}
+        data[key] = value
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as fh:
+            json.dump(data, fh, ensure_ascii=False, indent=2)
+        os.replace(tmp, path)
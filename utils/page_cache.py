@@ -0,0 +1,210 @@
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import time
+from typing import Any, Dict, Mapping, Optional, Sequence, Tuple
+
+import reportlab
+from reportlab.pdfbase.pdfdoc import PDFImageXObject
+
+from utils.local_state import state_dir
+from utils.photo_blobs import blob_hash
+
+
+PAGES_DIRNAME = "paginas"
+# Suba quando o layout de `build_pdf` mudar: fragmentos antigos deixam de casar
+LAYOUT_VERSION = 1
+
+# Atributos do XObject de imagem preenchidos pelo reportlab ao carregar a foto
+_IMAGE_ATTRS = ("name", "width", "height", "bitsPerComponent", "colorSpace", "mask", "_dotrans", "_decode")
+_FONT_REF = re.compile(r"/(F\d+)\b")
+
+
+def fragment_key(preso: Mapping[str, str], photo: Optional[bytes], field_set: str, page_size, variant: str = "") -> str:
+    """Hash do que define a página: registro, conteúdo da foto, campos, página e versão do layout.
+
+    `variant` distingue saídas do mesmo layout com outra codificação (ex.: perfil com
+    fotos em JPEG); vazio mantém as chaves de sempre.
+    """
+    ident = [
+        LAYOUT_VERSION,
+        reportlab.Version,
+        field_set,
+        list(page_size),
+        sorted(dict(preso).items()),
+        blob_hash(photo) if photo else "",
+    ]
+    if variant:
+        ident.append(variant)
+    return hashlib.sha256(json.dumps(ident, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def page_fragment_key(
+    cells: Sequence[Tuple[Mapping[str, str], Optional[bytes]]], field_set: str, page_size, per_page: int = 1, variant: str = ""
+) -> str:
+    """Chave de uma página com os presos (registro, foto) de `cells`.
+
+    Com 1 preso por página é a própria `fragment_key`; nos layouts com mais presos
+    entram o layout e todos os presos da página, na ordem.
+    """
+    if per_page == 1:
+        preso, photo = cells[0]
+        return fragment_key(preso, photo, field_set, page_size, variant)
+    ident = [
+        LAYOUT_VERSION,
+        reportlab.Version,
+        field_set,
+        list(page_size),
+        f"{per_page}-por-pagina",
+        [[sorted(dict(preso).items()), blob_hash(photo) if photo else ""] for preso, photo in cells],
+        variant,
+    ]
+    return hashlib.sha256(json.dumps(ident, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def capture_fragment(c) -> Optional[Dict[str, Any]]:
+    """Fragmento da página corrente do canvas (antes do `showPage`), ou None se não der para reusar.
+
+    Guarda os operadores da página, as fontes usadas (com o nome interno no PDF) e o
+    XObject da foto já comprimido, que é a parte cara da página. Usa internos do canvas
+    do reportlab: se eles mudarem, a página só não vai para o cache.
+    """
+    try:
+        return _capture(c)
+    except Exception:
+        return None
+
+
+def _capture(c) -> Optional[Dict[str, Any]]:
+    doc = c._doc
+    code = list(c._code)
+    used = set(_FONT_REF.findall("\n".join(code)))
+    fonts = sorted(((ps, internal[1:]) for ps, internal in doc.fontMapping.items() if internal[1:] in used),
+                   key=lambda item: int(item[1][1:]))
+    images = []
+    for name in c._formsinuse:
+        obj = doc.idToObject.get(doc.getXObjectName(name))
+        if not isinstance(obj, PDFImageXObject) or getattr(obj, "smask", None) is not None:
+            return None  # formulários ou máscara alfa: fora do escopo do cache
+        content = obj.streamContent
+        image = {attr: getattr(obj, attr) for attr in _IMAGE_ATTRS if hasattr(obj, attr)}
+        image["filters"] = list(obj._filters)
+        image["binario"] = isinstance(content, bytes)
+        image["stream"] = content.decode("latin-1") if isinstance(content, bytes) else content
+        images.append(image)
+    return {"code": code, "fonts": fonts, "images": images}
+
+
+def replay_fragment(c, fragment: Mapping[str, Any]) -> bool:
+    """Redesenha a página a partir do fragmento; False (sem tocar no canvas) se não for compatível.
+
+    As fontes são registradas na ordem original e precisam receber o mesmo nome interno
+    que tinham quando o fragmento foi gravado; caso contrário a página é desenhada de novo.
+    Qualquer falha (fragmento inválido, internos do reportlab diferentes) desfaz o que
+    foi acrescentado à página e também devolve False.
+    """
+    try:
+        code_len, forms_len = len(c._code), len(c._formsinuse)
+    except Exception:
+        return False
+    try:
+        return _replay(c, fragment)
+    except Exception:
+        del c._code[code_len:]
+        del c._formsinuse[forms_len:]
+        return False
+
+
+def _replay(c, fragment: Mapping[str, Any]) -> bool:
+    doc = c._doc
+    if c._code:
+        return False
+    # Fontes ainda não usadas no documento recebem F<n+1> na ordem de registro
+    next_num = len(doc.fontMapping) + 1
+    for ps_name, internal in fragment["fonts"]:
+        expected = doc.fontMapping.get(ps_name)
+        if expected is None:
+            expected, next_num = f"/F{next_num}", next_num + 1
+        if expected != "/" + internal:
+            return False
+    for ps_name, _internal in fragment["fonts"]:
+        doc.getInternalFontName(ps_name)
+    for image in fragment["images"]:
+        name = image["name"]
+        reg_name = doc.getXObjectName(name)
+        if doc.idToObject.get(reg_name) is None:
+            obj = PDFImageXObject(name)
+            for attr in _IMAGE_ATTRS:
+                if attr in image:
+                    value = image[attr]
+                    setattr(obj, attr, tuple(value) if isinstance(value, list) else value)
+            obj._filters = tuple(image["filters"])
+            obj.streamContent = image["stream"].encode("latin-1") if image["binario"] else image["stream"]
+            c._setXObjects(obj)
+            doc.Reference(obj, reg_name)
+            doc.addForm(name, obj)
+        c._formsinuse.append(name)
+        c._currentPageHasImages = 1
+    c._code.extend(fragment["code"])
+    return True
+
+
+class PageCache:
+    """Cache em disco das páginas já desenhadas, um arquivo JSON por fragmento.
+
+    Numa reimpressão em que poucos presos mudaram, só as páginas novas são desenhadas
+    (decodificar, redimensionar e comprimir a foto); as demais são montadas a partir
+    do fragmento salvo. Os fragmentos ficam em `~/.canaime-cara-cracha/paginas/`.
+    """
+
+    def __init__(self, directory: Optional[str] = None):
+        self.directory = directory or os.path.join(state_dir(), PAGES_DIRNAME)
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        path = self._path(key)
+        try:
+            with open(path, encoding="utf-8") as fh:
+                fragment = json.load(fh)
+            os.utime(path)  # fragmento em uso não é podado
+        except (OSError, ValueError):
+            return None
+        return fragment
+
+    def put(self, key: str, fragment: Mapping[str, Any]) -> None:
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{os.getpid()}.tmp"
+            with open(tmp, "w", encoding="utf-8") as fh:
+                json.dump(fragment, fh, ensure_ascii=False, separators=(",", ":"))
+            os.replace(tmp, path)
+        except OSError:
+            pass  # cache é opcional: sem disco, a página só não é reaproveitada
+
+    def describe(self) -> str:
+        total = self.hits + self.misses
+        return f"{self.hits} de {total} página(s) reaproveitadas do cache, {self.misses} desenhadas"
+
+    def prune(self, max_age_days: float = 30.0) -> int:
+        """Remove fragmentos não usados há mais de `max_age_days`; devolve quantos removeu."""
+        cutoff = time.time() - max_age_days * 86400
+        removed = 0
+        for root, _dirs, files in os.walk(self.directory):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    if os.path.getmtime(path) < cutoff:
+                        os.remove(path)
+                        removed += 1
+                except OSError:
+                    pass
+        return removed
@@ -1,7 +1,10 @@
 from __future__ import annotations
 
-import io
-from typing import Dict, List
+import os
+import threading
+import time
+from io import BytesIO
+from typing import Any, Dict, List, Mapping, Optional, Sequence
 import requests
 from PIL import Image
 from reportlab.lib.pagesizes import A4
@@ -9,8 +12,15 @@ from reportlab.lib.units import mm
 from reportlab.lib.utils import ImageReader
 from reportlab.pdfgen import canvas
 from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.pdfdoc import PDFImageXObject
 from reportlab.pdfbase.ttfonts import TTFont
 
+from utils.cancellation import raise_if_cancelled
+from utils.page_cache import PageCache, capture_fragment, page_fragment_key, replay_fragment
+from utils.photo_blobs import blob_hash
+from utils.photo_store import PhotoData, open_photo
+from utils.preso_record import FIELD_SETS, resolve_field_set
+
 
 def _download_image_to_bytes(session: requests.Session, url: str) -> bytes:
     resp = session.get(url, timeout=30)
@@ -34,9 +44,276 @@ PHOTO_BOX_H = 90 * mm
 COLUMN_GAP = 10 * mm
 LINE_SPACING = 5
 
+# Layouts: presos por página -> grade de células, escala do desenho e campos compactos.
+# Com 1 por página, a célula é a área útil inteira e o desenho é o de sempre.
+PAGE_LAYOUTS = {
+    1: {"colunas": 1, "linhas": 1, "escala": 1.0, "compacto": False},
+    2: {"colunas": 1, "linhas": 2, "escala": 1.0, "compacto": True},
+    4: {"colunas": 2, "linhas": 2, "escala": 0.6, "compacto": True},
+}
+DEFAULT_LAYOUT = 1
+CELL_GAP = 10 * mm
+# Conjunto compacto (layouts com mais de um preso): (rótulo, campo, página de detalhe de origem)
+COMPACT_FIELDS = (
+    ("Mãe", "mae", "cadastro"),
+    ("Nascimento", "nascimento", "cadastro"),
+    ("CPF", "cpf", "cadastro"),
+    ("Cor / Etnia", "cor_etnia", "informes"),
+    ("Altura", "altura", "informes"),
+    ("Sinais Particulares", "sinais_particulares", "informes"),
+)
+MIN_TITLE_SIZE = 7
+
+# Rascunho: foto reduzida a no máximo isso (px) antes de entrar no PDF, desenhada no tamanho final
+DRAFT_THUMB_PX = 96
+DRAFT_LABEL = "RASCUNHO: conferência de listagem e layout (sem dados de detalhe; fotos só as já baixadas)"
+
+
+# Perfis de saída do PDF:
+#   compressao: fluxos de página comprimidos com Flate (None = padrão do reportlab)
+#   fonte_ttf: embute uma fonte TrueType Unicode (só os glifos usados) em vez da Helvetica
+#   qualidade/dpi: fotos recomprimidas em JPEG nessa qualidade e resolução; None = como
+#       sempre foi (pixels do tamanho da caixa, sem perdas)
+#   max_mb: tamanho máximo do arquivo, atingido baixando a qualidade das fotos (0 = sem limite)
+PDF_PROFILES = {
+    "padrao": {"compressao": None, "fonte_ttf": False, "qualidade": None, "dpi": 72, "max_mb": 0},
+    "impressao": {"compressao": True, "fonte_ttf": False, "qualidade": 85, "dpi": 150, "max_mb": 0},
+    "arquivo": {"compressao": True, "fonte_ttf": True, "qualidade": 92, "dpi": 200, "max_mb": 0},
+    "email": {"compressao": True, "fonte_ttf": False, "qualidade": 60, "dpi": 96, "max_mb": 20},
+}
+DEFAULT_PDF_PROFILE = "padrao"
+_PDF_PROFILE_ALIASES = {
+    "padrão": "padrao", "default": "padrao", "impressão": "impressao", "print": "impressao",
+    "archive": "arquivo", "e-mail": "email",
+}
+
+# Fonte Unicode embutida: a primeira encontrada (caminho de busca do reportlab, que inclui
+# as pastas de fontes do sistema); a Vera vem com o próprio reportlab
+TTF_CANDIDATES = (
+    ("DejaVuSans.ttf", "DejaVuSans-Bold.ttf"),
+    ("arial.ttf", "arialbd.ttf"),
+    ("Vera.ttf", "VeraBd.ttf"),
+)
+TTF_NAMES = ("CanaimeSans", "CanaimeSans-Bold")
+BASE14_FONTS = ("Helvetica", "Helvetica-Bold")
+_ttf_fonts: Optional[tuple[str, str]] = None
+_ttf_source = ""
+_ttf_lock = threading.Lock()
+
+# Limite de tamanho: qualidades JPEG tentadas, em ordem decrescente (ver `_budget_ladder`)
+QUALITY_STEPS = (92, 85, 75, 65, 55, 45, 35, 25)
+BUDGET_FLOOR_QUALITY = 55
+MIN_PHOTO_DPI = 48
+# Sem qualidade no perfil (padrão), o limite começa as fotos em JPEG com isto
+BUDGET_START_QUALITY = 85
+# Fotos usadas para estimar o tamanho de cada degrau e folga sobre o limite
+BUDGET_SAMPLE = 12
+BUDGET_MARGIN = 0.95
+MAX_RENDERS = 3
+
+
+def resolve_layout(per_page) -> int:
+    """Presos por página válido em `PAGE_LAYOUTS` (vazio = 1)."""
+    try:
+        key = int(per_page or DEFAULT_LAYOUT)
+    except (TypeError, ValueError):
+        key = 0
+    if key not in PAGE_LAYOUTS:
+        raise ValueError(f"Layout desconhecido: {per_page!r} presos por página (use {', '.join(map(str, PAGE_LAYOUTS))}).")
+    return key
+
+
+def layout_cells(per_page: int, page_size=A4) -> List[tuple[float, float, float, float]]:
+    """Células (x, y do topo, largura, altura) de uma página, na ordem de leitura."""
+    layout = PAGE_LAYOUTS[per_page]
+    page_w, page_h = page_size
+    cols, rows = layout["colunas"], layout["linhas"]
+    content_w = page_w - MARGIN_LEFT - MARGIN_RIGHT
+    content_h = page_h - MARGIN_TOP - MARGIN_BOTTOM
+    cell_w = (content_w - (cols - 1) * CELL_GAP) / cols
+    cell_h = (content_h - (rows - 1) * CELL_GAP) / rows
+    return [
+        (MARGIN_LEFT + col * (cell_w + CELL_GAP), page_h - MARGIN_TOP - row * (cell_h + CELL_GAP), cell_w, cell_h)
+        for row in range(rows)
+        for col in range(cols)
+    ]
+
+
+def resolve_pdf_profile(name: Optional[str]) -> str:
+    """Nome canônico do perfil de saída (aceita os nomes em inglês); vazio = padrão."""
+    key = (name or DEFAULT_PDF_PROFILE).strip().lower()
+    key = _PDF_PROFILE_ALIASES.get(key, key)
+    if key not in PDF_PROFILES:
+        raise ValueError(f"Perfil de PDF desconhecido: {name!r} (use {', '.join(PDF_PROFILES)}).")
+    return key
+
+
+def _unicode_fonts() -> tuple[str, str]:
+    """(normal, negrito) da fonte TrueType, registrada uma vez por processo.
+
+    O reportlab embute só o subconjunto de glifos usados no documento. Sem nenhuma das
+    `TTF_CANDIDATES` legível, volta à Helvetica.
+    """
+    global _ttf_fonts, _ttf_source
+    with _ttf_lock:
+        if _ttf_fonts is None:
+            for files in TTF_CANDIDATES:
+                try:
+                    faces = [TTFont(name, filename) for name, filename in zip(TTF_NAMES, files)]
+                except Exception:
+                    continue
+                for face in faces:
+                    pdfmetrics.registerFont(face)
+                _ttf_fonts, _ttf_source = TTF_NAMES, files[0]
+                break
+            else:
+                _ttf_fonts = BASE14_FONTS
+        return _ttf_fonts
+
+
+def _jpeg_photo(
+    img_bytes: PhotoData, quality: int, dpi: float, box_w: float = PHOTO_BOX_W, box_h: float = PHOTO_BOX_H
+) -> tuple[bytes, float, float]:
+    """Foto recomprimida em JPEG: (bytes, largura e altura em pt na caixa).
+
+    O tamanho desenhado é o mesmo do perfil padrão; só a resolução muda (`dpi`, sem
+    ampliar o original). O reportlab embute o JPEG como está (DCTDecode), sem
+    decodificar de novo.
+    """
+    img = Image.open(open_photo(img_bytes))
+    w, h = img.size
+    scale = min(1.0, box_w / w, box_h / h)
+    px = (max(1, min(w, round(w * scale * dpi / 72))), max(1, min(h, round(h * scale * dpi / 72))))
+    img.draft("RGB", px)
+    img = img.convert("RGB")  # JPEG não tem alfa nem paleta
+    if img.size != px:
+        img = img.resize(px, Image.LANCZOS)
+    buf = BytesIO()
+    img.save(buf, "JPEG", quality=quality, optimize=True)
+    return buf.getvalue(), w * scale, h * scale
+
+
+def _stored_jpeg_name(c: canvas.Canvas, jpeg: bytes) -> str:
+    """Nome do XObject da imagem recém-desenhada (ou o hash do JPEG, se o reportlab não o expuser)."""
+    try:
+        return c._formsinuse[-1]
+    except (AttributeError, IndexError):
+        return blob_hash(jpeg)
 
-def _draw_wrapped_text(c: canvas.Canvas, text: str, x: float, y: float, max_width: float, font_name: str, font_size: int) -> float:
-    """Desenha texto com quebra de linha automática, retornando o y após escrever."""
+
+def _store_jpeg_binary(c: canvas.Canvas, name: str, jpeg: bytes) -> None:
+    """Grava o JPEG da foto em binário no PDF, sem a camada ASCII85 do reportlab (+25% por foto).
+
+    Usa internos do documento do reportlab; se eles mudarem, a foto fica como o
+    reportlab a gravou (só maior).
+    """
+    try:
+        obj = c._doc.idToObject.get(c._doc.getXObjectName(name))
+        if isinstance(obj, PDFImageXObject) and tuple(obj._filters) == ("ASCII85Decode", "DCTDecode"):
+            obj.streamContent = jpeg
+            obj._filters = ("DCTDecode",)
+    except (AttributeError, KeyError, TypeError):
+        pass
+
+
+def _budget_ladder(quality: int, dpi: float) -> List[tuple[int, float]]:
+    """Degraus abaixo de (quality, dpi), do maior arquivo ao menor.
+
+    Primeiro a qualidade desce até `BUDGET_FLOOR_QUALITY`, depois a resolução até
+    `MIN_PHOTO_DPI` e só então a qualidade continua descendo (artefatos de JPEG
+    incomodam mais que fotos menos nítidas).
+    """
+    floor = min(quality, BUDGET_FLOOR_QUALITY)
+    steps = [(q, dpi) for q in QUALITY_STEPS if floor <= q < quality]
+    d = dpi * 0.75
+    while d >= MIN_PHOTO_DPI:
+        steps.append((floor, d))
+        d *= 0.75
+    low_dpi = steps[-1][1] if steps else dpi
+    steps.extend((q, low_dpi) for q in QUALITY_STEPS if q < floor)
+    return steps
+
+
+def _fit_budget(
+    photos: Sequence[PhotoData], current: tuple[int, float], photo_bytes: int, other_bytes: int, limit: int, box: tuple[float, float]
+):
+    """Primeiro degrau cujo tamanho estimado cabe em `limit` (ou o último, se nenhum couber).
+
+    A estimativa recomprime uma amostra das fotos em cada degrau e aplica a proporção
+    sobre os bytes de foto do PDF atual; o resto do arquivo (texto, fontes) não muda.
+    Presos sem foto e fotos que não decodificam (em branco no PDF) ficam fora da amostra.
+    """
+    ladder = _budget_ladder(*current)
+    if not ladder:
+        return None
+    real = [p for p in photos if p]
+    sample = []
+    base = 0
+    for p in real[:: max(1, len(real) // BUDGET_SAMPLE)][:BUDGET_SAMPLE]:
+        try:
+            base += len(_jpeg_photo(p, *current, *box)[0])
+        except Exception:
+            continue
+        sample.append(p)
+    if not base:
+        return ladder[-1]
+    for step in ladder:
+        size = sum(len(_jpeg_photo(p, *step, *box)[0]) for p in sample)
+        if other_bytes + photo_bytes * size / base <= limit * BUDGET_MARGIN:
+            return step
+    return ladder[-1]
+
+
+def _output_size(out) -> int:
+    if isinstance(out, (str, os.PathLike)):
+        return os.path.getsize(out)
+    return out.tell()
+
+
+def _format_size(size: float) -> str:
+    return f"{size / 1048576:.1f} MiB" if size >= 1048576 else f"{size / 1024:.0f} KiB"
+
+
+def describe_pdf_report(report: Mapping[str, Any]) -> str:
+    """Resumo do PDF gerado, ex.: "perfil email: 18.7 MiB em 6.2 s, fotos JPEG q55 a 96 dpi"."""
+    text = f"perfil {report['perfil']}: {_format_size(report['bytes'])} em {report['segundos']:.1f} s"
+    if report["por_pagina"] > 1:
+        text += f", {report['paginas']} página(s) com {report['por_pagina']} presos"
+    if report["qualidade"] is not None:
+        text += f", fotos JPEG q{report['qualidade']} a {report['dpi']:.0f} dpi"
+    if report["fonte"]:
+        text += f", fonte {report['fonte']} embutida"
+    if report["limite"]:
+        text += f", {report['renderizacoes']} renderização(ões)"
+        if report["bytes"] > report["limite"]:
+            text += f" (acima do limite de {_format_size(report['limite'])} mesmo no menor degrau)"
+    return text
+
+
+def _draft_photo(img_bytes: PhotoData, box_w: float = PHOTO_BOX_W, box_h: float = PHOTO_BOX_H) -> tuple[Image.Image, float, float]:
+    """Miniatura da foto para o rascunho e o tamanho (pt) que ela ocupará no PDF final.
+
+    Em JPEG, `Image.draft` já decodifica em escala reduzida (1/2 a 1/8), sem abrir a
+    imagem inteira.
+    """
+    img = Image.open(open_photo(img_bytes))
+    w, h = img.size
+    scale = min(1.0, box_w / w, box_h / h)
+    img.draft("RGB", (DRAFT_THUMB_PX, DRAFT_THUMB_PX))
+    img = img.copy()
+    img.thumbnail((DRAFT_THUMB_PX, DRAFT_THUMB_PX))
+    return img, w * scale, h * scale
+
+
+def _draw_wrapped_text(
+    c: canvas.Canvas, text: str, x: float, y: float, max_width: float, font_name: str, font_size: float,
+    y_min: Optional[float] = None,
+) -> float:
+    """Desenha texto com quebra de linha automática, retornando o y após escrever.
+
+    Com `y_min`, as linhas que cairiam abaixo dele não são desenhadas (célula de um
+    layout com vários presos por página).
+    """
     if not text:
         return y
     c.setFont(font_name, font_size)
@@ -47,76 +324,297 @@ def _draw_wrapped_text(c: canvas.Canvas, text: str, x: float, y: float, max_widt
         if pdfmetrics.stringWidth(test, font_name, font_size) <= max_width:
             line = test
         else:
+            if y_min is not None and y < y_min:
+                return y
             c.drawString(x, y, line)
             y -= font_size + LINE_SPACING
             line = word
-    if line:
+    if line and (y_min is None or y >= y_min):
         c.drawString(x, y, line)
         y -= font_size + LINE_SPACING
     return y
 
 
-def build_pdf(session: requests.Session, presos: List[Dict[str, str]], out_path: str) -> None:
-    """Gera PDF A4, 1 preso por página, com foto e dados formatados dentro das margens."""
-    c = canvas.Canvas(out_path, pagesize=A4)
-    page_w, page_h = A4
+def build_pdf(
+    session: Optional[requests.Session],
+    presos: Sequence[Mapping[str, str]],
+    out_path: str,
+    fotos: Optional[Mapping[str, PhotoData]] = None,
+    stop_event=None,
+    field_set: str = "completo",
+    page_cache: Optional[PageCache] = None,
+    draft: bool = False,
+    profile: str = DEFAULT_PDF_PROFILE,
+    max_mb: Optional[float] = None,
+    per_page: int = DEFAULT_LAYOUT,
+) -> Dict[str, Any]:
+    """Gera PDF A4, 1 preso por página, com foto e dados formatados dentro das margens.
 
-    content_x = MARGIN_LEFT
-    content_y_top = page_h - MARGIN_TOP
-    content_w = page_w - MARGIN_LEFT - MARGIN_RIGHT
+    `fotos` mapeia URL -> bytes já baixados (ex.: o `SpooledPhotoStore` da coleta, lido sem cópia); fotos ausentes
+    são baixadas pela `session` (com `session=None`, modo offline, ficam em branco). Se `stop_event` for sinalizado, levanta
+    `OperationCancelled` antes da próxima página; como o arquivo só é gravado em
+    `c.save()`, nenhum PDF parcial fica no disco. `field_set` escolhe as seções
+    desenhadas: "basico" (só cabeçalho e foto), "pessoal" (+ Dados Pessoais) ou
+    "completo" (+ Características). Com `page_cache`, páginas cujo preso, foto e layout
+    não mudaram são montadas a partir do fragmento salvo (o arquivo sai idêntico).
+    Com `draft`, gera um rascunho para conferência em segundos: só o cabeçalho de cada
+    preso, fotos de `fotos` em miniatura (nada é baixado; sem foto, o quadro vazio) e
+    nenhuma seção de detalhe, com a mesma posição dos elementos do PDF final.
+    `profile` (ver `PDF_PROFILES`) decide compressão, fonte e qualidade das fotos; o
+    padrão gera o mesmo arquivo de sempre. `max_mb` (None = o do perfil, 0 = sem
+    limite) é o tamanho máximo: se o arquivo passar, as fotos são recomprimidas num
+    degrau menor de `QUALITY_STEPS` (estimado por amostra) e o PDF é gerado de novo, até
+    `MAX_RENDERS` vezes. `per_page` (ver `PAGE_LAYOUTS`) põe 2 ou 4 presos por página,
+    com o mesmo desenho em escala e só os `COMPACT_FIELDS`; com 1, o PDF é o de sempre.
+    Devolve o relatório da geração (ver `describe_pdf_report`).
+    """
+    profile = resolve_pdf_profile(profile)
+    per_page = resolve_layout(per_page)
+    settings = dict(PDF_PROFILES[profile])
+    if draft:
+        settings = dict(PDF_PROFILES[DEFAULT_PDF_PROFILE])
+        max_mb = 0
+    limit = int((settings["max_mb"] if max_mb is None else max_mb) * 1048576)
+    photo = None
+    if settings["qualidade"] is not None:
+        photo = (settings["qualidade"], float(settings["dpi"]))
+    elif limit:
+        photo = (BUDGET_START_QUALITY, float(settings["dpi"]))
+    fonts = _unicode_fonts() if settings["fonte_ttf"] else BASE14_FONTS
+    inicio = time.perf_counter()
+    renders = 0
+    while True:
+        if renders and not isinstance(out_path, (str, os.PathLike)):
+            out_path.seek(0)
+            out_path.truncate()
+        photo_bytes, photos = _render(
+            session, presos, out_path, fotos, stop_event, field_set, page_cache, draft,
+            settings["compressao"], fonts, photo, profile, per_page,
+        )
+        renders += 1
+        size = _output_size(out_path)
+        if not limit or size <= limit or photo is None or renders >= MAX_RENDERS:
+            break
+        scale = PAGE_LAYOUTS[per_page]["escala"]
+        step = _fit_budget(photos, photo, photo_bytes, size - photo_bytes, limit, (PHOTO_BOX_W * scale, PHOTO_BOX_H * scale))
+        if step is None:
+            break
+        photo = step
+        # As fotos já vieram da sessão na primeira passada; daqui em diante, só as guardadas
+        fotos = {p.get("imagem_link", ""): b for p, b in zip(presos, photos) if b}
+    return {
+        "perfil": profile,
+        "bytes": size,
+        "segundos": time.perf_counter() - inicio,
+        "qualidade": photo[0] if photo else None,
+        "dpi": photo[1] if photo else settings["dpi"],
+        "fonte": _ttf_source if fonts == TTF_NAMES else "",
+        "limite": limit,
+        "renderizacoes": renders,
+        "por_pagina": per_page,
+        "paginas": -(-len(presos) // per_page),
+    }
+
+
+def _render(
+    session: Optional[requests.Session],
+    presos: Sequence[Mapping[str, str]],
+    out_path: str,
+    fotos: Optional[Mapping[str, PhotoData]],
+    stop_event,
+    field_set: str,
+    page_cache: Optional[PageCache],
+    draft: bool,
+    compression: Optional[bool],
+    fonts: tuple[str, str],
+    photo: Optional[tuple[int, float]],
+    profile: str,
+    per_page: int,
+) -> tuple[int, List[Optional[PhotoData]]]:
+    """Uma passada de `build_pdf`: (bytes de foto JPEG embutidos, foto de cada preso)."""
+    field_set = resolve_field_set(field_set)
+    sections = FIELD_SETS[field_set]
+    if draft:
+        session, page_cache, sections = None, None, ()
+    if fonts != BASE14_FONTS:
+        page_cache = None  # o subconjunto da fonte TrueType é montado no documento: o fragmento não é reaproveitável
+    # Perfis com fotos recomprimidas têm fragmentos próprios (o padrão mantém as chaves de sempre)
+    variant = f"{profile}:q{photo[0]}:{photo[1]:g}dpi" if photo else ""
+    layout = PAGE_LAYOUTS[per_page]
+    cells = layout_cells(per_page, A4)
+    # invariant: sem data/ID variáveis, o mesmo conteúdo gera o mesmo arquivo (retomada, caches)
+    c = canvas.Canvas(out_path, pagesize=A4, invariant=True, pageCompression=compression)
+    embedded: Dict[str, int] = {}
+    photos: List[Optional[PhotoData]] = []
+
+    for start in range(0, len(presos), per_page):
+        page = presos[start:start + per_page]
+        page_photos: List[Optional[PhotoData]] = []
+        for preso in page:
+            raise_if_cancelled(stop_event, "geração do PDF")
+            img_bytes = None
+            try:
+                url = preso.get("imagem_link", "")
+                if url:
+                    img_bytes = fotos.get(url) if fotos is not None else None
+                    if img_bytes is None and session is not None:
+                        img_bytes = _download_image_to_bytes(session, url)
+            except Exception:
+                img_bytes = None
+            page_photos.append(img_bytes)
+        photos.extend(page_photos)
+
+        key = None
+        if page_cache is not None:
+            key = page_fragment_key(list(zip(page, page_photos)), field_set, A4, per_page, variant)
+            fragment = page_cache.get(key)
+            if fragment is not None and replay_fragment(c, fragment):
+                page_cache.hits += 1
+                if photo:
+                    for image in fragment["images"]:
+                        embedded.setdefault(image["name"], len(image["stream"]))
+                c.showPage()
+                continue
+            page_cache.misses += 1
+
+        for preso, img_bytes, cell in zip(page, page_photos, cells):
+            _draw_badge(c, preso, img_bytes, cell, layout, sections, fonts, photo, draft, embedded)
+        if per_page > 1:
+            _draw_cut_lines(c, cells)
+        if draft:
+            c.setFont("Helvetica-Oblique", 8)
+            c.drawString(MARGIN_LEFT, MARGIN_BOTTOM / 2, DRAFT_LABEL)
+
+        if key is not None:
+            fragment = capture_fragment(c)
+            if fragment is not None:
+                page_cache.put(key, fragment)
+
+        # Garante que nada ultrapassou as margens (nova página)
+        c.showPage()
+
+    c.save()
+    return sum(embedded.values()), photos
+
+
+def _draw_cut_lines(c: canvas.Canvas, cells: Sequence[tuple[float, float, float, float]]) -> None:
+    """Linhas tracejadas de corte no meio dos espaços entre as células."""
+    c.saveState()
+    c.setStrokeGray(0.75)
+    c.setLineWidth(0.5)
+    c.setDash(3, 3)
+    left = min(x for x, _y, _w, _h in cells)
+    right = max(x + w for x, _y, w, _h in cells)
+    top = max(y for _x, y, _w, _h in cells)
+    bottom = min(y - h for _x, y, _w, h in cells)
+    for x in sorted({x for x, _y, _w, _h in cells if x > left}):
+        c.line(x - CELL_GAP / 2, top, x - CELL_GAP / 2, bottom)
+    for y in sorted({y for _x, y, _w, _h in cells if y < top}):
+        c.line(left, y + CELL_GAP / 2, right, y + CELL_GAP / 2)
+    c.restoreState()
 
-    for preso in presos:
-        # Cabeçalho
-        title = f"{preso.get('nome','')}"
-        subtitle = f"Código: {preso.get('id','')}   |   Ala: {preso.get('ala','')}   |   Cela: {preso.get('cela','')}"
 
-        c.setFont("Helvetica-Bold", 18)
-        c.drawString(content_x, content_y_top, title)
-        c.setFont("Helvetica", 11)
-        c.drawString(content_x, content_y_top - 18, subtitle)
+def _draw_badge(
+    c: canvas.Canvas,
+    preso: Mapping[str, str],
+    img_bytes: Optional[PhotoData],
+    cell: tuple[float, float, float, float],
+    layout: Mapping[str, Any],
+    sections: Sequence[str],
+    fonts: tuple[str, str],
+    photo: Optional[tuple[int, float]],
+    draft: bool,
+    embedded: Dict[str, int],
+) -> None:
+    """Desenha o crachá de um preso na célula (x, y do topo, largura, altura).
 
-        y_cursor = content_y_top - 18 - 14
+    Todas as medidas são multiplicadas pela `escala` do layout; no layout compacto o
+    nome diminui até caber na largura e a coluna de dados só tem os `COMPACT_FIELDS`,
+    cortada no fim da célula. JPEGs embutidos são anotados em `embedded` (nome -> bytes).
+    """
+    content_x, content_y_top, content_w, cell_h = cell
+    scale = layout["escala"]
+    compact = layout["compacto"]
+    regular, bold = fonts
+    box_w, box_h = PHOTO_BOX_W * scale, PHOTO_BOX_H * scale
+    y_min = content_y_top - cell_h if compact else None
 
-        # Layout principal: foto à esquerda, dados à direita
-        x_photo = content_x
-        y_photo_top = y_cursor - 6
-        y_photo = y_photo_top - PHOTO_BOX_H
+    # Cabeçalho
+    title = f"{preso.get('nome','')}"
+    subtitle = f"Código: {preso.get('id','')}   |   Ala: {preso.get('ala','')}   |   Cela: {preso.get('cela','')}"
 
-        # Desenha foto
-        img_bytes = None
+    title_size = 18 * scale
+    if compact:
+        while title_size > MIN_TITLE_SIZE and pdfmetrics.stringWidth(title, bold, title_size) > content_w:
+            title_size -= 0.5
+    c.setFont(bold, title_size)
+    c.drawString(content_x, content_y_top, title)
+    c.setFont(regular, 11 * scale)
+    c.drawString(content_x, content_y_top - 18 * scale, subtitle)
+
+    y_cursor = content_y_top - 18 * scale - 14 * scale
+
+    # Layout principal: foto à esquerda, dados à direita
+    x_photo = content_x
+    y_photo_top = y_cursor - 6 * scale
+    y_photo = y_photo_top - box_h
+
+    # Desenha foto
+    if draft:
         try:
-            url = preso.get("imagem_link", "")
-            if url:
-                img_bytes = _download_image_to_bytes(session, url)
+            if not img_bytes:
+                raise ValueError("sem foto")
+            thumb, w, h = _draft_photo(img_bytes, box_w, box_h)
+            c.drawImage(ImageReader(thumb), x_photo, y_photo, width=w, height=h, mask='auto')
         except Exception:
-            img_bytes = None
-        if img_bytes:
-            try:
-                img = Image.open(io.BytesIO(img_bytes))
-                img = _fit_image_to_box(img, PHOTO_BOX_W, PHOTO_BOX_H)
-                c.drawImage(ImageReader(img), x_photo, y_photo, width=img.width, height=img.height, preserveAspectRatio=True, mask='auto')
-            except Exception:
-                pass
+            c.setStrokeGray(0.6)
+            c.rect(x_photo, y_photo, box_w, box_h)
+            c.setFont("Helvetica", 9 * scale)
+            c.drawCentredString(x_photo + box_w / 2, y_photo + box_h / 2, "foto não baixada")
+    elif img_bytes and photo:
+        try:
+            jpeg, w, h = _jpeg_photo(img_bytes, *photo, box_w, box_h)
+            c.drawImage(ImageReader(BytesIO(jpeg)), x_photo, y_photo, width=w, height=h)
+            name = _stored_jpeg_name(c, jpeg)  # mesmo nome para a mesma foto: embutida uma vez só
+            if name not in embedded:
+                embedded[name] = len(jpeg)
+                _store_jpeg_binary(c, name, jpeg)
+        except Exception:
+            pass
+    elif img_bytes:
+        try:
+            img = Image.open(open_photo(img_bytes))
+            img = _fit_image_to_box(img, box_w, box_h)
+            c.drawImage(ImageReader(img), x_photo, y_photo, width=img.width, height=img.height, preserveAspectRatio=True, mask='auto')
+        except Exception:
+            pass
 
-        # Coluna de dados à direita da foto
-        x_col = x_photo + PHOTO_BOX_W + COLUMN_GAP
-        col_w = content_x + content_w - x_col
-        y_col = y_photo_top
+    # Coluna de dados à direita da foto
+    x_col = x_photo + box_w + COLUMN_GAP * scale
+    col_w = content_x + content_w - x_col
+    y_col = y_photo_top
 
-        # Bloco 1: Dados Pessoais
-        c.setFont("Helvetica-Bold", 13)
+    def put(label: str, key: str, font_size: float = 11 * scale):
+        nonlocal y_col
+        value = preso.get(key, "")
+        if not value or (y_min is not None and y_col < y_min):
+            return
+        c.setFont(bold, font_size)
+        c.drawString(x_col, y_col, f"{label}:")
+        y_col -= font_size + 2
+        y_col = _draw_wrapped_text(c, value, x_col, y_col, col_w, regular, font_size, y_min)
+
+    if compact:
+        for label, key, page in COMPACT_FIELDS:
+            if page in sections:
+                put(label, key)
+        return
+
+    # Bloco 1: Dados Pessoais (página de cadastro)
+    if "cadastro" in sections:
+        c.setFont(bold, 13 * scale)
         c.drawString(x_col, y_col, "Dados Pessoais")
-        y_col -= 16
-
-        def put(label: str, key: str, font_size: int = 11):
-            nonlocal y_col
-            value = preso.get(key, "")
-            if not value:
-                return
-            c.setFont("Helvetica-Bold", font_size)
-            c.drawString(x_col, y_col, f"{label}:")
-            y_col -= font_size + 2
-            y_col = _draw_wrapped_text(c, value, x_col, y_col, col_w, "Helvetica", font_size)
+        y_col -= 16 * scale
 
         put("Mãe", "mae")
         put("Pai", "pai")
@@ -127,10 +625,13 @@ def build_pdf(session: requests.Session, presos: List[Dict[str, str]], out_path:
         put("Endereço", "endereco")
 
         # Espaço antes do segundo bloco
-        y_col -= 6
-        c.setFont("Helvetica-Bold", 13)
+        y_col -= 6 * scale
+
+    # Bloco 2: Características (página de informes)
+    if "informes" in sections:
+        c.setFont(bold, 13 * scale)
         c.drawString(x_col, y_col, "Características")
-        y_col -= 16
+        y_col -= 16 * scale
 
         put("Cor / Etnia", "cor_etnia")
         put("Rosto", "rosto")
@@ -141,10 +642,3 @@ def build_pdf(session: requests.Session, presos: List[Dict[str, str]], out_path:
         put("Cabelos", "cabelos")
         put("Altura", "altura")
         put("Sinais Particulares", "sinais_particulares")
-
-        # Garante que nada ultrapassou as margens (nova página)
-        c.showPage()
-
-    c.save()
-
-
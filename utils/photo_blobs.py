@@ -0,0 +1,52 @@
+
+from __future__ import annotations
+
+import hashlib
+import os
+from typing import Optional
+
+from utils.local_state import state_dir
+
+
+BLOBS_DIRNAME = "fotos"
+
+
+def blobs_dir() -> str:
+    path = os.path.join(state_dir(), BLOBS_DIRNAME)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def blob_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def blob_path(sha: str, directory: Optional[str] = None) -> str:
+    return os.path.join(directory or blobs_dir(), sha[:2], sha)
+
+
+def put_blob(data: bytes, directory: Optional[str] = None) -> str:
+    """Grava `data` endereçado pelo SHA-256 do conteúdo (idempotente) e devolve o hash.
+
+    Sem `directory`, no armazenamento compartilhado (`fotos/`, usado pelos instantâneos).
+    """
+    sha = blob_hash(data)
+    path = blob_path(sha, directory)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as fh:
+            fh.write(data)
+        os.replace(tmp, path)
+    return sha
+
+
+def get_blob(sha: str, directory: Optional[str] = None) -> Optional[bytes]:
+    """Conteúdo do blob, ou None se não existir ou estiver corrompido."""
+    try:
+        with open(blob_path(sha, directory), "rb") as fh:
+            data = fh.read()
+    except OSError:
+        return None
+    return data if blob_hash(data) == sha else None
+
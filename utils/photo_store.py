@@ -0,0 +1,173 @@
+
+from __future__ import annotations
+
+import io
+import mmap
+import tempfile
+import threading
+from collections.abc import MutableMapping
+from typing import BinaryIO, Dict, Iterator, Optional, Tuple, Union
+
+
+# Orçamento padrão de fotos em memória; o excedente vai para um arquivo temporário
+DEFAULT_MEMORY_BUDGET_MB = 64
+SPILL_PREFIX = "canaime-fotos-"
+# Bytes lidos do mapeamento entre descartes das páginas residentes (MADV_DONTNEED)
+MAPPED_WINDOW = 8 * 1024 * 1024
+
+PhotoData = Union[bytes, memoryview]
+
+
+class _ViewReader(io.RawIOBase):
+    """Leitor de arquivo sobre um `memoryview` (o Pillow lê direto do mmap, sem cópia inteira)."""
+
+    def __init__(self, view: memoryview):
+        self._view = view
+        self._pos = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        n = max(0, min(len(buffer), len(self._view) - self._pos))
+        buffer[:n] = self._view[self._pos:self._pos + n]
+        self._pos += n
+        return n
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self._pos, io.SEEK_END: len(self._view)}[whence]
+        self._pos = max(0, base + offset)
+        return self._pos
+
+    def tell(self) -> int:
+        return self._pos
+
+
+def open_photo(data: PhotoData) -> BinaryIO:
+    """Arquivo em memória para `Image.open`: `bytes` são compartilhados pelo BytesIO, views lidas no lugar."""
+    if isinstance(data, memoryview):
+        return _ViewReader(data)  # type: ignore[return-value]
+    return io.BytesIO(data)
+
+
+class SpooledPhotoStore(MutableMapping):
+    """Fotos por URL em memória até `memory_budget` bytes; o que passar disso vai para disco.
+
+    O excedente é acrescentado a um único arquivo temporário (apagado ao fechar ou ao
+    fim do processo) e lido por `mmap`: a leitura devolve um `memoryview` do trecho,
+    sem copiar. A cada `MAPPED_WINDOW` bytes lidos, as páginas mapeadas deixam de
+    contar no RSS (`madvise(MADV_DONTNEED)`; o conteúdo volta do cache de arquivos se
+    for lido de novo), então o RSS das fotos fica em torno de orçamento + janela,
+    qualquer que seja o número de presos. Seguro entre threads.
+    """
+
+    def __init__(self, memory_budget: int = DEFAULT_MEMORY_BUDGET_MB * 1024 * 1024, spill_dir: Optional[str] = None):
+        self.memory_budget = max(0, int(memory_budget))
+        self.spill_dir = spill_dir
+        self.memory_bytes = 0
+        self.spilled_bytes = 0
+        self._memory: Dict[str, bytes] = {}
+        self._spilled: Dict[str, Tuple[int, int]] = {}
+        self._file = None
+        self._size = 0
+        self._map: Optional[mmap.mmap] = None
+        self._mapped_reads = 0
+        self._lock = threading.Lock()
+
+    def _spill(self, data: PhotoData) -> Tuple[int, int]:
+        if self._file is None:
+            self._file = tempfile.TemporaryFile(prefix=SPILL_PREFIX, dir=self.spill_dir, buffering=0)
+        offset = self._size
+        view = memoryview(data)
+        while view:
+            written = self._file.write(view)
+            view = view[written:]
+        self._size += len(data)
+        return offset, len(data)
+
+    def _view(self, offset: int, length: int) -> memoryview:
+        if self._map is None or len(self._map) < offset + length:
+            # O arquivo cresceu: remapeia; mapeamentos antigos vivem enquanto houver views deles
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._mapped_reads = 0
+        self._mapped_reads += length
+        if self._mapped_reads > MAPPED_WINDOW and hasattr(mmap, "MADV_DONTNEED"):
+            # Mapeamento só de leitura de arquivo: seguro mesmo com views em uso
+            self._map.madvise(mmap.MADV_DONTNEED)
+            self._mapped_reads = length
+        return memoryview(self._map)[offset:offset + length]
+
+    def __setitem__(self, url: str, data: PhotoData) -> None:
+        with self._lock:
+            self._discard(url)
+            if self.memory_bytes + len(data) <= self.memory_budget or not data:
+                self._memory[url] = bytes(data)
+                self.memory_bytes += len(data)
+            else:
+                self._spilled[url] = self._spill(data)
+                self.spilled_bytes += len(data)
+
+    def _discard(self, url: str) -> bool:
+        if url in self._memory:
+            self.memory_bytes -= len(self._memory.pop(url))
+            return True
+        if url in self._spilled:
+            self.spilled_bytes -= self._spilled.pop(url)[1]  # o espaço no arquivo não é reaproveitado
+            return True
+        return False
+
+    def __getitem__(self, url: str) -> PhotoData:
+        with self._lock:
+            data = self._memory.get(url)
+            if data is not None:
+                return data
+            if url in self._spilled:
+                return self._view(*self._spilled[url])
+        raise KeyError(url)
+
+    def __delitem__(self, url: str) -> None:
+        with self._lock:
+            if not self._discard(url):
+                raise KeyError(url)
+
+    def __contains__(self, url: object) -> bool:
+        return url in self._memory or url in self._spilled
+
+    def __iter__(self) -> Iterator[str]:
+        with self._lock:
+            keys = list(self._memory) + list(self._spilled)
+        return iter(keys)
+
+    def __len__(self) -> int:
+        return len(self._memory) + len(self._spilled)
+
+    @property
+    def spilled(self) -> int:
+        return len(self._spilled)
+
+    def describe(self) -> str:
+        mib = 1024 * 1024
+        return (
+            f"{len(self._memory)} foto(s) em memória ({self.memory_bytes / mib:.1f} MiB de "
+            f"{self.memory_budget / mib:.0f} MiB), {len(self._spilled)} em arquivo temporário "
+            f"({self.spilled_bytes / mib:.1f} MiB)"
+        )
+
+    def close(self) -> None:
+        """Libera o mapeamento e apaga o arquivo temporário (fotos em disco deixam de existir)."""
+        with self._lock:
+            if self._map is not None:
+                try:
+                    self._map.close()
+                except BufferError:
+                    pass  # ainda há views em uso; o mapeamento some quando elas forem liberadas
+                self._map = None
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            self._spilled.clear()
+            self._size = 0
+            self.spilled_bytes = 0
@@ -0,0 +1,140 @@
+
+from __future__ import annotations
+
+import sys
+from collections.abc import Mapping
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+
+# Campos do registro, na ordem: listagem, cadastro e informes
+LISTING_FIELDS = ("id", "nome", "ala", "cela", "imagem_link", "unidade")
+CADASTRO_FIELDS = ("mae", "pai", "nascimento", "cpf", "cidade_origem", "estado_origem", "endereco")
+INFORMES_FIELDS = (
+    "cor_etnia", "rosto", "olhos", "nariz", "boca", "dentes", "cabelos", "altura", "sinais_particulares",
+)
+FIELDS = LISTING_FIELDS + CADASTRO_FIELDS + INFORMES_FIELDS
+
+# Campos com poucos valores distintos, repetidos em milhares de presos: uma cópia só (sys.intern)
+INTERNED_FIELDS = frozenset({
+    "ala", "cela", "unidade", "cidade_origem", "estado_origem",
+    "cor_etnia", "rosto", "olhos", "nariz", "boca", "dentes", "cabelos", "altura",
+})
+
+_FIELD_SET = frozenset(FIELDS)
+
+# Conjuntos de campos: quais páginas de detalhe são buscadas e quais seções o PDF desenha
+FIELD_SETS = {
+    "basico": (),                         # crachá de identidade: foto, nome, código, ala e cela
+    "pessoal": ("cadastro",),             # + Dados Pessoais
+    "completo": ("cadastro", "informes"),  # + Características
+}
+DEFAULT_FIELD_SET = "completo"
+_FIELD_SET_ALIASES = {"básico": "basico", "basic": "basico", "personal": "pessoal", "full": "completo"}
+
+
+def resolve_field_set(name: Optional[str]) -> str:
+    """Nome canônico do conjunto de campos (aceita os nomes em inglês); vazio = completo."""
+    key = (name or DEFAULT_FIELD_SET).strip().lower()
+    key = _FIELD_SET_ALIASES.get(key, key)
+    if key not in FIELD_SETS:
+        raise ValueError(f"Conjunto de campos desconhecido: {name!r} (use {', '.join(FIELD_SETS)}).")
+    return key
+
+
+def _normalize(name: str, value: Any) -> Any:
+    if value is None:
+        return ""
+    if name in INTERNED_FIELDS and type(value) is str:
+        return sys.intern(value)
+    return value
+
+
+def _rebuild(values: Tuple[Any, ...], extra: Optional[Dict[str, Any]]) -> "PresoRecord":
+    record = PresoRecord.__new__(PresoRecord)
+    for name, value in zip(FIELDS, values):
+        object.__setattr__(record, name, _normalize(name, value))
+    record._extra = extra
+    return record
+
+
+class PresoRecord(Mapping):
+    """Registro compacto de um preso (listagem + cadastro + informes) com `__slots__`.
+
+    Substitui o dict de ~21 chaves por preso: os campos ficam em slots e os de poucos
+    valores distintos (ala, cela, cidade, características...) são internados. Mantém o
+    acesso de dict (`get`, `[]`, `in`, `keys`, `{**registro}`); campo vazio equivale a
+    chave ausente, como nos dicts mesclados de antes. Chaves fora do esquema vão para
+    um dict auxiliar criado só quando necessário. O pickle é uma tupla de valores.
+    """
+
+    __slots__ = FIELDS + ("_extra",)
+
+    def __init__(self, **fields: Any):
+        for name in FIELDS:
+            object.__setattr__(self, name, _normalize(name, fields.pop(name, "")))
+        self._extra: Optional[Dict[str, Any]] = fields or None
+
+    @classmethod
+    def from_mapping(cls, data: Mapping[str, Any]) -> "PresoRecord":
+        if isinstance(data, cls):
+            return data
+        return cls(**dict(data))
+
+    def merged(self, other: Mapping[str, Any]) -> "PresoRecord":
+        """Novo registro com os campos não vazios de `other` sobrepostos (equivale a `{**self, **other}`)."""
+        values = [getattr(self, name) for name in FIELDS]
+        extra = dict(self._extra) if self._extra else {}
+        for key, value in other.items():
+            if key in _FIELD_SET:
+                values[FIELDS.index(key)] = value
+            else:
+                extra[key] = value
+        return _rebuild(tuple(values), extra or None)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(self.items())
+
+    def __getitem__(self, key: str) -> Any:
+        if key in _FIELD_SET:
+            value = getattr(self, key)
+            if value != "":
+                return value
+        elif self._extra is not None and key in self._extra:
+            return self._extra[key]
+        raise KeyError(key)
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        if key in _FIELD_SET:
+            object.__setattr__(self, key, _normalize(key, value))
+        else:
+            if self._extra is None:
+                self._extra = {}
+            self._extra[key] = value
+
+    def __contains__(self, key: object) -> bool:
+        if key in _FIELD_SET:
+            return getattr(self, key) != ""  # type: ignore[arg-type]
+        return self._extra is not None and key in self._extra
+
+    def __iter__(self) -> Iterator[str]:
+        for name in FIELDS:
+            if getattr(self, name) != "":
+                yield name
+        if self._extra:
+            yield from self._extra
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, Mapping):
+            return self.to_dict() == dict(other.items())
+        return NotImplemented
+
+    __hash__ = None  # type: ignore[assignment]
+
+    def __repr__(self) -> str:
+        return f"PresoRecord({self.to_dict()!r})"
+
+    def __reduce__(self):
+        return _rebuild, (tuple(getattr(self, name) for name in FIELDS), self._extra)
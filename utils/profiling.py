@@ -0,0 +1,159 @@
+
+from __future__ import annotations
+
+import contextlib
+import cProfile
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from typing import Iterator, Optional
+
+
+PROFILE_ENV = "CANAIME_PROFILE"
+PROFILE_DIR_ENV = "CANAIME_PROFILE_DIR"
+DEFAULT_PROFILE_DIR = "diagnostics"
+TOP_ALLOCATIONS = 30
+
+
+def configure_from_args(profile: str, out_dir: str = "") -> None:
+    """Propaga a opção de linha de comando para o processo filho via ambiente.
+
+    O processo de trabalho é criado por `LoginApp.iniciar_login`, depois do parse
+    dos argumentos; variáveis de ambiente são herdadas tanto com fork quanto com spawn.
+    """
+    if profile:
+        os.environ[PROFILE_ENV] = profile
+    if out_dir:
+        os.environ[PROFILE_DIR_ENV] = out_dir
+
+
+class _ThreadProfiles:
+    """cProfile de cada thread criada durante uma fase (coleta, listagens em paralelo).
+
+    `cProfile.Profile.enable()` só perfila a thread que o chama; instalado com
+    `threading.setprofile`, `hook` roda na primeira chamada de cada thread nova e a
+    passa para um perfil próprio, somado ao da fase no fim.
+    """
+
+    def __init__(self):
+        self.profiles: list[cProfile.Profile] = []
+        self.active = True
+        self._lock = threading.Lock()
+
+    def hook(self, frame, event, arg) -> None:
+        sys.setprofile(None)
+        if not self.active:
+            return
+        profile = cProfile.Profile()
+        with self._lock:
+            self.profiles.append(profile)
+        profile.enable()
+
+    def stop(self) -> list[cProfile.Profile]:
+        self.active = False
+        with self._lock:
+            return list(self.profiles)
+
+
+class WorkerProfiler:
+    """Perfis por fase (cProfile e, opcionalmente, tracemalloc) do processo de trabalho.
+
+    Ativado por `CANAIME_PROFILE` (`cpu`, `mem` ou `cpu,mem`; `1` equivale a `cpu`).
+    Cada fase gera `<prefixo>_<fase>.prof` e, com `mem`, `<prefixo>_<fase>_mem.txt`
+    com as maiores alocações, na pasta `CANAIME_PROFILE_DIR` (padrão: `diagnostics`).
+    O `.prof` soma a thread da fase e as threads abertas durante ela (coleta de
+    detalhes, listagens do lote); o parsing no pool de processos fica de fora (use
+    `--processos-parsing 0` para perfilá-lo). Sem a variável, `phase()` não faz nada.
+    """
+
+    def __init__(self, cpu: bool = False, memory: bool = False, out_dir: str = DEFAULT_PROFILE_DIR, queue=None):
+        self.cpu = cpu
+        self.memory = memory
+        self.out_dir = out_dir
+        self.queue = queue
+        self.prefix = time.strftime("%Y%m%d_%H%M%S") + f"_{os.getpid()}"
+        self.saved: list[str] = []
+
+    @classmethod
+    def from_env(cls, queue=None) -> "WorkerProfiler":
+        raw = os.environ.get(PROFILE_ENV, "").strip().lower()
+        tokens = {t.strip() for t in raw.replace("+", ",").split(",") if t.strip()}
+        if tokens & {"1", "true", "yes", "on"}:
+            tokens.add("cpu")
+        out_dir = os.environ.get(PROFILE_DIR_ENV, "").strip() or DEFAULT_PROFILE_DIR
+        return cls(cpu="cpu" in tokens, memory="mem" in tokens, out_dir=out_dir, queue=queue)
+
+    @property
+    def enabled(self) -> bool:
+        return self.cpu or self.memory
+
+    def _path(self, name: str) -> str:
+        os.makedirs(self.out_dir, exist_ok=True)
+        return os.path.abspath(os.path.join(self.out_dir, f"{self.prefix}_{name}"))
+
+    def _report(self, message: str) -> None:
+        if self.queue is not None:
+            self.queue.put(("status", message))
+
+    @contextlib.contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Perfila o bloco como a fase `name`; os arquivos são gravados mesmo se houver exceção."""
+        if not self.enabled:
+            yield
+            return
+
+        profile: Optional[cProfile.Profile] = None
+        threads: Optional[_ThreadProfiles] = None
+        started_tracemalloc = False
+        if self.memory:
+            if tracemalloc.is_tracing():
+                tracemalloc.reset_peak()
+            else:
+                tracemalloc.start(10)
+                started_tracemalloc = True
+        if self.cpu:
+            threads = _ThreadProfiles()
+            threading.setprofile(threads.hook)
+            profile = cProfile.Profile()
+            profile.enable()
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - t0
+            if profile is not None:
+                profile.disable()
+                threading.setprofile(None)
+                stats = pstats.Stats(profile)
+                for thread_profile in threads.stop():
+                    try:
+                        stats.add(thread_profile)
+                    except (TypeError, ValueError):
+                        pass  # thread sem nenhuma chamada registrada
+                path = self._path(f"{name}.prof")
+                stats.dump_stats(path)
+                self.saved.append(path)
+                self._report(f"[perfil] Fase '{name}' ({elapsed:.1f} s): {path}")
+            if self.memory and tracemalloc.is_tracing():
+                self._dump_allocations(name, elapsed)
+                if started_tracemalloc:
+                    tracemalloc.stop()
+
+    def _dump_allocations(self, name: str, elapsed: float) -> None:
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        stats = snapshot.statistics("lineno")
+        path = self._path(f"{name}_mem.txt")
+        with open(path, "w", encoding="utf-8") as fh:
+            fh.write(f"fase: {name}\n")
+            fh.write(f"duracao_s: {elapsed:.3f}\n")
+            fh.write(f"memoria_atual_bytes: {current}\n")
+            fh.write(f"memoria_pico_bytes: {peak}\n\n")
+            fh.write(f"Top {TOP_ALLOCATIONS} alocações (por linha):\n")
+            for stat in stats[:TOP_ALLOCATIONS]:
+                fh.write(f"{stat}\n")
+        self.saved.append(path)
+        self._report(f"[perfil] Memória da fase '{name}' (pico {peak / 1024 / 1024:.1f} MiB): {path}")
@@ -0,0 +1,147 @@
+
+from __future__ import annotations
+
+from typing import Dict, Mapping, Tuple
+
+from utils.local_state import load_state, save_state
+from utils.pdf_builder import DEFAULT_LAYOUT, DEFAULT_PDF_PROFILE
+
+
+ESTIMATES_KEY = "estimativas"
+# Custo do PDF guardado à parte por perfil e layout ("padrao:1", "email:4"...)
+PDF_MODELS_KEY = "pdf"
+PDF_MODEL_FIELDS = ("segundos_por_pagina", "bytes_por_pagina")
+# Sem histórico: valores conservadores de uma coleta pelo Canaimé
+DEFAULT_S_PER_PRESO = 1.2  # detalhes + foto pela rede, por preso
+DEFAULT_S_PER_PAGE = 0.012  # desenho de uma página do PDF (1 preso; multiplicado pelos presos por página)
+DEFAULT_BYTES_PER_PAGE = 50 * 1024
+DEFAULT_HIT_RATIO = 0.0
+# Preso já em cache (pré-carregado durante a seleção ou retomado do diário): custo quase nulo
+S_PER_CACHED = 0.02
+# Peso da execução mais recente na média móvel (as anteriores decaem)
+EWMA_WEIGHT = 0.3
+
+
+def pdf_model_key(profile: str, per_page: int) -> str:
+    return f"{profile}:{per_page}"
+
+
+def _saved_state() -> dict:
+    saved = load_state(ESTIMATES_KEY, {})
+    return saved if isinstance(saved, dict) else {}
+
+
+def load_estimates(profile: str = DEFAULT_PDF_PROFILE, per_page: int = DEFAULT_LAYOUT) -> Dict[str, float]:
+    """Modelo de custo salvo das execuções anteriores (padrões se não houver histórico).
+
+    Coleta (segundos por preso, taxa de cache) é uma só; o custo por página do PDF é
+    o medido com este perfil e layout, já que 1, 2 ou 4 presos por página e a
+    compressão das fotos mudam tempo e bytes por página.
+    """
+    model = {
+        "segundos_por_preso": DEFAULT_S_PER_PRESO,
+        "segundos_por_pagina": DEFAULT_S_PER_PAGE * per_page,
+        "bytes_por_pagina": float(DEFAULT_BYTES_PER_PAGE * per_page),
+        "taxa_cache": DEFAULT_HIT_RATIO,
+        "execucoes": 0,
+    }
+    saved = _saved_state()
+    model.update({k: v for k, v in saved.items() if k in model and k not in PDF_MODEL_FIELDS and isinstance(v, (int, float))})
+    pdf = (saved.get(PDF_MODELS_KEY) or {}).get(pdf_model_key(profile, per_page))
+    if isinstance(pdf, dict):
+        model.update({k: v for k, v in pdf.items() if k in PDF_MODEL_FIELDS and isinstance(v, (int, float))})
+    model["por_pagina"] = per_page
+    model["execucoes_pdf"] = int(pdf.get("execucoes", 0)) if isinstance(pdf, dict) else 0
+    return model
+
+
+def _blend(old: float, new: float, first: bool) -> float:
+    return new if first else (1 - EWMA_WEIGHT) * old + EWMA_WEIGHT * new
+
+
+def record_run(
+    from_network: int,
+    from_cache: int,
+    detail_seconds: float,
+    pages: int,
+    pdf_seconds: float,
+    pdf_bytes: int,
+    profile: str = DEFAULT_PDF_PROFILE,
+    per_page: int = DEFAULT_LAYOUT,
+) -> Dict[str, float]:
+    """Incorpora a vazão medida numa execução ao modelo salvo e o devolve.
+
+    O tempo dos detalhes é atribuído aos presos buscados pela rede (os que vieram do
+    cache custam `S_PER_CACHED`); o PDF entra por página gerada (`pages`, não presos),
+    em tempo e em bytes, no modelo do perfil e layout usados.
+    """
+    model = load_estimates(profile, per_page)
+    first = not model["execucoes"]
+    first_pdf = not model["execucoes_pdf"]
+    total = from_network + from_cache
+    if from_network > 0:
+        per_preso = max(0.0, detail_seconds - from_cache * S_PER_CACHED) / from_network
+        model["segundos_por_preso"] = _blend(model["segundos_por_preso"], per_preso, first)
+    if total > 0:
+        model["taxa_cache"] = _blend(model["taxa_cache"], from_cache / total, first)
+    if pages > 0:
+        model["segundos_por_pagina"] = _blend(model["segundos_por_pagina"], pdf_seconds / pages, first_pdf)
+        if pdf_bytes > 0:
+            model["bytes_por_pagina"] = _blend(model["bytes_por_pagina"], pdf_bytes / pages, first_pdf)
+        model["execucoes_pdf"] = int(model["execucoes_pdf"]) + 1
+    model["execucoes"] = int(model["execucoes"]) + 1
+
+    saved = _saved_state()
+    pdf_models = saved.get(PDF_MODELS_KEY)
+    pdf_models = dict(pdf_models) if isinstance(pdf_models, dict) else {}
+    pdf_models[pdf_model_key(profile, per_page)] = {
+        **{k: model[k] for k in PDF_MODEL_FIELDS}, "execucoes": model["execucoes_pdf"],
+    }
+    save_state(ESTIMATES_KEY, {
+        "segundos_por_preso": model["segundos_por_preso"],
+        "taxa_cache": model["taxa_cache"],
+        "execucoes": model["execucoes"],
+        PDF_MODELS_KEY: pdf_models,
+    })
+    return model
+
+
+def estimate(total: int, cached: int, model: Mapping[str, float]) -> Tuple[float, float]:
+    """(segundos, bytes do PDF) estimados para `total` presos, `cached` deles já em cache.
+
+    O PDF é estimado pelas páginas que os presos ocupam no layout do modelo
+    (`por_pagina`). Dos presos que ainda não estão em cache, a fração `taxa_cache` das execuções
+    anteriores também é contada como acerto (pré-carregamento e retomada costumam
+    adiantar parte da seleção).
+    """
+    cached = min(cached, total)
+    expected_hits = cached + (total - cached) * float(model.get("taxa_cache", 0.0))
+    pages = -(-total // max(1, int(model.get("por_pagina", DEFAULT_LAYOUT))))
+    seconds = (
+        (total - expected_hits) * float(model["segundos_por_preso"])
+        + expected_hits * S_PER_CACHED
+        + pages * float(model["segundos_por_pagina"])
+    )
+    return seconds, pages * float(model["bytes_por_pagina"])
+
+
+def format_duration(seconds: float) -> str:
+    if seconds < 60:
+        return f"{max(1, round(seconds))} s"
+    minutes = round(seconds / 60)
+    if minutes < 60:
+        return f"{minutes} min"
+    return f"{minutes // 60} h {minutes % 60:02d} min"
+
+
+def describe_estimate(total: int, cached: int, model: Mapping[str, float]) -> str:
+    """Resumo para a janela de seleção, ex.: "120 presos · ~2 min · PDF ~5.9 MiB"."""
+    if total <= 0:
+        return "Nenhum preso selecionado"
+    seconds, size = estimate(total, cached, model)
+    text = f"{total} presos · ~{format_duration(seconds)} · PDF ~{size / 1048576:.1f} MiB"
+    if cached:
+        text += f" ({min(cached, total)} já em cache)"
+    if not model.get("execucoes"):
+        text += " · estimativa sem histórico"
+    return text
@@ -0,0 +1,77 @@
+
+from __future__ import annotations
+
+import json
+import os
+import time
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+
+from utils.photo_blobs import get_blob, put_blob
+from utils.preso_record import PresoRecord
+
+
+# Instantâneo gravado ao lado do PDF: "<nome>.snapshot.jsonl"
+SNAPSHOT_SUFFIX = ".snapshot.jsonl"
+SNAPSHOT_VERSION = 1
+
+
+def snapshot_path_for(pdf_path: str) -> str:
+    return os.path.splitext(pdf_path)[0] + SNAPSHOT_SUFFIX
+
+
+def write_snapshot(
+    path: str,
+    presos: Sequence[Mapping[str, str]],
+    photos: Mapping[str, bytes],
+    meta: Optional[Mapping[str, Any]] = None,
+) -> str:
+    """Grava o conjunto de dados de um PDF em JSONL para reimpressão sem rede.
+
+    Uma linha de cabeçalho e uma por preso (só campos não vazios, na ordem do PDF).
+    As fotos não entram no arquivo: são referenciadas pelo SHA-256 do conteúdo no
+    armazenamento de `utils.photo_blobs`. A escrita é atômica (arquivo temporário).
+    """
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as fh:
+        header = {"tipo": "cabecalho", "versao": SNAPSHOT_VERSION, "criado": time.time(), **(meta or {})}
+        fh.write(json.dumps(header, ensure_ascii=False, separators=(",", ":")) + "\n")
+        for preso in presos:
+            photo = photos.get(preso.get("imagem_link", ""))
+            entry = {"tipo": "preso", "dados": dict(preso), "sha": put_blob(photo) if photo else ""}
+            fh.write(json.dumps(entry, ensure_ascii=False, separators=(",", ":")) + "\n")
+    os.replace(tmp, path)
+    return path
+
+
+def read_snapshot(path: str) -> Tuple[Dict[str, Any], List[PresoRecord], Dict[str, bytes], int]:
+    """Lê um instantâneo: (cabeçalho, presos, bytes da foto por URL, fotos ausentes).
+
+    Fotos cujo blob não existe mais (ou está corrompido) são contadas como ausentes
+    e saem em branco no PDF.
+    """
+    meta: Dict[str, Any] = {}
+    presos: List[PresoRecord] = []
+    photos: Dict[str, bytes] = {}
+    missing = 0
+    with open(path, encoding="utf-8") as fh:
+        for line in fh:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            if entry.get("tipo") == "cabecalho":
+                meta = entry
+                if meta.get("versao", SNAPSHOT_VERSION) > SNAPSHOT_VERSION:
+                    raise ValueError(f"Instantâneo de versão mais nova ({meta.get('versao')}) que a suportada.")
+                continue
+            if entry.get("tipo") != "preso":
+                continue
+            preso = PresoRecord.from_mapping(entry.get("dados") or {})
+            presos.append(preso)
+            sha, url = entry.get("sha") or "", preso.get("imagem_link", "")
+            if sha and url:
+                data = get_blob(sha)
+                if data is None:
+                    missing += 1
+                else:
+                    photos[url] = data
+    return meta, presos, photos, missing
@@ -0,0 +1,139 @@
+
+from __future__ import annotations
+
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional, Tuple
+from urllib.parse import urlsplit
+
+import requests
+
+from utils.concurrency import INITIAL_LIMIT
+
+
+# Conexões keep-alive abertas de antemão: as que o limitador libera no início da coleta
+WARM_CONNECTIONS = INITIAL_LIMIT
+# Rodada mais velha que isso é refeita quando o operador volta a digitar
+# (servidores costumam fechar conexões ociosas em poucos segundos)
+WARM_REFRESH_S = 15.0
+# Formulário mais velho que isso é buscado de novo no clique (cookie e campos ocultos expiram)
+FORM_MAX_AGE_S = 300.0
+WARM_TIMEOUT_S = 10.0
+
+# (action_url, payload_base, form_html), como devolvido por `_discover_login_form`
+LoginForm = Tuple[str, dict, str]
+
+
+class LoginWarmup:
+    """Prepara a sessão para o login enquanto o operador digita usuário e senha.
+
+    Cada rodada roda numa thread daemon: resolve o nome do servidor, busca e
+    interpreta o formulário de login com `discover` (que também decide se o fallback
+    sem verificação de certificado é necessário, deixando `session.verify` pronto) e
+    faz `connections` requisições HEAD simultâneas, cujas conexões keep-alive ficam
+    no pool da sessão para as primeiras requisições depois do clique. Falhas não são
+    relatadas aqui: sem formulário pronto, o login faz o caminho normal e mostra o erro.
+    """
+
+    def __init__(
+        self,
+        session: requests.Session,
+        login_url: str,
+        discover: Callable[[requests.Session, str], LoginForm],
+        connections: int = WARM_CONNECTIONS,
+    ):
+        self.session = session
+        self.login_url = login_url
+        self.discover = discover
+        self.connections = max(0, connections)
+        self.rounds = 0
+        self.addresses = 0
+        self.elapsed = 0.0
+        self.error: Optional[BaseException] = None
+        self._form: Optional[LoginForm] = None
+        self._form_at = 0.0
+        self._started_at = 0.0
+        self._lock = threading.Lock()
+        self._running = False
+        self._form_ready = threading.Event()
+        self._form_ready.set()
+
+    def start(self) -> bool:
+        """Inicia uma rodada em segundo plano (se nenhuma estiver em andamento)."""
+        with self._lock:
+            if self._running:
+                return False
+            self._running = True
+            self._started_at = time.monotonic()
+            self._form_ready.clear()
+        threading.Thread(target=self._run, name="login-warmup", daemon=True).start()
+        return True
+
+    def refresh(self) -> bool:
+        """Refaz o aquecimento se a última rodada começou há mais de `WARM_REFRESH_S`."""
+        if time.monotonic() - self._started_at < WARM_REFRESH_S:
+            return False
+        return self.start()
+
+    def _run(self) -> None:
+        t0 = time.perf_counter()
+        try:
+            self._resolve()
+            form = self.discover(self.session, self.login_url)
+            with self._lock:
+                self._form, self._form_at = form, time.monotonic()
+            self._form_ready.set()
+            self._open_connections()
+            self.error = None
+        except Exception as exc:  # inclui OperationCancelled (janela fechada)
+            self.error = exc
+        finally:
+            self.elapsed = time.perf_counter() - t0
+            with self._lock:
+                self.rounds += 1
+                self._running = False
+            self._form_ready.set()
+
+    def _resolve(self) -> None:
+        parts = urlsplit(self.login_url)
+        port = parts.port or (443 if parts.scheme == "https" else 80)
+        try:
+            self.addresses = len(socket.getaddrinfo(parts.hostname, port, type=socket.SOCK_STREAM))
+        except OSError:
+            self.addresses = 0  # a conexão resolve de novo e o erro de DNS aparece no login
+
+    def _open_connections(self) -> None:
+        if self.connections <= 0:
+            return
+
+        def head(_: int) -> None:
+            self.session.head(self.login_url, timeout=WARM_TIMEOUT_S, allow_redirects=False).close()
+
+        # Simultâneas: uma reusa a conexão do formulário, as demais abrem novas (TCP + TLS)
+        with ThreadPoolExecutor(max_workers=self.connections, thread_name_prefix="login-warmup") as pool:
+            list(pool.map(head, range(self.connections)))
+
+    def login_form(self, stop_event=None) -> Optional[LoginForm]:
+        """Formulário da rodada mais recente (aguarda a em andamento), ou None se velho ou ausente.
+
+        Uso único: o formulário e o cookie que vieram com ele valem para um POST.
+        """
+        while not self._form_ready.wait(0.1):
+            if stop_event is not None and stop_event.is_set():
+                return None
+        with self._lock:
+            form, self._form = self._form, None
+            if form is None or time.monotonic() - self._form_at > FORM_MAX_AGE_S:
+                return None
+        return form
+
+    def describe(self) -> str:
+        if self.error is not None:
+            return f"sem efeito na última rodada ({self.error}); login pelo caminho normal"
+        dns = f"{self.addresses} endereço(s)" if self.addresses else "não resolvido"
+        return (
+            f"DNS {dns}, formulário de login e até {self.connections} conexão(ões) keep-alive "
+            f"prontos em {self.elapsed:.2f} s ({self.rounds} rodada(s) antes do clique)"
+        )